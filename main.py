@@ -6,12 +6,18 @@
 import os
 import traceback
 from os import listdir
-from os.path import isfile, join
+from os.path import join
 
 import cv2
 
 from src.algorithms.vanishing_point_detector import VanishingPointsDetector, \
     draw_vps, draw_vp
+from src.processing.batch import run_batch
+from src.processing.frame_sources import open_frame_source, source_type
+from src.processing.result_cache import ResultCache, cached_params
+from src.processing.results import FrameRecord, ResultsWriter
+from src.processing.streaming import stream_video_results
+from src.utils.instrumentation import StatsAggregator
 
 
 def _create_folder(_out_path):
@@ -22,103 +28,265 @@ def _create_folder(_out_path):
 
 
 def _list_files(_folder):
-    files = [f for f in listdir(_folder) if isfile(join(_folder, f))]
     files2 = []
-    for f in files:
-        if '.jpg' in f:
-            files2.append((f, 'image'))
-        if '.mp4' in f:
-            files2.append((f, 'video'))
+    for f in sorted(listdir(_folder)):
+        _type = source_type(join(_folder, f))
+        if _type is not None:
+            files2.append((f, _type))
     return files2
 
 
-def main_method(in_path, out_path, logger):
+def _cached_files(files, in_path, out_path, logger, cache, params):
+    missing_files = []
+    keys = {}
+    for file in files:
+        f, _ = file
+        key = cache.key(f"{in_path}{f}", params)
+        if cache.restore(key, out_path, f):
+            logger.info(f"Restored from cache: {in_path}{f}")
+        else:
+            missing_files.append(file)
+            keys[file] = key
+    return missing_files, keys
+
+
+def _cache_outputs(cache, keys, file, outputs):
+    if cache is not None:
+        f, _ = file
+        cache.store(keys[file], outputs, f)
+
+
+def main_method(in_path, out_path, logger, workers=1, chunk_size=8,
+                detector_params=None, export_stats=False, headless=False,
+                results_format=None, cache_path=None,
+                cache_max_bytes=2 * 1024 ** 3):
+    """
+    Processes the images and videos of a folder
+
+    :param in_path: Input folder
+    :param out_path: Output folder
+    :param logger: Logger
+    :param workers: Number of worker processes. With more than one worker
+    files are processed in batch mode: errors are reported per file instead
+    of aborting the run
+    :param chunk_size: Number of files sent to a worker at a time
+    :param detector_params: Keyword arguments of the detectors (e.g.
+    working_scale, pyramid)
+    :param export_stats: Writes the per-call instrumentation of the detector
+    (detection_stats.csv) and its summary with histograms
+    (detection_stats.json) in the output folder. Only in sequential mode
+    :param headless: Detection only: no annotated images or videos are
+    drawn and encoded
+    :param results_format: 'npy' or 'npz' to write the vanishing points of
+    each file (see src.processing.results), None to skip them
+    :param cache_path: Optional folder of a persistent result cache. The
+    files whose content and processing parameters were already processed
+    get their outputs copied from the cache instead of being processed. It
+    is not used when the detectors write debug images
+    :param cache_max_bytes: Maximum size of the result cache, the least
+    recently used entries are evicted
+    :return:
+    """
     _create_folder(out_path)
     files = _list_files(in_path)
+    if detector_params is None:
+        detector_params = {'debug_level': 0}
+    process_params = {'render': not headless,
+                      'results_format': results_format}
+    cache = None
+    keys = {}
+    # The debug images are not outputs known to the cache
+    if cache_path is not None and detector_params.get('debug_level', 0) == 0:
+        cache = ResultCache(cache_path, cache_max_bytes)
+        cache_params = {'detector_params': cached_params(detector_params),
+                        'process_params': process_params}
+        files, keys = _cached_files(files, in_path, out_path, logger, cache,
+                                    cache_params)
+    if workers > 1:
+        report = run_batch(files, _process_file, in_path, out_path, logger,
+                           workers=workers, chunk_size=chunk_size,
+                           detector_params=detector_params,
+                           process_params=process_params)
+        report.log(logger)
+        for result in report.results:
+            if result.ok:
+                _cache_outputs(cache, keys, result.file, result.outputs)
+        if cache is not None:
+            cache.evict()
+        return report
+    stats_aggregator = StatsAggregator()
+    if export_stats:
+        detector_params = dict(detector_params,
+                               stats_callback=stats_aggregator.add)
+    vp_detector = VanishingPointsDetector(out_path, _logger=logger,
+                                          **detector_params)
     for file in files:
         try:
-            _process_file(file, in_path, out_path, logger)
+            outputs = _process_file(file, in_path, out_path, logger,
+                                    vp_detector, **process_params)
+            _cache_outputs(cache, keys, file, outputs)
         except Exception as e:
             t = traceback.format_exc()
             logger.info(f"Error: {e} \n {t}")
             raise e
+    if cache is not None:
+        cache.evict()
+    if export_stats and stats_aggregator.records:
+        stats_aggregator.to_csv(f"{out_path}detection_stats.csv")
+        stats_aggregator.to_json(f"{out_path}detection_stats.json")
 
 
-def _process_file(file, in_path, out_path, logger):
+def _process_file(file, in_path, out_path, logger, vp_detector=None,
+                  render=True, results_format=None):
     f, type = file
     if type == 'image':
-        process_image(f, in_path, out_path, logger)
+        return process_image(f, in_path, out_path, logger, vp_detector,
+                             render=render, results_format=results_format)
     if type == 'video':
-        process_video(f, in_path, out_path, logger)
+        return process_video(f, in_path, out_path, logger, vp_detector,
+                             render=render, results_format=results_format)
+    return []
 
 
-def process_image(file, in_path, out_path, logger):
+def process_image(file, in_path, out_path, logger, vp_detector=None,
+                  render=True, results_format=None):
+    """
+    Detects the vanishing points of an image
+
+    :param file: Image file
+    :param in_path: Input folder
+    :param out_path: Output folder
+    :param logger: Logger
+    :param vp_detector: Optional long-lived detector
+    :param render: Draws the vanishing point and writes the image
+    :param results_format: 'npy' or 'npz' to write the vanishing point
+    record, None to skip it
+    :return: Written output files
+    """
     in_path = f"{in_path}{file}"
     logger.info(f"Processing image: {in_path}")
     out_path = f"{out_path}{file}"
-    image = cv2.imread(in_path, cv2.IMREAD_COLOR)
-    if image is None:
-        raise Exception(f"Error loading image {in_path}")
-    vp_detector = VanishingPointsDetector(out_path, debug_level=0,
-                                          _logger=logger)
+    with open_frame_source(in_path) as source:
+        image = next(iter(source))
+    if vp_detector is None:
+        vp_detector = VanishingPointsDetector(out_path, debug_level=0,
+                                              _logger=logger)
+    vp_detector.out_path = out_path
     vp_lines = vp_detector.execute(image)
-    detected_image = draw_vps(image, vp_lines, draw_lines=False)
-    cv2.imwrite(f"{out_path}filtered_vps.png", detected_image)
+    outputs = []
+    if render:
+        detected_image = draw_vps(image, vp_lines, draw_lines=False)
+        cv2.imwrite(f"{out_path}filtered_vps.png", detected_image)
+        outputs.append(f"{out_path}filtered_vps.png")
+    if results_format is not None:
+        vp, n_lines = None, 0
+        if len(vp_lines) > 0:
+            vp, lines = vp_lines[0]
+            n_lines = len(lines)
+        record = FrameRecord(0, vp, vp, n_lines, vp_detector.last_confidence,
+                             vp is not None)
+        with ResultsWriter(f"{out_path}.{results_format}") as writer:
+            writer.write(record)
+        outputs.append(f"{out_path}.{results_format}")
+    return outputs
+
 
+def process_video(file, in_path, out_path, logger, vp_detector=None,
+                  workers=1, detector_params=None, scheduler=None,
+                  fill_mode='interpolate', scale=0.50, render=True,
+                  results_format=None, processes=0, prefetch=0):
+    """
+    Detects the vanishing point of each frame of a video and writes a video
+    with its moving average. Decoding, detection (in `workers` threads) and
+    encoding run as overlapped pipeline stages.
 
-def process_video(file, in_path, out_path, logger):
+    :param file: Video file, image sequence folder, .npy stack or raw dump
+    (see src.processing.frame_sources)
+    :param in_path: Input folder
+    :param out_path: Output folder
+    :param logger: Logger
+    :param vp_detector: Optional long-lived detector, used by the first
+    worker
+    :param workers: Number of detection workers
+    :param detector_params: Keyword arguments of the detectors created here
+    (e.g. tracking=True, best used with a single worker so that each frame
+    follows the previous one)
+    :param scheduler: Optional KeyframeScheduler, the detection only runs on
+    its keyframes
+    :param fill_mode: How the vanishing point of the frames between
+    keyframes is obtained, 'interpolate' or 'reuse'
+    :param scale: Scale of the output video, and of the frames given to the
+    detectors
+    :param render: Writes the annotated video
+    :param results_format: 'npy' or 'npz' to write the per-frame records
+    (see src.processing.results) next to the video, None to skip them
+    :param processes: Number of worker processes, used instead of the worker
+    threads if set. The frames reach them through shared memory, and their
+    detectors are created from detector_params
+    :param prefetch: Number of frames decoded ahead in a background thread
+    (memory mapped inputs are not decoded)
+    :return: Written output files
+    """
     in_path = f"{in_path}{file}"
     logger.info(f"Processing video: {in_path}")
     out_path = f"{out_path}{file}"
-    video = cv2.VideoCapture(in_path)
-    if not video.isOpened():
-        raise Exception(f"Error loading video {in_path}")
-    frame_idx = 0
-    w = int(video.get(3))
-    h = int(video.get(4))
-
-    scale = 0.50
+    source = open_frame_source(in_path, prefetch=prefetch)
+    h, w = source.frame_shape[0:2]
     w = int(w * scale)
     h = int(h * scale)
     dim = (w, h)
 
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
     framerate = 30
-    out_video = cv2.VideoWriter(
-        f'{out_path}.avi',
-        fourcc, framerate,
-        (w, h)
-    )
-    vp_ma = None
-    dv = 5.0/framerate
-    while video.isOpened():
-        ret, frame = video.read()
-        if ret:
-            if frame is None:
-                msg = f"Couldn't read frame of video {in_path}-{frame_idx}"
-                raise Exception(msg)
-            logger.info(f"Processing video frame: {in_path}-{frame_idx}")
-            vp_detector = VanishingPointsDetector(out_path, debug_level=0,
-                                                  _logger=logger)
-            frame = cv2.resize(frame, dim, interpolation=cv2.INTER_AREA)
-            vp_lines = vp_detector.execute(frame)
-            vp, lines = vp_lines[0]
-            # Moving average of vanishing point
-            if vp_ma is None:
-                vp_ma = vp
-            else:
-                x, y = vp
-                x_ma, y_ma = vp_ma
-                x_ma, y_ma = (1-dv)*x_ma + dv*x, (1-dv)*y_ma + dv*y
-                vp_ma = int(x_ma), int(y_ma)
-            line_size = max(1, int(h * 0.001))
-            draw_vp(frame, line_size, vp_ma)
-            out_video.write(frame)
-            frame_idx = frame_idx + 1
-        else:
-            break
-    video.release()
-    out_video.release()
+    outputs = []
+    out_video = None
+    if render:
+        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+        out_video = cv2.VideoWriter(
+            f'{out_path}.avi',
+            fourcc, framerate,
+            (w, h)
+        )
+        outputs.append(f'{out_path}.avi')
+    results_writer = None
+    if results_format is not None:
+        results_writer = ResultsWriter(f"{out_path}.{results_format}")
+        outputs.append(f"{out_path}.{results_format}")
+    if detector_params is None:
+        detector_params = {'debug_level': 0}
+    if vp_detector is None:
+        vp_detector = VanishingPointsDetector(out_path, _logger=logger,
+                                              **detector_params)
+    vp_detector.out_path = out_path
+    vp_detector.reset_tracking()
+    detectors = [vp_detector]
+    for _ in range(workers - 1):
+        detectors.append(VanishingPointsDetector(out_path, _logger=logger,
+                                                 **detector_params))
+    if scheduler is not None:
+        scheduler.reset()
+    line_size = max(1, int(h * 0.001))
+    try:
+        records = stream_video_results(source, detectors, dim, scheduler,
+                                       fill_mode, 5.0/framerate,
+                                       processes=processes,
+                                       detector_params=detector_params)
+        for record, frame in records:
+            logger.info(f"Processed video frame: {in_path}-"
+                        f"{record.frame_idx}")
+            if results_writer is not None:
+                results_writer.write(record)
+            if out_video is not None:
+                if record.vp_smoothed is not None:
+                    draw_vp(frame, line_size, record.vp_smoothed)
+                out_video.write(frame)
+    finally:
+        source.close()
+        if out_video is not None:
+            out_video.release()
+        # The records detected before an error are kept
+        if results_writer is not None:
+            results_writer.close()
+    return outputs
 
 
 if __name__ == '__main__':
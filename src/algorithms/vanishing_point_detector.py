@@ -3,18 +3,31 @@
 @email: sebastian.cepeda.fuentealba@gmail.com
 """
 
+from collections import OrderedDict
+
 import cv2
 import numpy as np
 
 from src.computer_vision.colors import RED_COLOR, GREEN_COLOR, BLUE_COLOR, \
     WHITE_COLOR
 from src.computer_vision.gabor_bank import GaborBank
-from src.computer_vision.line import line_from_2_points, \
+from src.computer_vision.gauss_sphere_accumulator import \
+    GaussSphereAccumulatorFilter
+from src.computer_vision.line import lines_from_segments, \
     segment_from_line_equation
+from src.computer_vision.line_detectors import create_line_detector, \
+    LINE_DETECTORS
+from src.computer_vision.orientation_index import OrientationIndex
+from src.computer_vision.ransac_vanishing_point import \
+    RansacVanishingPointEstimator
+from src.computer_vision.roi import crop_roi
 from src.computer_vision.segment_filter import SegmentFilter
-from src.computer_vision.vanishing_point import vps_from_lines
+from src.computer_vision.vanishing_point import intersect_lines, \
+    intersect_line_pairs
 from src.computer_vision.vanishing_point_accumulator import \
     VanishingPointAccumulatorFilter
+from src.utils.debug_sink import DebugImageWriter
+from src.utils.instrumentation import DetectionStats
 from src.utils.print_logger import PrintLogger as logger
 
 
@@ -38,6 +51,33 @@ def _vp_lines_translation(dx, dy, vp_lines):
     return vp_lines
 
 
+def _vp_lines_scaling(scale, vp_lines):
+    """
+    Maps vanishing points and lines detected in an image resized by scale
+    back to the coordinates of the original image
+    """
+    vp_lines2 = []
+    for vp, lines in vp_lines:
+        x, y = vp
+        vp2 = (int(x / scale), int(y / scale))
+        lines2 = [(a, b, c / scale) for a, b, c in lines]
+        vp_lines2.append((vp2, lines2))
+    return vp_lines2
+
+
+def _roi_around(point, roi_shape, image_shape):
+    """
+    Window of roi_shape centered at point, shifted to stay inside the image
+    so that every window has the same shape
+    """
+    roi_h, roi_w = roi_shape
+    y_max, x_max = image_shape[0:2]
+    x, y = point
+    x0 = int(min(max(x - roi_w // 2, 0), x_max - roi_w))
+    y0 = int(min(max(y - roi_h // 2, 0), y_max - roi_h))
+    return x0, y0
+
+
 def _are_vps_outside(vp_lines, x_max, y_max):
     vps_outside_image = False
     for vp, lines in vp_lines:
@@ -94,104 +134,531 @@ def draw_vp_lines(image, image_shape, line_size, lines):
         cv2.line(image, p1, p2, RED_COLOR, line_size)
 
 
+class _PipelineState:
+
+    def __init__(self, image_shape: tuple, gabor_method: str = 'auto',
+                 line_detector: str = 'hough',
+                 horizontal_angle_threshold: float = 0.0,
+                 vertical_angle_threshold: float = 0.0):
+        """
+        Shape dependent state of the pipeline: parameters derived from the
+        image shape, filters and preallocated buffers
+
+        :param image_shape: Shape of the images to process
+        :param gabor_method: Method of the gabor bank
+        :param line_detector: Name of the line detector (see LINE_DETECTORS)
+        :param horizontal_angle_threshold: Angle to the horizontal under
+        which the segments are discarded, in degrees (0 disables it)
+        :param vertical_angle_threshold: Angle to the vertical under which
+        the segments are discarded, in degrees (0 disables it)
+        """
+        self.image_shape = image_shape
+        height, width = image_shape[0:2]
+        gabor_size = int(height * 0.01)
+        self.gabor_bank = GaborBank(ksize=gabor_size, angle_steps=18,
+                                    sigma=0.9, lambd=100, gamma=0.1,
+                                    method=gabor_method)
+        gaussian_size = int(height * 0.0005)
+        gaussian_size = gaussian_size + (1 - (gaussian_size % 2))
+        self.gaussian_shape = (gaussian_size, gaussian_size)
+        self.line_detector = create_line_detector(line_detector, image_shape)
+        self.line_size = max(1, int(height * 0.001))
+        self.segment_filter = SegmentFilter(
+            distance_threshold_ratio=0.1,
+            horizontal_angle_threshold=horizontal_angle_threshold,
+            vertical_angle_threshold=vertical_angle_threshold)
+        # Each pair of lines is counted once (the former pairwise loop
+        # counted it twice, with a count threshold of 3)
+        self.vp_filter = VanishingPointAccumulatorFilter(
+            accumulator_size=30, count_threshold=2, percentage_threshold=0.6)
+        # Radius of the votes counted as support of a vanishing point, the
+        # same distance under which the accumulator merges vanishing points
+        self.vote_radius = (height / self.vp_filter.accumulator_size) * 2
+        self.image_gray = np.empty((height, width), dtype=np.uint8)
+        self.image_clahe = np.empty((height, width), dtype=np.uint8)
+        self.image_gabor = np.empty((height, width), dtype=np.uint8)
+        self.image_blur = np.empty((height, width), dtype=np.uint8)
+        self.edges = np.empty((height, width), dtype=np.uint8)
+        self.lines_image = np.empty((height, width, 3), dtype=np.uint8)
+        self.vps_image = np.empty((height, width, 3), dtype=np.uint8)
+
+
 class VanishingPointsDetector:
 
     def __init__(self,
                  out_path: str,
                  debug_level: int = 0,
-                 _logger=logger):
+                 _logger=logger,
+                 max_cached_shapes: int = 4,
+                 tracking: bool = False,
+                 tracking_gate_ratio: float = 0.02,
+                 tracking_window_ratio: float = 0.15,
+                 tracking_min_lines: int = 4,
+                 tracking_min_confidence: float = 0.3,
+                 working_scale: float = 1.0,
+                 pyramid: bool = False,
+                 pyramid_coarse_height: int = 360,
+                 pyramid_roi_ratio: float = 0.5,
+                 stats_callback=None,
+                 debug_sink=None,
+                 roi=None,
+                 estimator: str = 'accumulator',
+                 ransac_iterations: int = 256,
+                 ransac_tolerance_ratio: float = 0.01,
+                 seed: int = 0,
+                 min_pair_angle: float = 0.0,
+                 max_lines_per_bucket: int = None,
+                 gabor_method: str = 'auto',
+                 line_detector: str = 'hough',
+                 horizontal_angle_threshold: float = 0.0,
+                 vertical_angle_threshold: float = 0.0):
         """
-        Constructor of VanishingPointsDetector
+        Constructor of VanishingPointsDetector. The detector is meant to be
+        long lived: the state that depends on the image shape is built the
+        first time a shape is seen and reused for the next images. It is not
+        thread safe, use one detector per thread.
 
         :param out_path: Output path
-        :param debug_level: Level of debug info
+        :param debug_level: Level of debug info. From 1 the images of the
+        intermediate stages are written (synchronously as png, unless a
+        debug_sink is given)
         :param _logger: Logger
+        :param max_cached_shapes: Maximum number of image shapes whose state
+        is kept (least recently used are evicted)
+        :param tracking: Temporal tracking mode, for consecutive video frames.
+        The previous vanishing point gates the lines (only lines passing near
+        it are intersected) and restricts the accumulator to a window around
+        it. Full detection is used when there is no previous vanishing point
+        or the confidence of the tracked one drops
+        :param tracking_gate_ratio: Maximum distance from a line to the
+        previous vanishing point, with respect to the image height
+        :param tracking_window_ratio: Half size of the searched window, with
+        respect to the image size
+        :param tracking_min_lines: Minimum number of gated lines to track
+        :param tracking_min_confidence: Minimum confidence of a tracked
+        vanishing point, below it the frame falls back to full detection
+        :param working_scale: Scale at which the images are processed. All
+        the thresholds are derived from the processed shape, the results are
+        given in the coordinates of the input image
+        :param pyramid: Coarse to fine mode. The vanishing points are detected
+        on the image downsampled to pyramid_coarse_height and the first one is
+        refined at the working scale, only in a region of interest around
+        the coarse estimate
+        :param pyramid_coarse_height: Height of the coarse image
+        :param pyramid_roi_ratio: Size of the refinement region of interest,
+        with respect to the image size
+        :param stats_callback: Optional method called with the DetectionStats
+        of each call of execute (also available as last_stats)
+        :param debug_sink: Optional DebugImageWriter for the debug images
+        (background writing, jpg, downsampling, sampling of frames). The
+        debug images are only rendered for the frames it samples
+        :param roi: Optional static region of interest, in the coordinates of
+        the input image: a rectangle (x, y, width, height) or a polygon of
+        shape (K, 2). Only its bounding rectangle is processed; for polygons
+        the edges outside of the polygon are discarded. The state is cached
+        per shape of the cropped region
+        :param estimator: Vanishing points estimator. 'accumulator'
+        intersects every pair of lines and bins the intersections, 'ransac'
+        scores the intersections of random pairs of lines by the number of
+        lines passing near them (near linear in the number of lines, for
+        cluttered scenes), 'sphere' bins the intersections as directions on
+        the Gauss sphere (vanishing points far away or at infinity, e.g.
+        horizontal ones on wide angle footage)
+        :param ransac_iterations: Number of sampled pairs of lines of the
+        ransac estimator
+        :param ransac_tolerance_ratio: Maximum distance from an inlier line
+        to the vanishing point, with respect to the image height
+        :param seed: Seed of the ransac estimator
+        :param min_pair_angle: Minimum angular separation, in degrees, of the
+        pairs of lines intersected by the accumulator estimator (0 intersects
+        every pair)
+        :param max_lines_per_bucket: Optional maximum number of lines per
+        5 degrees orientation bucket, the longest are kept
+        :param gabor_method: Method of the gabor bank (see GaborBank),
+        'steerable' approximates it with fewer filters
+        :param line_detector: Line detection backend (see LINE_DETECTORS):
+        'hough' (Canny edges and probabilistic Hough transform), 'lsd'
+        (OpenCV line segment detector), 'fld' (fast line detector, needs
+        opencv-contrib) or 'gradient' (lines fitted to the edge pixels
+        grouped by gradient orientation)
+        :param horizontal_angle_threshold: Segments closer than this angle
+        (in degrees) to the horizontal are discarded before intersecting
+        them, e.g. for horizon and building clutter (0 disables it)
+        :param vertical_angle_threshold: Segments closer than this angle (in
+        degrees) to the vertical are discarded, e.g. for poles and facades
+        (0 disables it)
         """
         self.out_path = out_path
         self.debug_level = debug_level
         self.logger = _logger
+        self.max_cached_shapes = max_cached_shapes
+        self.clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+        self._states = OrderedDict()
+        self.tracking = tracking
+        self.tracking_gate_ratio = tracking_gate_ratio
+        self.tracking_window_ratio = tracking_window_ratio
+        self.tracking_min_lines = tracking_min_lines
+        self.tracking_min_confidence = tracking_min_confidence
+        # The tracked vanishing point is kept in the coordinates of the input
+        # frames, valid across moving regions of interest. The transform
+        # maps them to the processed image of the current call: (x0, y0,
+        # scale), processed = (frame - (x0, y0)) * scale
+        self._tracked_vp = None
+        self._tracked_shape = None
+        self._frame_shape = None
+        self._frame_transform = (0, 0, 1.0)
+        # Share of the intersection votes supporting the first vanishing
+        # point of the last call, and whether it came from tracking
+        self.last_confidence = 0.0
+        self.last_tracked = False
+        self.working_scale = working_scale
+        self.pyramid = pyramid
+        self.pyramid_coarse_height = pyramid_coarse_height
+        self.pyramid_roi_ratio = pyramid_roi_ratio
+        self.stats_callback = stats_callback
+        self.roi = roi
+        if estimator not in ('accumulator', 'ransac', 'sphere'):
+            raise ValueError(f"Unknown estimator: {estimator}")
+        self.estimator = estimator
+        self.ransac = RansacVanishingPointEstimator(
+            iterations=ransac_iterations,
+            tolerance_ratio=ransac_tolerance_ratio, seed=seed)
+        self.sphere_filter = GaussSphereAccumulatorFilter()
+        self.gabor_method = gabor_method
+        if line_detector not in LINE_DETECTORS:
+            raise ValueError(f"Unknown line detector: {line_detector}")
+        if not LINE_DETECTORS[line_detector].is_available():
+            raise ValueError(f"Line detector not available in this OpenCV "
+                             f"build: {line_detector}")
+        self.line_detector = line_detector
+        self.horizontal_angle_threshold = horizontal_angle_threshold
+        self.vertical_angle_threshold = vertical_angle_threshold
+        self.orientation_index = None
+        if min_pair_angle > 0 or max_lines_per_bucket is not None:
+            self.orientation_index = OrientationIndex(
+                min_angle=min_pair_angle,
+                max_per_bucket=max_lines_per_bucket)
+        if debug_sink is None and debug_level >= 1:
+            debug_sink = DebugImageWriter(background=False)
+        self.debug_sink = debug_sink
+        self._debug = False
+        self.last_stats = DetectionStats()
+        self._stats = self.last_stats
 
-    def _preprocessing(self, image, image_shape):
-        image_gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        if self.debug_level >= 1:
-            cv2.imwrite(f"{self.out_path}image_gray.png", image_gray)
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-        image_gray = clahe.apply(image_gray)
-        if self.debug_level >= 1:
-            cv2.imwrite(f"{self.out_path}image_clahe.png", image_gray)
-        gabor_size = int(image_shape[0] * 0.01)
-        gb = GaborBank(ksize=gabor_size, angle_steps=18, sigma=0.9, lambd=100,
-                       gamma=0.1)
-        image_gray = gb.execute(image_gray)
-        if self.debug_level >= 1:
-            cv2.imwrite(f"{self.out_path}gabor_bank.png", image_gray)
-        gaussian_size = int(image_shape[0] * 0.0005)
-        gaussian_size = gaussian_size + (1 - (gaussian_size % 2))
-        gaussian_shape = (gaussian_size, gaussian_size)
-        image_gray = cv2.GaussianBlur(image_gray, gaussian_shape, 0)
+    def reset_tracking(self):
+        """
+        Forgets the tracked vanishing point, e.g. when a new video starts
+        """
+        self._tracked_vp = None
+        self._tracked_shape = None
+
+    def _from_frame(self, point):
+        x0, y0, scale = self._frame_transform
+        return (point[0] - x0) * scale, (point[1] - y0) * scale
+
+    def _to_frame(self, point):
+        x0, y0, scale = self._frame_transform
+        return point[0] / scale + x0, point[1] / scale + y0
+
+    def _write_debug(self, name, image):
+        self.debug_sink.write(f"{self.out_path}{name}", image)
+
+    def _get_state(self, image_shape):
+        key = tuple(image_shape[0:2])
+        state = self._states.get(key)
+        if state is None:
+            state = _PipelineState(key, self.gabor_method,
+                                   self.line_detector,
+                                   self.horizontal_angle_threshold,
+                                   self.vertical_angle_threshold)
+            self._states[key] = state
+            if len(self._states) > self.max_cached_shapes:
+                self._states.popitem(last=False)
+        else:
+            self._states.move_to_end(key)
+        return state
+
+    def _preprocessing(self, image, state):
+        image_gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY,
+                                  dst=state.image_gray)
+        if self._debug:
+            self._write_debug('image_gray', image_gray)
+        image_gray = self.clahe.apply(image_gray, dst=state.image_clahe)
+        if self._debug:
+            self._write_debug('image_clahe', image_gray)
+        with self._stats.timer('gabor'):
+            image_gray = state.gabor_bank.execute(image_gray,
+                                                  out=state.image_gabor)
+        if self._debug:
+            self._write_debug('gabor_bank', image_gray)
+        image_gray = cv2.GaussianBlur(image_gray, state.gaussian_shape, 0,
+                                      dst=state.image_blur)
         return image_gray
 
-    def _edge_detection(self, image_gray):
-        edges = cv2.Canny(image_gray, 50, 200, apertureSize=3)
-        if self.debug_level >= 1:
-            cv2.imwrite(f"{self.out_path}image_edges.png", edges)
+    def _edge_detection(self, image_gray, state, mask=None):
+        if not state.line_detector.uses_edges:
+            return None
+        edges = cv2.Canny(image_gray, 50, 200, edges=state.edges,
+                          apertureSize=3)
+        if mask is not None:
+            edges = cv2.bitwise_and(edges, mask, dst=edges)
+        if self._debug:
+            self._write_debug('image_edges', edges)
         return edges
 
-    def _lines_detection(self, edges, image, image_shape):
-        max_line_gap = max(1, int(image_shape[0] * 0.10))
-        px_resolution = 1
-        segments = cv2.HoughLinesP(edges, px_resolution, np.pi / 180, 100,
-                                   maxLineGap=max_line_gap)
-        if segments is None:
-            segments = np.array([])
-        # self.logger.info(f"Detected lines: {segments.shape[0]}")
-        image_copy = image.copy()
-        sf = SegmentFilter(distance_threshold_ratio=0.1)
-        filtered_segments = sf.execute(segments, image_shape[0:2])
-        for segment in filtered_segments:
-            x1, y1, x2, y2 = segment[0]
-            cv2.line(image_copy, (x1, y1), (x2, y2), GREEN_COLOR, 5)
-            cv2.line(image_copy, (x1, y1), (x2, y2), RED_COLOR, 2)
-        if self.debug_level >= 1:
-            cv2.imwrite(f"{self.out_path}lines_detected.png", image_copy)
-        lines = []
-        for segment in filtered_segments:
-            x1, y1, x2, y2 = segment[0]
-            line = line_from_2_points(x1, y1, x2, y2)
-            lines.append(line)
-        return lines
-
-    def _vps_detection(self, image_gray, image_shape, lines):
-        vps, vp_lines_map = vps_from_lines(lines)
-        # self.logger.info(f"Detected intersection points: {len(vps)}")
-        detected_image = cv2.cvtColor(image_gray, cv2.COLOR_GRAY2RGB)
-        line_size = max(1, int(image_shape[0] * 0.001))
-        for vp in vps:
+    def _lines_detection(self, image_gray, edges, image, state, mask=None):
+        segments = state.line_detector.execute(image_gray, edges)
+        if mask is not None and edges is None:
+            # Backends without edges see the whole crop, the segments are
+            # kept by the mask at their middle point
+            middles = (segments[:, 0, 0:2] + segments[:, 0, 2:4]) / 2
+            xs = np.clip(middles[:, 0].astype(np.int64), 0, mask.shape[1] - 1)
+            ys = np.clip(middles[:, 1].astype(np.int64), 0, mask.shape[0] - 1)
+            segments = segments[mask[ys, xs] > 0]
+        self._stats.count('segments_detected', len(segments))
+        filtered_segments = state.segment_filter.execute(
+            segments, state.image_shape)
+        self._stats.count('segments_filtered', len(filtered_segments))
+        if self._debug:
+            image_copy = state.lines_image
+            np.copyto(image_copy, image)
+            segments = filtered_segments[:, 0, :].astype(np.int32)
+            for x1, y1, x2, y2 in segments.tolist():
+                cv2.line(image_copy, (x1, y1), (x2, y2), GREEN_COLOR, 5)
+                cv2.line(image_copy, (x1, y1), (x2, y2), RED_COLOR, 2)
+            self._write_debug('lines_detected', image_copy)
+        return lines_from_segments(filtered_segments)
+
+    def _draw_vps(self, image_gray, state, vps):
+        if not self._debug:
+            return
+        detected_image = cv2.cvtColor(image_gray, cv2.COLOR_GRAY2RGB,
+                                      dst=state.vps_image)
+        line_size = state.line_size
+        for vp in vps.tolist():
+            vp = tuple(vp)
             cv2.circle(detected_image, vp, line_size * 15, BLUE_COLOR,
                        line_size * 15)
             cv2.circle(detected_image, vp, line_size * 10, GREEN_COLOR,
                        line_size * 10)
-        if self.debug_level >= 1:
-            cv2.imwrite(f"{self.out_path}detected_vps.png", detected_image)
-        vp_filter = VanishingPointAccumulatorFilter(accumulator_size=30,
-                                                    count_threshold=3,
-                                                    percentage_threshold=0.6)
-        vp_lines = vp_filter.execute(image_shape[0:2], vps, vp_lines_map)
-        vp_lines = list(vp_lines)
-        # self.logger.info(f"Detected vanishing points: {len(vp_lines)}")
+        self._write_debug('detected_vps', detected_image)
+
+    @staticmethod
+    def _confidence(vps, vp_lines, state):
+        if len(vp_lines) == 0 or vps.shape[0] == 0:
+            return 0.0
+        x, y = vp_lines[0][0]
+        votes = np.hypot(vps[:, 0] - x, vps[:, 1] - y) < state.vote_radius
+        return np.count_nonzero(votes) / vps.shape[0]
+
+    def _accumulate(self, state, vps, idx1, idx2, lines):
+        with self._stats.timer('accumulator'):
+            vp_lines = state.vp_filter.execute_array(state.image_shape, vps,
+                                                     idx1, idx2, lines)
+        self._stats.count('intersections', vps.shape[0])
+        self._stats.count('accumulator_cells', state.vp_filter.last_cells)
+        self._stats.count('accumulator_max', state.vp_filter.last_max_count)
+        return vp_lines
+
+    def _accumulator_estimation(self, image_gray, state, lines, window):
+        with self._stats.timer('intersection'):
+            if self.orientation_index is None:
+                vps, idx1, idx2 = intersect_lines(lines)
+            else:
+                idx1, idx2 = self.orientation_index.execute(lines)
+                vps, idx1, idx2 = intersect_line_pairs(lines, idx1, idx2)
+            if window is not None:
+                (x, y), (half_width, half_height) = window
+                in_window = (np.abs(vps[:, 0] - x) <= half_width) & \
+                    (np.abs(vps[:, 1] - y) <= half_height)
+                vps = vps[in_window]
+                idx1, idx2 = idx1[in_window], idx2[in_window]
+        self._draw_vps(image_gray, state, vps)
+        vp_lines = self._accumulate(state, vps, idx1, idx2, lines)
+        return vp_lines, self._confidence(vps, vp_lines, state)
+
+    def _windowed_vps(self, image_gray, state, vp_lines, window):
+        if window is not None:
+            (x, y), (half_width, half_height) = window
+            vp_lines = [(vp, vp_lines_in) for vp, vp_lines_in in vp_lines
+                        if abs(vp[0] - x) <= half_width and
+                        abs(vp[1] - y) <= half_height]
+        self._draw_vps(image_gray, state,
+                       np.array([vp for vp, _ in vp_lines],
+                                dtype=np.int64).reshape(-1, 2))
         return vp_lines
 
-    def execute(self, image):
+    def _ransac_estimation(self, image_gray, state, lines, window):
+        with self._stats.timer('ransac'):
+            vp_lines = self.ransac.execute(state.image_shape, lines)
+        self._stats.count('intersections', self.ransac.last_hypotheses)
+        vp_lines = self._windowed_vps(image_gray, state, vp_lines, window)
+        if len(vp_lines) == 0 or lines.shape[0] == 0:
+            return vp_lines, 0.0
+        # Share of the lines that are inliers of the first vanishing point
+        return vp_lines, len(vp_lines[0][1]) / lines.shape[0]
+
+    def _sphere_estimation(self, image_gray, state, lines, window):
+        sphere_filter = self.sphere_filter
+        with self._stats.timer('accumulator'):
+            vp_lines = sphere_filter.execute(state.image_shape, lines)
+        self._stats.count('intersections', sphere_filter.last_votes)
+        self._stats.count('accumulator_cells', sphere_filter.last_cells)
+        self._stats.count('accumulator_max', sphere_filter.last_max_count)
+        vp_lines = self._windowed_vps(image_gray, state, vp_lines, window)
+        if len(vp_lines) == 0:
+            return vp_lines, 0.0
+        # Share of the votes in the cell of the first vanishing point
+        return vp_lines, \
+            sphere_filter.last_max_count / sphere_filter.last_votes
+
+    def _estimation(self, image_gray, state, lines, window=None):
+        if self.estimator == 'ransac':
+            return self._ransac_estimation(image_gray, state, lines, window)
+        if self.estimator == 'sphere':
+            return self._sphere_estimation(image_gray, state, lines, window)
+        return self._accumulator_estimation(image_gray, state, lines, window)
+
+    def _tracked_vps_detection(self, image_gray, state, lines):
+        x, y = self._from_frame(self._tracked_vp)
+        height, width = state.image_shape
+        a, b, c = lines[:, 0], lines[:, 1], lines[:, 2]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            distances = np.abs(a * x + b * y + c) / np.hypot(a, b)
+        gated = distances < self.tracking_gate_ratio * height
+        if np.count_nonzero(gated) < self.tracking_min_lines:
+            return None
+        window = ((x, y), (self.tracking_window_ratio * width,
+                           self.tracking_window_ratio * height))
+        vp_lines, confidence = self._estimation(image_gray, state,
+                                                lines[gated], window)
+        if confidence < self.tracking_min_confidence:
+            return None
+        self.last_confidence = confidence
+        return vp_lines
+
+    def _vps_detection(self, image_gray, state, lines, track=True):
+        lines = np.asarray(lines, dtype=np.float64).reshape(-1, 3)
+        track = track and self.tracking
+        if track and self._tracked_shape != self._frame_shape:
+            self.reset_tracking()
+        if track:
+            self.last_tracked = False
+        if track and self._tracked_vp is not None:
+            vp_lines = self._tracked_vps_detection(image_gray, state, lines)
+            if vp_lines is not None:
+                self.last_tracked = True
+                self._tracked_vp = self._to_frame(vp_lines[0][0])
+                return vp_lines
+        vp_lines, self.last_confidence = self._estimation(image_gray, state,
+                                                          lines)
+        if track:
+            self._tracked_shape = self._frame_shape
+            self._tracked_vp = self._to_frame(vp_lines[0][0]) \
+                if vp_lines else None
+        return vp_lines
+
+    def _detect(self, image, track=True, mask=None):
+        state = self._get_state(image.shape)
+        stats = self._stats
+        with stats.timer('preprocessing'):
+            image_gray = self._preprocessing(image, state)
+        with stats.timer('edge_detection'):
+            edges = self._edge_detection(image_gray, state, mask)
+        with stats.timer('lines_detection'):
+            lines = self._lines_detection(image_gray, edges, image, state,
+                                          mask)
+        with stats.timer('vps_detection'):
+            vp_lines = self._vps_detection(image_gray, state, lines, track)
+        return vp_lines
+
+    def _pyramid_detection(self, image, mask=None):
+        height, width = image.shape[0:2]
+        coarse_scale = self.pyramid_coarse_height / height
+        if coarse_scale >= 1.0:
+            return self._detect(image, mask=mask)
+        coarse_image = cv2.resize(image, None, fx=coarse_scale,
+                                  fy=coarse_scale,
+                                  interpolation=cv2.INTER_AREA)
+        coarse_mask = None
+        if mask is not None:
+            coarse_mask = cv2.resize(mask, coarse_image.shape[1::-1],
+                                     interpolation=cv2.INTER_NEAREST)
+        x0, y0, scale = self._frame_transform
+        self._frame_transform = (x0, y0, scale * coarse_scale)
+        try:
+            coarse_vp_lines = self._detect(coarse_image, mask=coarse_mask)
+        finally:
+            self._frame_transform = (x0, y0, scale)
+        vp_lines = _vp_lines_scaling(coarse_scale, coarse_vp_lines)
+        if len(vp_lines) == 0:
+            return vp_lines
+        coarse_vp = vp_lines[0][0]
+        roi_shape = (int(height * self.pyramid_roi_ratio),
+                     int(width * self.pyramid_roi_ratio))
+        x0, y0 = _roi_around(coarse_vp, roi_shape, image.shape)
+        roi = image[y0:y0 + roi_shape[0], x0:x0 + roi_shape[1]]
+        roi_mask = None
+        if mask is not None:
+            roi_mask = mask[y0:y0 + roi_shape[0], x0:x0 + roi_shape[1]]
+        confidence = self.last_confidence
+        roi_vp_lines = self._detect(roi, track=False, mask=roi_mask)
+        if len(roi_vp_lines) == 0:
+            self.last_confidence = confidence
+            return vp_lines
+        roi_vp_lines = _vp_lines_translation(x0, y0, roi_vp_lines)
+        x, y = roi_vp_lines[0][0]
+        # Refinements outside of the coarse cell are not trusted
+        max_shift = (height / self.pyramid_coarse_height) * \
+            self._get_state(coarse_image.shape).vote_radius
+        if np.hypot(x - coarse_vp[0], y - coarse_vp[1]) > max_shift:
+            self.last_confidence = confidence
+            return vp_lines
+        return roi_vp_lines + vp_lines[1:]
+
+    def execute(self, image, roi=None):
         """
         Detects the vanishing points in an image and the lines that give
         origin to them
 
         :param image: Input image
-        :return: Vanishing points and lines
+        :param roi: Optional region of interest of this image, a rectangle
+        (x, y, width, height) or a polygon (K, 2). It overrides the static
+        roi of the detector
+        :return: Vanishing points and lines, in the coordinates of the input
+        image
         """
-        image_shape = image.shape
-        image_gray = self._preprocessing(image, image_shape)
-        edges = self._edge_detection(image_gray)
-        lines = self._lines_detection(edges, image, image_shape)
-        vp_lines = self._vps_detection(image_gray, image_shape, lines)
+        stats = DetectionStats()
+        self._stats = stats
+        self._debug = self.debug_sink is not None and \
+            self.debug_sink.start_frame()
+        with stats.timer('total'):
+            roi = self.roi if roi is None else roi
+            self._frame_shape = image.shape[0:2]
+            x0, y0 = 0, 0
+            mask = None
+            if roi is not None:
+                image, (x0, y0), mask = crop_roi(image, roi)
+            scale = self.working_scale
+            self._frame_transform = (x0, y0, scale)
+            if scale != 1.0:
+                image = cv2.resize(image, None, fx=scale, fy=scale,
+                                   interpolation=cv2.INTER_AREA)
+                if mask is not None:
+                    mask = cv2.resize(mask, image.shape[1::-1],
+                                      interpolation=cv2.INTER_NEAREST)
+            if self.pyramid:
+                vp_lines = self._pyramid_detection(image, mask)
+            else:
+                vp_lines = self._detect(image, mask=mask)
+            if scale != 1.0:
+                vp_lines = _vp_lines_scaling(scale, vp_lines)
+            if roi is not None:
+                vp_lines = _vp_lines_translation(x0, y0, vp_lines)
+        stats.count('vanishing_points', len(vp_lines))
+        stats.confidence = self.last_confidence
+        stats.tracked = self.last_tracked
+        self.last_stats = stats
+        if self.stats_callback is not None:
+            self.stats_callback(stats)
         return vp_lines
@@ -0,0 +1,88 @@
+"""
+@author: Sebastian Cepeda
+@email: sebastian.cepeda.fuentealba@gmail.com
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from src.computer_vision.line import line_from_2_points
+from src.computer_vision.vanishing_point import vp_from_two_lines, \
+    intersect_lines, Z_TOLERANCE
+from src.utils.print_logger import PrintLogger as logger
+
+
+def _reference_vps_from_lines(lines):
+    """
+    Exhaustive python loop over every (l1, l2) pair, as vps_from_lines was
+    originally implemented
+
+    :param lines: Detected lines
+    :return: Detected vanishing points
+    """
+    vps = []
+    for l1 in lines:
+        for l2 in lines:
+            vp = vp_from_two_lines(l1, l2)
+            x, y, z = vp
+            if not np.isclose(z, 0.0, rtol=Z_TOLERANCE, atol=Z_TOLERANCE):
+                vps.append((x, y))
+    return vps
+
+
+def random_lines(n_lines, image_shape=(1080, 1920), seed=0):
+    """
+    Creates random lines from segments inside an image, as HoughLinesP would
+
+    :param n_lines: Number of lines
+    :param image_shape: Shape of the image
+    :param seed: Seed of the random generator
+    :return: List of lines coefficients
+    """
+    rng = np.random.RandomState(seed)
+    y_max, x_max = image_shape[0:2]
+    xs = rng.randint(0, x_max, size=(n_lines, 2)).astype(np.int32)
+    ys = rng.randint(0, y_max, size=(n_lines, 2)).astype(np.int32)
+    lines = []
+    for (x1, x2), (y1, y2) in zip(xs, ys):
+        lines.append(line_from_2_points(x1, y1, x2, y2))
+    return lines
+
+
+def _time_call(method, repetitions):
+    start = time.perf_counter()
+    for _ in range(repetitions):
+        method()
+    return (time.perf_counter() - start) / repetitions
+
+
+def run(sizes, repetitions):
+    """
+    Times the exhaustive loop against the vectorized intersection engine
+
+    :param sizes: Numbers of lines to test
+    :param repetitions: Repetitions of each measure
+    :return: List of (n_lines, reference time, vectorized time)
+    """
+    results = []
+    for n_lines in sizes:
+        lines = random_lines(n_lines)
+        ref_time = _time_call(lambda: _reference_vps_from_lines(lines), 1)
+        vec_time = _time_call(lambda: intersect_lines(lines), repetitions)
+        results.append((n_lines, ref_time, vec_time))
+        logger.info(f"N={n_lines:5d} loop={ref_time * 1e3:10.2f} ms "
+                    f"vectorized={vec_time * 1e3:8.3f} ms "
+                    f"speedup={ref_time / vec_time:8.1f}x")
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Micro-benchmark of the all-pairs line intersection")
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[10, 25, 50, 100, 200])
+    parser.add_argument('--repetitions', type=int, default=10)
+    args = parser.parse_args()
+    run(args.sizes, args.repetitions)
@@ -0,0 +1,158 @@
+"""
+@author: Sebastian Cepeda
+@email: sebastian.cepeda.fuentealba@gmail.com
+"""
+
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from src.algorithms.vanishing_point_detector import VanishingPointsDetector
+from src.benchmarks.synthetic_scene import render_scene
+from src.processing.scheduler import KeyframeScheduler, fill_vanishing_points
+from src.processing.video_pipeline import read_video_frames
+from src.utils.print_logger import PrintLogger as logger
+
+
+def _synthetic_frames(n_frames, image_shape=(360, 640)):
+    """
+    Synthetic scenes whose vanishing point drifts slowly (the same seed
+    keeps the rest of the scene)
+    """
+    height, width = image_shape
+    frames = []
+    for frame_idx in range(n_frames):
+        t = frame_idx / max(1, n_frames - 1)
+        vp = (int(width * (0.35 + 0.3 * t)),
+              int(height * (0.35 + 0.1 * np.sin(2 * np.pi * t))))
+        frame, _ = render_scene(image_shape, vp=vp, seed=0)
+        frames.append(frame)
+    return frames
+
+
+def _load_frames(video_path, max_frames, scale):
+    video = cv2.VideoCapture(video_path)
+    if not video.isOpened():
+        raise Exception(f"Error loading video {video_path}")
+    frames = []
+    for frame in read_video_frames(video):
+        if len(frames) >= max_frames:
+            break
+        frames.append(cv2.resize(frame, None, fx=scale, fy=scale,
+                                 interpolation=cv2.INTER_AREA))
+    video.release()
+    return frames
+
+
+def _run_schedule(frames, scheduler, fill_mode):
+    vp_detector = VanishingPointsDetector('')
+    start = time.perf_counter()
+    frames_vps = []
+    n_keyframes = 0
+    for frame_idx, frame in enumerate(frames):
+        vp = None
+        if scheduler is None or scheduler.is_keyframe(frame_idx, frame):
+            n_keyframes += 1
+            vp_lines = vp_detector.execute(frame)
+            vp = vp_lines[0][0] if vp_lines else None
+        frames_vps.append((frame_idx, None, vp))
+    if fill_mode is None:
+        vps = [vp for _, _, vp in frames_vps]
+    else:
+        vps = [vp for _, _, vp, _ in fill_vanishing_points(frames_vps,
+                                                           fill_mode)]
+    elapsed = time.perf_counter() - start
+    return vps, elapsed, n_keyframes
+
+
+def _errors(vps, reference):
+    """
+    Distances to the reference vanishing points, over the frames where the
+    detection on every frame found one
+
+    :param vps: Vanishing point of each frame, None if it has none
+    :param reference: Detected vanishing point of each frame, None if it has
+    none
+    :return: (errors, frames skipped without reference vanishing point,
+    frames with a reference vanishing point missed by the schedule)
+    """
+    errors = []
+    skipped = 0
+    missed = 0
+    for vp, reference_vp in zip(vps, reference):
+        if reference_vp is None:
+            skipped += 1
+        elif vp is None:
+            missed += 1
+        else:
+            errors.append(np.hypot(vp[0] - reference_vp[0],
+                                   vp[1] - reference_vp[1]))
+    return np.array(errors, dtype=np.float64), skipped, missed
+
+
+def run(frames, intervals, change_thresholds, fill_mode):
+    """
+    Compares keyframe schedules against detection on every frame
+
+    :param frames: Video frames
+    :param intervals: Fixed keyframe intervals to test
+    :param change_thresholds: Change thresholds of the adaptive mode to test,
+    with the largest interval as maximum distance between keyframes
+    :param fill_mode: 'interpolate' or 'reuse'
+    :return: List of (name, keyframes, seconds, mean error, max error,
+    skipped frames, missed frames). The errors are only measured on the
+    frames where detection on every frame finds a vanishing point, the
+    others are skipped. Missed frames have a reference vanishing point but
+    none from the schedule (before its first detection)
+    """
+    reference, reference_time, _ = _run_schedule(frames, None, None)
+    schedules = [(f"every {interval}", KeyframeScheduler(interval))
+                 for interval in intervals]
+    max_interval = max(intervals)
+    schedules += [(f"adaptive {threshold}",
+                   KeyframeScheduler(max_interval, change_threshold=threshold))
+                  for threshold in change_thresholds]
+    results = []
+    n_reference = sum(1 for vp in reference if vp is not None)
+    logger.info(f"every frame: {len(frames)} keyframes "
+                f"{len(frames) / reference_time:7.2f} fps, "
+                f"{len(frames) - n_reference} frames without vanishing "
+                f"point skipped")
+    for name, scheduler in schedules:
+        vps, elapsed, n_keyframes = _run_schedule(frames, scheduler,
+                                                  fill_mode)
+        errors, skipped, missed = _errors(vps, reference)
+        mean_error = errors.mean() if errors.size > 0 else np.nan
+        max_error = errors.max() if errors.size > 0 else np.nan
+        results.append((name, n_keyframes, elapsed, mean_error, max_error,
+                        skipped, missed))
+        logger.info(f"{name}: {n_keyframes} keyframes "
+                    f"{len(frames) / elapsed:7.2f} fps "
+                    f"speedup={reference_time / elapsed:5.2f}x "
+                    f"error mean={mean_error:6.2f} px "
+                    f"max={max_error:6.2f} px "
+                    f"skipped={skipped} missed={missed}")
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Accuracy vs speed of the keyframe scheduler, with "
+                    "respect to detection on every frame")
+    parser.add_argument('--video', default=None,
+                        help="Video to use, synthetic frames if not given")
+    parser.add_argument('--max-frames', type=int, default=120)
+    parser.add_argument('--scale', type=float, default=0.5)
+    parser.add_argument('--intervals', type=int, nargs='+',
+                        default=[2, 4, 8])
+    parser.add_argument('--change-thresholds', type=float, nargs='+',
+                        default=[2.0, 5.0])
+    parser.add_argument('--fill-mode', default='interpolate')
+    args = parser.parse_args()
+    if args.video is None:
+        video_frames = _synthetic_frames(args.max_frames)
+    else:
+        video_frames = _load_frames(args.video, args.max_frames, args.scale)
+    run(video_frames, args.intervals, args.change_thresholds, args.fill_mode)
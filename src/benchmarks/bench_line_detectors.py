@@ -0,0 +1,154 @@
+"""
+@author: Sebastian Cepeda
+@email: sebastian.cepeda.fuentealba@gmail.com
+"""
+
+import argparse
+import json
+from collections import OrderedDict
+
+import numpy as np
+
+from src.algorithms.vanishing_point_detector import VanishingPointsDetector
+from src.benchmarks.synthetic_scene import render_scene
+from src.computer_vision.line_detectors import available_line_detectors
+from src.utils.print_logger import PrintLogger as logger
+
+# Synthetic stand-ins of the cameras: resolution, sensor noise and scene
+# clutter
+CAMERA_PROFILES = {
+    'dashcam_360p': {'image_shape': (360, 640), 'noise_level': 8.0,
+                     'n_lines': 24, 'n_clutter': 8},
+    'dashcam_720p': {'image_shape': (720, 1280), 'noise_level': 5.0,
+                     'n_lines': 24, 'n_clutter': 8},
+    'lowlight_720p': {'image_shape': (720, 1280), 'noise_level': 20.0,
+                      'n_lines': 24, 'n_clutter': 8},
+    'urban_1080p': {'image_shape': (1080, 1920), 'noise_level': 5.0,
+                    'n_lines': 48, 'n_clutter': 32},
+}
+
+
+def run_backend(line_detector, scenes, detector_params=None):
+    """
+    Runs the detector with one line detection backend over the scenes
+
+    :param line_detector: Name of the backend
+    :param scenes: List of (image, ground truth vanishing point)
+    :param detector_params: Other keyword arguments of the detector
+    :return: Dict with the mean time per frame and of the line stages (ms),
+    the detection rate and the localization error (px)
+    """
+    params = dict(detector_params or {}, line_detector=line_detector)
+    vp_detector = VanishingPointsDetector('', **params)
+    # Warm up of the per-shape state
+    vp_detector.execute(scenes[0][0])
+    total_times = []
+    lines_times = []
+    errors = []
+    for image, vp in scenes:
+        vp_lines = vp_detector.execute(image)
+        stats = vp_detector.last_stats.as_dict()
+        total_times.append(stats['total_time'])
+        lines_times.append(stats['edge_detection_time'] +
+                           stats['lines_detection_time'])
+        if len(vp_lines) == 0:
+            errors.append(np.inf)
+        else:
+            x, y = vp_lines[0][0]
+            errors.append(float(np.hypot(x - vp[0], y - vp[1])))
+    errors = np.array(errors)
+    detected = np.isfinite(errors)
+    result = OrderedDict()
+    result['ms_per_frame'] = 1e3 * float(np.mean(total_times))
+    result['lines_ms'] = 1e3 * float(np.mean(lines_times))
+    result['detection_rate'] = float(detected.mean())
+    result['error_median_px'] = float(np.median(errors[detected])) \
+        if detected.any() else float('inf')
+    result['error_p90_px'] = float(np.percentile(errors[detected], 90)) \
+        if detected.any() else float('inf')
+    return result
+
+
+def cheapest_backend(results, max_error, min_detection_rate):
+    """
+    Fastest backend that meets an accuracy target
+
+    :param results: Dict of backend name to its results (run_backend)
+    :param max_error: Maximum 90th percentile of the error, in pixels
+    :param min_detection_rate: Minimum share of scenes with a detection
+    :return: Name of the backend, None if no backend meets the target
+    """
+    accurate = [name for name, result in results.items()
+                if result['error_p90_px'] <= max_error and
+                result['detection_rate'] >= min_detection_rate]
+    if len(accurate) == 0:
+        return None
+    return min(accurate, key=lambda name: results[name]['ms_per_frame'])
+
+
+def run(profiles, line_detectors, n_scenes, max_error_ratio=0.02,
+        min_detection_rate=0.9, detector_params=None):
+    """
+    Compares the line detection backends on the same scenes of each camera
+    profile
+
+    :param profiles: Names of the camera profiles (keys of CAMERA_PROFILES)
+    :param line_detectors: Names of the backends
+    :param n_scenes: Number of scenes per profile
+    :param max_error_ratio: Accuracy target, maximum 90th percentile of the
+    error with respect to the image height
+    :param min_detection_rate: Accuracy target, minimum share of scenes with
+    a detection
+    :param detector_params: Other keyword arguments of the detector
+    :return: Dict of profile name to {'backends': results per backend,
+    'choice': cheapest backend meeting the target}
+    """
+    all_results = OrderedDict()
+    for profile in profiles:
+        scene_params = CAMERA_PROFILES[profile]
+        scenes = [render_scene(seed=seed, **scene_params)
+                  for seed in range(n_scenes)]
+        results = OrderedDict()
+        for line_detector in line_detectors:
+            result = run_backend(line_detector, scenes, detector_params)
+            results[line_detector] = result
+            logger.info(f"{profile} {line_detector:>8}: "
+                        f"{result['ms_per_frame']:7.1f} ms/frame "
+                        f"(lines {result['lines_ms']:6.1f} ms) "
+                        f"error median={result['error_median_px']:6.2f} px "
+                        f"p90={result['error_p90_px']:6.2f} px "
+                        f"detected={result['detection_rate']:.2f}")
+        max_error = max_error_ratio * scene_params['image_shape'][0]
+        choice = cheapest_backend(results, max_error, min_detection_rate)
+        logger.info(f"{profile}: cheapest backend with p90 error <= "
+                    f"{max_error:.1f} px and detection rate >= "
+                    f"{min_detection_rate:.2f}: {choice}")
+        all_results[profile] = {'backends': results, 'choice': choice}
+    return all_results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Throughput and localization error of the line "
+                    "detection backends on the same synthetic scenes")
+    parser.add_argument('--profiles', nargs='+',
+                        default=['dashcam_360p', 'dashcam_720p',
+                                 'lowlight_720p'],
+                        choices=list(CAMERA_PROFILES.keys()))
+    parser.add_argument('--line-detectors', nargs='+',
+                        default=available_line_detectors(),
+                        choices=available_line_detectors())
+    parser.add_argument('--scenes', type=int, default=10)
+    parser.add_argument('--max-error-ratio', type=float, default=0.02)
+    parser.add_argument('--min-detection-rate', type=float, default=0.9)
+    parser.add_argument('--output', default=None,
+                        help="Writes the results as JSON")
+    parser.add_argument('--detector-params', default='{}',
+                        help="JSON keyword arguments of the detector")
+    args = parser.parse_args()
+    all_results = run(args.profiles, args.line_detectors, args.scenes,
+                      args.max_error_ratio, args.min_detection_rate,
+                      json.loads(args.detector_params))
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(all_results, f, indent=2)
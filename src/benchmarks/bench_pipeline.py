@@ -0,0 +1,187 @@
+"""
+@author: Sebastian Cepeda
+@email: sebastian.cepeda.fuentealba@gmail.com
+"""
+
+import argparse
+import json
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from src.algorithms.vanishing_point_detector import VanishingPointsDetector
+from src.benchmarks.synthetic_scene import render_scene
+from src.computer_vision.line import line_from_2_points
+from src.computer_vision.vanishing_point import vps_from_lines, \
+    intersect_lines
+from src.computer_vision.vanishing_point_accumulator import \
+    VanishingPointAccumulatorFilter
+from src.utils.print_logger import PrintLogger as logger
+
+RESOLUTIONS = {
+    '360p': (360, 640),
+    '480p': (480, 854),
+    '720p': (720, 1280),
+    '1080p': (1080, 1920),
+    '2160p': (2160, 3840),
+}
+
+
+def _timed(method, *args, **kwargs):
+    start = time.perf_counter()
+    result = method(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def _stage_times(vp_detector, image):
+    """
+    Times each stage of the pipeline in isolation, with the parameters the
+    detector derives for the image shape
+    """
+    state = vp_detector._get_state(image.shape)
+    times = OrderedDict()
+    image_gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    image_gray = vp_detector.clahe.apply(image_gray)
+    image_gray, times['gabor'] = _timed(state.gabor_bank.execute, image_gray)
+    image_gray = cv2.GaussianBlur(image_gray, state.gaussian_shape, 0)
+    edges = None
+    # The backends that do not use edges run without Canny
+    if state.line_detector.uses_edges:
+        edges, times['canny'] = _timed(cv2.Canny, image_gray, 50, 200,
+                                       apertureSize=3)
+    segments, times['lines'] = _timed(state.line_detector.execute,
+                                      image_gray, edges)
+    segments = state.segment_filter.execute(segments, state.image_shape)
+    lines = [line_from_2_points(*segment[0]) for segment in segments]
+    (vps, vp_lines_map), times['vps_from_lines'] = _timed(vps_from_lines,
+                                                          lines)
+    vp_filter = VanishingPointAccumulatorFilter(accumulator_size=30,
+                                                count_threshold=3,
+                                                percentage_threshold=0.6)
+    _, times['accumulator'] = _timed(vp_filter.execute, state.image_shape,
+                                     vps, vp_lines_map)
+    lines = np.asarray(lines, dtype=np.float64).reshape(-1, 3)
+    (vps, idx1, idx2), times['intersect_lines'] = _timed(intersect_lines,
+                                                         lines)
+    _, times['accumulator_array'] = _timed(state.vp_filter.execute_array,
+                                           state.image_shape, vps, idx1,
+                                           idx2, lines)
+    return times
+
+
+def run_config(resolution, n_lines, noise_level, n_scenes,
+               detector_params=None):
+    """
+    Benchmarks the pipeline on synthetic scenes of one configuration
+
+    :param resolution: Name of the resolution (key of RESOLUTIONS)
+    :param n_lines: Number of segments converging to the vanishing point
+    :param noise_level: Standard deviation of the noise
+    :param n_scenes: Number of scenes
+    :param detector_params: Keyword arguments of the detector
+    :return: Dict with the mean time (ms) of each stage, the end to end
+    throughput (fps) and the localization error (px)
+    """
+    if detector_params is None:
+        detector_params = {}
+    image_shape = RESOLUTIONS[resolution]
+    vp_detector = VanishingPointsDetector('', **detector_params)
+    scenes = [render_scene(image_shape, n_lines=n_lines,
+                           n_clutter=n_lines // 3, noise_level=noise_level,
+                           seed=seed)
+              for seed in range(n_scenes)]
+    # Warm up of the per-shape state and the kernel caches
+    vp_detector.execute(scenes[0][0])
+    stage_times = []
+    total_times = []
+    errors = []
+    for image, vp in scenes:
+        stage_times.append(_stage_times(vp_detector, image))
+        vp_lines, elapsed = _timed(vp_detector.execute, image)
+        total_times.append(elapsed)
+        if len(vp_lines) == 0:
+            errors.append(np.inf)
+        else:
+            x, y = vp_lines[0][0]
+            errors.append(float(np.hypot(x - vp[0], y - vp[1])))
+    errors = np.array(errors)
+    detected = np.isfinite(errors)
+    result = OrderedDict()
+    for stage in stage_times[0].keys():
+        result[f"{stage}_ms"] = 1e3 * float(np.mean(
+            [times[stage] for times in stage_times]))
+    result['execute_ms'] = 1e3 * float(np.mean(total_times))
+    result['fps'] = 1.0 / float(np.mean(total_times))
+    result['detection_rate'] = float(detected.mean())
+    result['error_mean_px'] = float(errors[detected].mean()) \
+        if detected.any() else float('inf')
+    result['error_median_px'] = float(np.median(errors[detected])) \
+        if detected.any() else float('inf')
+    return result
+
+
+def _compare(name, result, baseline):
+    if name not in baseline:
+        return
+    reference = baseline[name]
+    speedup = reference['execute_ms'] / result['execute_ms']
+    error_delta = result['error_mean_px'] - reference['error_mean_px']
+    logger.info(f"  vs baseline: speedup={speedup:5.2f}x "
+                f"error mean delta={error_delta:+6.2f} px")
+
+
+def run(resolutions, line_counts, noise_levels, n_scenes, baseline=None,
+        detector_params=None):
+    """
+    Runs every configuration
+
+    :return: Dict of configuration name to its results
+    """
+    results = OrderedDict()
+    for resolution in resolutions:
+        for n_lines in line_counts:
+            for noise_level in noise_levels:
+                name = f"{resolution}_lines{n_lines}_noise{noise_level:g}"
+                result = run_config(resolution, n_lines, noise_level,
+                                    n_scenes, detector_params)
+                results[name] = result
+                stages = ' '.join(f"{key[:-3]}={value:.1f}"
+                                  for key, value in result.items()
+                                  if key.endswith('_ms'))
+                logger.info(f"{name}: {result['fps']:6.2f} fps "
+                            f"error mean={result['error_mean_px']:6.2f} px "
+                            f"detected={result['detection_rate']:.2f} "
+                            f"[ms: {stages}]")
+                if baseline is not None:
+                    _compare(name, result, baseline)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Throughput and localization error of the vanishing "
+                    "point pipeline on synthetic scenes")
+    parser.add_argument('--resolutions', nargs='+', default=['480p', '720p'],
+                        choices=list(RESOLUTIONS.keys()))
+    parser.add_argument('--lines', type=int, nargs='+', default=[16, 48])
+    parser.add_argument('--noise', type=float, nargs='+', default=[5.0])
+    parser.add_argument('--scenes', type=int, default=5)
+    parser.add_argument('--output', default=None,
+                        help="Writes the results as JSON, to be used as a "
+                             "baseline")
+    parser.add_argument('--baseline', default=None,
+                        help="JSON results of a previous run to compare with")
+    parser.add_argument('--detector-params', default='{}',
+                        help="JSON keyword arguments of the detector")
+    args = parser.parse_args()
+    baseline_results = None
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline_results = json.load(f)
+    all_results = run(args.resolutions, args.lines, args.noise, args.scenes,
+                      baseline_results, json.loads(args.detector_params))
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(all_results, f, indent=2)
@@ -0,0 +1,62 @@
+"""
+@author: Sebastian Cepeda
+@email: sebastian.cepeda.fuentealba@gmail.com
+"""
+
+import cv2
+import numpy as np
+
+from src.computer_vision.colors import WHITE_COLOR
+
+
+def render_scene(image_shape: tuple = (720, 1280),
+                 vp: tuple = None,
+                 n_lines: int = 24,
+                 n_clutter: int = 8,
+                 noise_level: float = 5.0,
+                 seed: int = 0):
+    """
+    Renders a synthetic perspective scene with a known vanishing point: a
+    textured background, segments converging to the vanishing point (road
+    marks and facade edges, stopping before it) and clutter segments with
+    random orientations.
+
+    :param image_shape: Shape (height, width) of the image
+    :param vp: Ground truth vanishing point (x, y), a random point around the
+    center of the image if None. It can lie outside of the image
+    :param n_lines: Number of segments converging to the vanishing point
+    :param n_clutter: Number of random segments
+    :param noise_level: Standard deviation of the gaussian noise, in gray
+    levels
+    :param seed: Seed of the random generator
+    :return: BGR image and the ground truth vanishing point
+    """
+    rng = np.random.RandomState(seed)
+    height, width = image_shape[0:2]
+    if vp is None:
+        vp = (int(width * rng.uniform(0.3, 0.7)),
+              int(height * rng.uniform(0.3, 0.6)))
+    thickness = max(2, int(height * 0.004))
+    background = rng.randint(60, 120, size=(height // 16 + 1,
+                                            width // 16 + 1))
+    background = cv2.resize(background.astype(np.uint8), (width, height),
+                            interpolation=cv2.INTER_LINEAR)
+    image = cv2.cvtColor(background, cv2.COLOR_GRAY2BGR)
+    vp_array = np.array(vp, dtype=np.float64)
+    for _ in range(n_lines):
+        # Segment on the line from a random point of the image to the
+        # vanishing point, stopping before reaching it
+        far = np.array((rng.uniform(0, width - 1), rng.uniform(0, height - 1)))
+        start = far + (vp_array - far) * rng.uniform(0.0, 0.2)
+        end = far + (vp_array - far) * rng.uniform(0.6, 0.95)
+        gray = int(rng.randint(170, 256))
+        cv2.line(image, tuple(int(v) for v in start),
+                 tuple(int(v) for v in end), (gray, gray, gray), thickness)
+    for _ in range(n_clutter):
+        p1 = rng.randint(0, width), rng.randint(0, height)
+        p2 = rng.randint(0, width), rng.randint(0, height)
+        cv2.line(image, p1, p2, WHITE_COLOR, thickness)
+    if noise_level > 0:
+        noise = rng.normal(0, noise_level, size=image.shape)
+        image = np.clip(image + noise, 0, 255).astype(np.uint8)
+    return image, vp
@@ -3,9 +3,109 @@
 @email: sebastian.cepeda.fuentealba@gmail.com
 """
 
+from functools import lru_cache
+
 import cv2
 import numpy as np
 
+KERNELS_CACHE_SIZE = 32
+SPECTRA_CACHE_SIZE = 2
+# Pixels per block of the synthesis of the steerable method
+STEERABLE_CHUNK_SIZE = 65536
+
+
+@lru_cache(maxsize=KERNELS_CACHE_SIZE)
+def gabor_kernels(ksize: int,
+                  angle_steps: int,
+                  sigma: float,
+                  lambd: float,
+                  gamma: float):
+    """
+    Builds the normalized kernels of a gabor filter bank. The kernels are
+    cached by their parameters (least recently used are evicted), so they are
+    built once per bank configuration.
+
+    :param ksize: Size of the kernels
+    :param angle_steps: Number of angles (theta) in [0, pi)
+    :param sigma: Standard deviation of the gaussian envelope
+    :param lambd: Wavelength of the sinusoidal factor
+    :param gamma: Spatial aspect ratio
+    :return: Tuple of read-only kernels, one per angle
+    """
+    params = {
+        'ksize': (ksize, ksize),
+        'sigma': sigma,
+        'lambd': lambd,
+        'gamma': gamma,
+        'psi': 0,
+        'ktype': cv2.CV_32F
+    }
+    kernels = []
+    for theta in np.arange(0, np.pi, np.pi / angle_steps):
+        params['theta'] = theta
+        kernel = cv2.getGaborKernel(**params)
+        norm = kernel.sum()
+        kernel /= norm
+        kernel.setflags(write=False)
+        kernels.append(kernel)
+    return tuple(kernels)
+
+
+@lru_cache(maxsize=SPECTRA_CACHE_SIZE)
+def _gabor_kernels_spectra(ksize, angle_steps, sigma, lambd, gamma,
+                           dft_shape):
+    """
+    Spectra (CCS packed, float32) of the kernels of a gabor filter bank,
+    zero padded to dft_shape. They take as much memory as angle_steps float32
+    images of dft_shape, so only a few shapes are cached.
+    """
+    spectra = []
+    for kernel in gabor_kernels(ksize, angle_steps, sigma, lambd, gamma):
+        padded_kernel = np.zeros(dft_shape, dtype=np.float32)
+        padded_kernel[0:kernel.shape[0], 0:kernel.shape[1]] = kernel
+        spectrum = cv2.dft(padded_kernel)
+        spectrum.setflags(write=False)
+        spectra.append(spectrum)
+    return tuple(spectra)
+
+
+@lru_cache(maxsize=KERNELS_CACHE_SIZE)
+def gabor_basis(ksize: int,
+                angle_steps: int,
+                sigma: float,
+                lambd: float,
+                gamma: float,
+                basis_size: int):
+    """
+    Low rank basis of a gabor filter bank: the kernels are approximated as
+    linear combinations of the first basis_size singular vectors of the stack
+    of kernels, so that the response at every angle is synthesized from
+    basis_size filtered images. Cached by its parameters.
+
+    :param ksize: Size of the kernels
+    :param angle_steps: Number of angles (theta) in [0, pi)
+    :param sigma: Standard deviation of the gaussian envelope
+    :param lambd: Wavelength of the sinusoidal factor
+    :param gamma: Spatial aspect ratio
+    :param basis_size: Number of basis kernels
+    :return: Tuple of read-only basis kernels, read-only coefficients of
+    each angle (angle_steps, basis_size) and share of the energy of the
+    kernels kept by the basis
+    """
+    kernels = gabor_kernels(ksize, angle_steps, sigma, lambd, gamma)
+    stack = np.stack([kernel.ravel() for kernel in kernels])
+    u, s, vt = np.linalg.svd(stack.astype(np.float64), full_matrices=False)
+    basis_size = min(basis_size, s.shape[0])
+    basis = []
+    for vector in vt[0:basis_size]:
+        kernel = vector.reshape(kernels[0].shape).astype(np.float32)
+        kernel.setflags(write=False)
+        basis.append(kernel)
+    coefficients = (u[:, 0:basis_size] * s[0:basis_size]).astype(np.float32)
+    coefficients.setflags(write=False)
+    energy = float(np.sum(s[0:basis_size] ** 2) / np.sum(s ** 2))
+    return tuple(basis), coefficients, energy
+
 
 class GaborBank:
 
@@ -15,6 +115,9 @@ class GaborBank:
                  sigma: float = 0.9,
                  lambd: float = 100,
                  gamma: float = 0.1,
+                 method: str = 'auto',
+                 fft_ksize_threshold: int = 15,
+                 basis_size: int = 4,
                  ):
         """
         Constructor of the Gabor filter bank
@@ -23,36 +126,149 @@ class GaborBank:
         :param sigma:
         :param lambd:
         :param gamma:
+        :param method: 'direct' (one filter2D per angle), 'fft' (one forward
+        DFT of the image shared by all the angles), 'auto' (fft when ksize
+        is at least fft_ksize_threshold) or 'steerable' (approximation: one
+        filter2D per basis kernel, see gabor_basis, and the response of each
+        angle as a per pixel linear combination of them)
+        :param fft_ksize_threshold: Kernel size from which 'auto' uses fft
+        :param basis_size: Number of basis kernels of the steerable method
         """
+        if method not in ('direct', 'fft', 'auto', 'steerable'):
+            raise ValueError(f"Unknown gabor bank method: {method}")
         self.ksize = ksize
         self.angle_steps = angle_steps
         self.sigma = sigma
         self.lambd = lambd
         self.gamma = gamma
+        self.method = method
+        self.fft_ksize_threshold = fft_ksize_threshold
+        self.basis_size = basis_size
+
+    @property
+    def kernels(self):
+        """
+        Normalized kernels of the bank, one per angle
+        """
+        return gabor_kernels(self.ksize, self.angle_steps, self.sigma,
+                             self.lambd, self.gamma)
+
+    def _use_fft(self):
+        if self.method == 'auto':
+            return self.ksize >= self.fft_ksize_threshold
+        return self.method == 'fft'
+
+    def _execute_direct(self, image_gray, gabor_bank_result):
+        for kernel in self.kernels:
+            filtered_image = cv2.filter2D(image_gray, cv2.CV_8U, kernel)
+            np.maximum(gabor_bank_result, filtered_image,
+                       out=gabor_bank_result)
+        return gabor_bank_result
+
+    def _execute_fft(self, image_gray, gabor_bank_result):
+        height, width = image_gray.shape[0:2]
+        kernel_size = self.kernels[0].shape[0]
+        radius = kernel_size // 2
+        # Same border as filter2D
+        padded_image = cv2.copyMakeBorder(image_gray, radius, radius, radius,
+                                          radius, cv2.BORDER_REFLECT_101)
+        dft_shape = (cv2.getOptimalDFTSize(height + 2 * radius),
+                     cv2.getOptimalDFTSize(width + 2 * radius))
+        dft_image = np.zeros(dft_shape, dtype=np.float32)
+        dft_image[0:padded_image.shape[0], 0:padded_image.shape[1]] = \
+            padded_image
+        image_spectrum = cv2.dft(dft_image)
+        spectra = _gabor_kernels_spectra(self.ksize, self.angle_steps,
+                                         self.sigma, self.lambd, self.gamma,
+                                         dft_shape)
+        filtered_image = np.empty((height, width), dtype=np.uint8)
+        for kernel_spectrum in spectra:
+            # Correlation, as filter2D, is the product with the conjugate
+            product = cv2.mulSpectrums(image_spectrum, kernel_spectrum, 0,
+                                       conjB=True)
+            correlation = cv2.idft(product, flags=cv2.DFT_SCALE |
+                                   cv2.DFT_REAL_OUTPUT)
+            # Saturated rounding to 8 bits, as filter2D with CV_8U output
+            correlation[0:height, 0:width].round(out=correlation[0:height,
+                                                                 0:width])
+            np.clip(correlation[0:height, 0:width], 0, 255,
+                    out=correlation[0:height, 0:width])
+            filtered_image[:] = correlation[0:height, 0:width]
+            np.maximum(gabor_bank_result, filtered_image,
+                       out=gabor_bank_result)
+        return gabor_bank_result
+
+    def _execute_steerable(self, image_gray, gabor_bank_result):
+        basis, coefficients, _ = gabor_basis(self.ksize, self.angle_steps,
+                                             self.sigma, self.lambd,
+                                             self.gamma, self.basis_size)
+        responses = np.empty((len(basis),) + image_gray.shape,
+                             dtype=np.float32)
+        for kernel, response in zip(basis, responses):
+            cv2.filter2D(image_gray, cv2.CV_32F, kernel, dst=response)
+        responses = responses.reshape(len(basis), -1)
+        n_pixels = responses.shape[1]
+        maximum = np.empty(n_pixels, dtype=np.float32)
+        angles = np.empty((coefficients.shape[0],
+                           min(STEERABLE_CHUNK_SIZE, n_pixels)),
+                          dtype=np.float32)
+        for start in range(0, n_pixels, STEERABLE_CHUNK_SIZE):
+            end = min(start + STEERABLE_CHUNK_SIZE, n_pixels)
+            block = angles[:, 0:end - start]
+            np.matmul(coefficients, responses[:, start:end], out=block)
+            block.max(axis=0, out=maximum[start:end])
+        # Rounding and saturation commute with the maximum, so they are
+        # applied once, with the result of filter2D with CV_8U output
+        maximum.round(out=maximum)
+        np.clip(maximum, 0, 255, out=maximum)
+        gabor_bank_result[:] = maximum.reshape(image_gray.shape)
+        return gabor_bank_result
+
+    def approximation_error(self, image_gray: np.ndarray):
+        """
+        Error of the steerable method with respect to the exact bank
+
+        :param image_gray: Image to process
+        :return: Dictionary with the mean, 99th percentile and maximum of the
+        absolute error (gray levels) and the energy of the kernels kept by
+        the basis
+        """
+        exact_method = 'direct' if self.method == 'steerable' else \
+            self.method
+        exact = GaborBank(self.ksize, self.angle_steps, self.sigma,
+                          self.lambd, self.gamma, exact_method,
+                          self.fft_ksize_threshold).execute(image_gray)
+        approximation = self._execute_steerable(image_gray,
+                                                np.zeros_like(image_gray))
+        error = np.abs(exact.astype(np.int16) - approximation)
+        _, _, energy = gabor_basis(self.ksize, self.angle_steps, self.sigma,
+                                   self.lambd, self.gamma, self.basis_size)
+        return {
+            'mean_abs_error': float(error.mean()),
+            'p99_abs_error': float(np.percentile(error, 99)),
+            'max_abs_error': int(error.max()),
+            'energy': energy,
+        }
 
     def execute(self,
-                image_gray: np.ndarray):
+                image_gray: np.ndarray,
+                out: np.ndarray = None):
         """
         Passes the image through a gabor filter bank, taking the maximum over
         all the applied angles (theta).
 
         :param image_gray: Image to process
+        :param out: Optional preallocated output, with the shape and type of
+        image_gray
         :return: Processed image
         """
-        params = {
-            'ksize': (self.ksize, self.ksize),
-            'sigma': self.sigma,
-            'lambd': self.lambd,
-            'gamma': self.gamma,
-            'psi': 0,
-            'ktype': cv2.CV_32F
-        }
-        gabor_bank_result = np.zeros_like(image_gray)
-        for theta in np.arange(0, np.pi, np.pi / self.angle_steps):
-            params['theta'] = theta
-            kernel = cv2.getGaborKernel(**params)
-            norm = kernel.sum()
-            kernel /= norm
-            filtered_image = cv2.filter2D(image_gray, cv2.CV_8U, kernel)
-            np.maximum(gabor_bank_result, filtered_image, gabor_bank_result)
-        return gabor_bank_result
+        if out is None:
+            gabor_bank_result = np.zeros_like(image_gray)
+        else:
+            gabor_bank_result = out
+            gabor_bank_result.fill(0)
+        if self.method == 'steerable':
+            return self._execute_steerable(image_gray, gabor_bank_result)
+        if self._use_fft():
+            return self._execute_fft(image_gray, gabor_bank_result)
+        return self._execute_direct(image_gray, gabor_bank_result)
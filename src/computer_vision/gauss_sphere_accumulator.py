@@ -0,0 +1,171 @@
+"""
+@author: Sebastian Cepeda
+@email: sebastian.cepeda.fuentealba@gmail.com
+"""
+
+import numpy as np
+
+# Minimum z of a direction when it is projected back to the image, points at
+# infinity are reported that far away (1 / MIN_Z focal lengths)
+MIN_Z = 10.0 ** -3.0
+DIRECTION_TOLERANCE = 10.0 ** -12.0
+
+
+def lines_directions(image_shape, focal, lines, idx1, idx2):
+    """
+    Intersects pairs of lines as directions on the Gauss sphere. The image
+    plane is placed at distance focal of the center of projection, in front
+    of the image center, so parallel lines give directions with z = 0 instead
+    of being discarded.
+
+    :param image_shape: Image shape
+    :param focal: Focal length, in pixels
+    :param lines: Lines coefficients, array of shape (N, 3)
+    :param idx1: Index of the first line of each pair
+    :param idx2: Index of the second line of each pair
+    :return: Unit directions of the intersections (M, 3), with z >= 0, and
+    the index arrays of the pairs of lines that originate them (coincident
+    lines are discarded)
+    """
+    cy, cx = image_shape[0] / 2, image_shape[1] / 2
+    norms = np.hypot(lines[:, 0], lines[:, 1])
+    norms[norms == 0] = 1.0
+    # Lines in the centered and focal normalized coordinates
+    planes = np.empty(lines.shape, dtype=np.float64)
+    planes[:, 0] = lines[:, 0] / norms
+    planes[:, 1] = lines[:, 1] / norms
+    planes[:, 2] = (lines[:, 2] + lines[:, 0] * cx + lines[:, 1] * cy) / \
+        (norms * focal)
+    directions = np.cross(planes[idx1], planes[idx2])
+    lengths = np.linalg.norm(directions, axis=1)
+    valid = lengths > DIRECTION_TOLERANCE
+    directions = directions[valid] / lengths[valid, None]
+    # Antipodal directions are the same vanishing point
+    x, y, z = directions[:, 0], directions[:, 1], directions[:, 2]
+    flip = (z < 0) | ((z == 0) & ((y < 0) | ((y == 0) & (x < 0))))
+    directions[flip] *= -1
+    return directions, idx1[valid], idx2[valid]
+
+
+def octahedral_cells(directions, grid_size):
+    """
+    Bins unit directions of the upper hemisphere with the octahedral map,
+    which sends the hemisphere to the square [-1, 1]^2 without singularities
+
+    :param directions: Unit directions (M, 3), with z >= 0
+    :param grid_size: Number of cells per side of the grid
+    :return: Flat cell index of each direction
+    """
+    u = directions[:, 0:2] / np.abs(directions).sum(axis=1)[:, None]
+    # Diamond |u| + |v| <= 1 rotated 45 degrees onto the square
+    square = np.stack((u[:, 0] + u[:, 1], u[:, 1] - u[:, 0]), axis=1)
+    cells = np.floor((square + 1) * (grid_size / 2)).astype(np.int64)
+    np.clip(cells, 0, grid_size - 1, out=cells)
+    return cells[:, 1] * grid_size + cells[:, 0]
+
+
+class GaussSphereAccumulatorFilter:
+
+    def __init__(self,
+                 grid_size: int = 90,
+                 focal_ratio: float = 1.0,
+                 count_threshold: int = 2,
+                 percentage_threshold: float = 0.6,
+                 merge_cells: float = 2.0):
+        """
+        Constructor of GaussSphereAccumulatorFilter. Vanishing points are
+        voted as directions on the Gauss sphere, binned in a dense grid of
+        fixed size, so points far away of the image or at infinity are
+        represented as well as the near ones, and the memory and binning cost
+        do not depend on where the intersections land.
+
+        :param grid_size: Number of cells per side of the accumulator
+        :param focal_ratio: Focal length, with respect to the image width
+        :param count_threshold: Minimum number of votes of a vanishing point
+        :param percentage_threshold: Minimum number of votes of a vanishing
+        point, with respect to the maximum
+        :param merge_cells: Vanishing points closer than these many cells
+        (as an angle) are merged
+        """
+        self.grid_size = grid_size
+        self.focal_ratio = focal_ratio
+        self.count_threshold = count_threshold
+        self.percentage_threshold = percentage_threshold
+        self.merge_cells = merge_cells
+        self.last_cells = 0
+        self.last_max_count = 0
+        self.last_votes = 0
+
+    def _to_image(self, image_shape, focal, direction):
+        x, y, z = direction
+        if z < 0:
+            x, y, z = -x, -y, -z
+        z = max(z, MIN_Z)
+        cy, cx = image_shape[0] / 2, image_shape[1] / 2
+        return int(cx + focal * x / z), int(cy + focal * y / z)
+
+    def execute(self, image_shape: tuple, lines: np.ndarray):
+        """
+        Detects the vanishing points of a set of lines
+
+        :param image_shape: Image shape
+        :param lines: Lines coefficients, array of shape (N, 3)
+        :return: List of vanishing points and the lines that originate them,
+        sorted by number of votes. Points at infinity are given far away in
+        their direction
+        """
+        lines = np.asarray(lines, dtype=np.float64).reshape(-1, 3)
+        self.last_cells = 0
+        self.last_max_count = 0
+        self.last_votes = 0
+        if lines.shape[0] < 2:
+            return []
+        focal = image_shape[1] * self.focal_ratio
+        idx1, idx2 = np.triu_indices(lines.shape[0], k=1)
+        directions, idx1, idx2 = lines_directions(image_shape, focal, lines,
+                                                  idx1, idx2)
+        n_votes = directions.shape[0]
+        self.last_votes = n_votes
+        if n_votes == 0:
+            return []
+        grid_size = self.grid_size
+        cell_angle = np.pi / grid_size
+        # Directions near the equator also vote in their antipodal cell, so
+        # the votes of a point at infinity are not split
+        near_equator = np.flatnonzero(directions[:, 2] < cell_angle)
+        votes = np.concatenate((np.arange(n_votes), near_equator))
+        signs = np.ones(votes.shape[0])
+        signs[n_votes:] = -1
+        # The octahedral map only uses |z|, antipodes map to (-x, -y)
+        cells = np.concatenate((
+            octahedral_cells(directions, grid_size),
+            octahedral_cells(-directions[near_equator], grid_size)))
+        accumulator = np.bincount(cells, minlength=grid_size * grid_size)
+        max_acc = accumulator.max()
+        self.last_cells = int(np.count_nonzero(accumulator))
+        self.last_max_count = int(max_acc)
+        valid_cells = np.flatnonzero(
+            (accumulator >= self.count_threshold) &
+            (accumulator / max_acc >= self.percentage_threshold))
+        valid_cells = valid_cells[np.argsort(-accumulator[valid_cells],
+                                             kind='stable')]
+        min_cos = np.cos(self.merge_cells * cell_angle)
+        lines_list = lines.tolist()
+        vp_lines = []
+        kept = []
+        for cell in valid_cells:
+            members = cells == cell
+            cell_votes = votes[members]
+            direction = (directions[cell_votes] *
+                         signs[members, None]).sum(axis=0)
+            direction /= np.linalg.norm(direction)
+            if any(abs(np.dot(direction, other)) > min_cos
+                   for other in kept):
+                continue
+            kept.append(direction)
+            lines_idx = np.unique(np.concatenate((idx1[cell_votes],
+                                                  idx2[cell_votes])))
+            lines_in = [tuple(lines_list[i]) for i in lines_idx]
+            vp = self._to_image(image_shape, focal, direction)
+            vp_lines.append((vp, lines_in))
+        return vp_lines
@@ -21,6 +21,24 @@ def line_from_2_points(x1, y1, x2, y2):
     return a, b, c
 
 
+def lines_from_segments(segments):
+    """
+    Gets the coefficients of the lines of many segments at once, as
+    line_from_2_points does for one
+
+    :param segments: Segments (x1, y1, x2, y2), array of shape (K, 4) or
+    (K, 1, 4) as given by HoughLinesP
+    :return: Lines coefficients, float array of shape (K, 3)
+    """
+    segments = np.asarray(segments, dtype=np.float64).reshape(-1, 4)
+    x1, y1, x2, y2 = segments.T
+    lines = np.empty((segments.shape[0], 3), dtype=np.float64)
+    np.subtract(y1, y2, out=lines[:, 0])
+    np.subtract(x2, x1, out=lines[:, 1])
+    np.subtract(x1 * y2, x2 * y1, out=lines[:, 2])
+    return lines
+
+
 def segment_from_line_equation(line, image_shape):
     """
     Creates a segment, covering the size of a whole image, from a line
@@ -0,0 +1,267 @@
+"""
+@author: Sebastian Cepeda
+@email: sebastian.cepeda.fuentealba@gmail.com
+"""
+
+import cv2
+import numpy as np
+
+
+def _no_segments():
+    return np.empty((0, 1, 4), dtype=np.float32)
+
+
+class HoughSegmentDetector:
+    """
+    Probabilistic Hough transform (cv2.HoughLinesP) over the edges
+    """
+    uses_edges = True
+
+    def __init__(self, image_shape: tuple):
+        """
+        Constructor of HoughSegmentDetector
+
+        :param image_shape: Shape of the images to process
+        """
+        self.max_line_gap = max(1, int(image_shape[0] * 0.10))
+
+    @staticmethod
+    def is_available():
+        return True
+
+    def execute(self, image_gray, edges):
+        """
+        Detects the segments of an image
+
+        :param image_gray: Preprocessed gray image
+        :param edges: Edges of the image
+        :return: Segments, array of shape (K, 1, 4)
+        """
+        px_resolution = 1
+        segments = cv2.HoughLinesP(edges, px_resolution, np.pi / 180, 100,
+                                   maxLineGap=self.max_line_gap)
+        if segments is None:
+            return _no_segments()
+        return segments
+
+
+class LsdSegmentDetector:
+    """
+    Line segment detector of OpenCV (cv2.createLineSegmentDetector), over
+    the gray image. Not available in the OpenCV versions from 3.4.6 to 4.5.0
+    """
+    uses_edges = False
+
+    def __init__(self, image_shape: tuple):
+        """
+        Constructor of LsdSegmentDetector
+
+        :param image_shape: Shape of the images to process
+        """
+        self.detector = cv2.createLineSegmentDetector()
+
+    @staticmethod
+    def is_available():
+        try:
+            cv2.createLineSegmentDetector()
+        except (AttributeError, cv2.error):
+            return False
+        return True
+
+    def execute(self, image_gray, edges=None):
+        """
+        Detects the segments of an image
+
+        :param image_gray: Preprocessed gray image
+        :param edges: Unused
+        :return: Segments, array of shape (K, 1, 4)
+        """
+        segments = self.detector.detect(image_gray)[0]
+        if segments is None:
+            return _no_segments()
+        return segments
+
+
+class FastLineSegmentDetector:
+    """
+    Fast line detector of opencv-contrib (cv2.ximgproc), over the gray image
+    """
+    uses_edges = False
+
+    def __init__(self, image_shape: tuple):
+        """
+        Constructor of FastLineSegmentDetector
+
+        :param image_shape: Shape of the images to process
+        """
+        length_threshold = max(10, int(image_shape[0] * 0.02))
+        self.detector = cv2.ximgproc.createFastLineDetector(
+            length_threshold=length_threshold)
+
+    @staticmethod
+    def is_available():
+        return hasattr(cv2, 'ximgproc') and \
+            hasattr(cv2.ximgproc, 'createFastLineDetector')
+
+    def execute(self, image_gray, edges=None):
+        """
+        Detects the segments of an image
+
+        :param image_gray: Preprocessed gray image
+        :param edges: Unused
+        :return: Segments, array of shape (K, 1, 4)
+        """
+        segments = self.detector.detect(image_gray)
+        if segments is None:
+            return _no_segments()
+        return segments
+
+
+class GradientSegmentDetector:
+    """
+    Line support regions: the edge pixels are grouped by gradient
+    orientation into connected regions, and a line is fitted to each region
+    (principal axis of its pixels, with the extent of their projections).
+    The orientations are binned twice, the second binning shifted by half a
+    bin, so that a line whose orientation falls near the border of a bin is
+    not split in two regions
+    """
+    uses_edges = True
+
+    def __init__(self,
+                 image_shape: tuple,
+                 orientation_bins: int = 4,
+                 min_pixels_ratio: float = 0.02,
+                 max_width: float = 1.5):
+        """
+        Constructor of GradientSegmentDetector
+
+        :param image_shape: Shape of the images to process
+        :param orientation_bins: Number of gradient orientation bins in
+        [0, pi)
+        :param min_pixels_ratio: Minimum number of pixels of a region, with
+        respect to the image height
+        :param max_width: Maximum standard deviation of the pixels of a
+        region across its line, in pixels
+        """
+        if orientation_bins < 2:
+            raise ValueError("orientation_bins must be at least 2")
+        self.orientation_bins = orientation_bins
+        self.min_pixels = max(5, int(image_shape[0] * min_pixels_ratio))
+        self.max_width = max_width
+        self._mask = np.zeros(image_shape[0:2], dtype=np.uint8)
+
+    @staticmethod
+    def is_available():
+        return True
+
+    def _regions(self, xs, ys, bins):
+        # Connected regions of the edge pixels of each orientation bin, as
+        # one label per pixel. Each bin is labelled on its own, so that
+        # pixels of a bin joined only through pixels of other bins are
+        # different regions
+        labels = np.empty(xs.shape[0], dtype=np.int64)
+        mask = self._mask
+        n_labels = 0
+        for orientation_bin in range(self.orientation_bins):
+            in_bin = np.flatnonzero(bins == orientation_bin)
+            if in_bin.shape[0] == 0:
+                continue
+            mask.fill(0)
+            mask[ys[in_bin], xs[in_bin]] = 1
+            n_bin_labels, bin_labels = cv2.connectedComponents(
+                mask, connectivity=8, ltype=cv2.CV_32S)
+            # Label 0 is the background, never taken by these pixels
+            labels[in_bin] = bin_labels[ys[in_bin], xs[in_bin]] + \
+                (n_labels - 1)
+            n_labels += n_bin_labels - 1
+        return labels, n_labels
+
+    def _fit(self, xs, ys, labels, n_labels):
+        # Principal axis of the pixels of each region, from their moments
+        counts = np.bincount(labels, minlength=n_labels)
+        valid = counts >= self.min_pixels
+        counts = np.maximum(counts, 1)
+        mx = np.bincount(labels, xs, n_labels) / counts
+        my = np.bincount(labels, ys, n_labels) / counts
+        dx = xs - mx[labels]
+        dy = ys - my[labels]
+        cxx = np.bincount(labels, dx * dx, n_labels) / counts
+        cyy = np.bincount(labels, dy * dy, n_labels) / counts
+        cxy = np.bincount(labels, dx * dy, n_labels) / counts
+        theta = 0.5 * np.arctan2(2 * cxy, cxx - cyy)
+        ux, uy = np.cos(theta), np.sin(theta)
+        # Spread across the axis (smallest eigenvalue of the covariance)
+        minor = (cxx + cyy) / 2 - np.sqrt(((cxx - cyy) / 2) ** 2 + cxy ** 2)
+        valid &= minor <= self.max_width ** 2
+        # Extent of the projections of each region on its axis
+        t = dx * ux[labels] + dy * uy[labels]
+        t_min = np.full(n_labels, np.inf)
+        t_max = np.full(n_labels, -np.inf)
+        np.minimum.at(t_min, labels, t)
+        np.maximum.at(t_max, labels, t)
+        ids = np.flatnonzero(valid)
+        return np.stack((mx[ids] + ux[ids] * t_min[ids],
+                         my[ids] + uy[ids] * t_min[ids],
+                         mx[ids] + ux[ids] * t_max[ids],
+                         my[ids] + uy[ids] * t_max[ids]), axis=1)
+
+    def execute(self, image_gray, edges):
+        """
+        Detects the segments of an image
+
+        :param image_gray: Preprocessed gray image
+        :param edges: Edges of the image
+        :return: Segments, array of shape (K, 1, 4)
+        """
+        ys, xs = np.nonzero(edges)
+        if xs.shape[0] == 0:
+            return _no_segments()
+        gx = cv2.Sobel(image_gray, cv2.CV_32F, 1, 0, ksize=3)
+        gy = cv2.Sobel(image_gray, cv2.CV_32F, 0, 1, ksize=3)
+        angles = np.arctan2(gy[ys, xs], gx[ys, xs]) % np.pi
+        angles *= self.orientation_bins / np.pi
+        fx = xs.astype(np.float64)
+        fy = ys.astype(np.float64)
+        segments = []
+        for shift in (0.0, 0.5):
+            bins = (angles + shift).astype(np.int64) % self.orientation_bins
+            labels, n_labels = self._regions(xs, ys, bins)
+            segments.append(self._fit(fx, fy, labels, n_labels))
+        # Regions not cut by either binning give the same segment twice
+        segments = np.unique(np.concatenate(segments), axis=0)
+        return segments.astype(np.float32).reshape(-1, 1, 4)
+
+
+LINE_DETECTORS = {
+    'hough': HoughSegmentDetector,
+    'lsd': LsdSegmentDetector,
+    'fld': FastLineSegmentDetector,
+    'gradient': GradientSegmentDetector,
+}
+
+
+def available_line_detectors():
+    """
+    Names of the line detectors available with the installed OpenCV
+
+    :return: List of names
+    """
+    return [name for name, detector in LINE_DETECTORS.items()
+            if detector.is_available()]
+
+
+def create_line_detector(name: str, image_shape: tuple):
+    """
+    Creates a line detector
+
+    :param name: Name of the detector (see LINE_DETECTORS)
+    :param image_shape: Shape of the images to process
+    :return: Line detector
+    """
+    if name not in LINE_DETECTORS:
+        raise ValueError(f"Unknown line detector: {name}")
+    if not LINE_DETECTORS[name].is_available():
+        raise ValueError(f"Line detector not available in this OpenCV "
+                         f"build: {name}")
+    return LINE_DETECTORS[name](image_shape)
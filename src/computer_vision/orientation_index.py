@@ -0,0 +1,90 @@
+"""
+@author: Sebastian Cepeda
+@email: sebastian.cepeda.fuentealba@gmail.com
+"""
+
+import numpy as np
+
+
+def lines_angles(lines):
+    """
+    Orientation of lines, in degrees in [0, 180)
+
+    :param lines: Lines coefficients, array of shape (N, 3)
+    :return: Angles of the lines
+    """
+    return np.degrees(np.arctan2(lines[:, 1], lines[:, 0])) % 180.0
+
+
+class OrientationIndex:
+
+    def __init__(self,
+                 min_angle: float = 2.0,
+                 bucket_size: float = 5.0,
+                 max_per_bucket: int = None):
+        """
+        Constructor of OrientationIndex. Lines are sorted by angle once per
+        frame, and only the pairs of lines whose angular separation is at
+        least min_angle are intersected: nearly parallel pairs give noisy and
+        far away intersections, and dominate the pair count when most lines
+        share an orientation (e.g. building facades).
+
+        :param min_angle: Minimum angular separation of a pair of lines, in
+        degrees
+        :param bucket_size: Size of the angle buckets, in degrees
+        :param max_per_bucket: Optional maximum number of lines per bucket,
+        the strongest are kept
+        """
+        self.min_angle = min_angle
+        self.bucket_size = bucket_size
+        self.max_per_bucket = max_per_bucket
+        self.last_pairs = 0
+
+    def _capped_lines(self, angles, weights):
+        buckets = np.floor(angles / self.bucket_size).astype(np.int64)
+        order = np.lexsort((-weights, buckets))
+        sorted_buckets = buckets[order]
+        starts = np.searchsorted(sorted_buckets, sorted_buckets, side='left')
+        rank = np.arange(order.shape[0]) - starts
+        return np.sort(order[rank < self.max_per_bucket])
+
+    def execute(self, lines: np.ndarray, weights: np.ndarray = None):
+        """
+        Candidate pairs of lines to intersect
+
+        :param lines: Lines coefficients, array of shape (N, 3)
+        :param weights: Strength of each line, used by the bucket caps. By
+        default the norm of (a, b), which is the length of the segment for
+        lines built from segments
+        :return: Index arrays (idx1, idx2) of the pairs, with idx1 < idx2, in
+        the order of np.triu_indices
+        """
+        lines = np.asarray(lines, dtype=np.float64).reshape(-1, 3)
+        angles = lines_angles(lines)
+        selected = np.arange(lines.shape[0])
+        if self.max_per_bucket is not None:
+            if weights is None:
+                weights = np.hypot(lines[:, 0], lines[:, 1])
+            selected = self._capped_lines(angles, np.asarray(weights))
+        order = selected[np.argsort(angles[selected], kind='stable')]
+        sorted_angles = angles[order]
+        n_lines = order.shape[0]
+        # The separation of sorted angles t_i <= t_j is min(d, 180 - d), with
+        # d = t_j - t_i, so the partners of i are a contiguous range
+        start = np.searchsorted(sorted_angles, sorted_angles + self.min_angle,
+                                side='left')
+        start = np.maximum(start, np.arange(1, n_lines + 1))
+        end = np.searchsorted(sorted_angles,
+                              sorted_angles + (180.0 - self.min_angle),
+                              side='right')
+        counts = np.maximum(end - start, 0)
+        n_pairs = int(counts.sum())
+        self.last_pairs = n_pairs
+        pos1 = np.repeat(np.arange(n_lines), counts)
+        offsets = np.arange(n_pairs) - np.repeat(np.cumsum(counts) - counts,
+                                                 counts)
+        pos2 = np.repeat(start, counts) + offsets
+        idx1, idx2 = order[pos1], order[pos2]
+        idx1, idx2 = np.minimum(idx1, idx2), np.maximum(idx1, idx2)
+        pairs_order = np.lexsort((idx2, idx1))
+        return idx1[pairs_order], idx2[pairs_order]
@@ -0,0 +1,102 @@
+"""
+@author: Sebastian Cepeda
+@email: sebastian.cepeda.fuentealba@gmail.com
+"""
+
+import numpy as np
+
+from src.computer_vision.vanishing_point import Z_TOLERANCE
+
+
+class RansacVanishingPointEstimator:
+
+    def __init__(self,
+                 iterations: int = 256,
+                 tolerance_ratio: float = 0.01,
+                 min_inliers: int = 3,
+                 max_vanishing_points: int = 3,
+                 seed: int = 0):
+        """
+        Constructor of RansacVanishingPointEstimator. Robust alternative to
+        the exhaustive intersection of every pair of lines followed by the
+        accumulator: hypotheses are the intersections of random pairs of
+        lines, scored by the number of lines passing near them. The cost is
+        O(iterations * N) instead of O(N^2).
+
+        :param iterations: Number of sampled pairs of lines per vanishing
+        point
+        :param tolerance_ratio: Maximum distance from an inlier line to the
+        vanishing point, with respect to the image height
+        :param min_inliers: Minimum number of inlier lines of a vanishing
+        point
+        :param max_vanishing_points: Maximum number of vanishing points. Each
+        one is searched among the lines that are not inliers of the previous
+        ones
+        :param seed: Seed of the sampling. Every call of execute starts from
+        it, so equal inputs give equal results
+        """
+        self.iterations = iterations
+        self.tolerance_ratio = tolerance_ratio
+        self.min_inliers = min_inliers
+        self.max_vanishing_points = max_vanishing_points
+        self.seed = seed
+        self.last_hypotheses = 0
+
+    def _fit(self, lines, tolerance, rng):
+        n_lines = lines.shape[0]
+        idx1 = rng.integers(0, n_lines, self.iterations)
+        idx2 = rng.integers(0, n_lines - 1, self.iterations)
+        # Second index drawn among the other lines
+        idx2 += idx2 >= idx1
+        points = np.cross(lines[idx1], lines[idx2])
+        finite = np.abs(points[:, 2]) > Z_TOLERANCE
+        points = points[finite, 0:2] / points[finite, 2:3]
+        self.last_hypotheses += points.shape[0]
+        if points.shape[0] == 0:
+            return None
+        # Lines are normalized, the residuals are distances
+        residuals = np.abs(points @ lines[:, 0:2].T + lines[:, 2])
+        scores = np.count_nonzero(residuals < tolerance, axis=1)
+        best = int(np.argmax(scores))
+        if scores[best] < self.min_inliers:
+            return None
+        point = points[best]
+        inliers = residuals[best] < tolerance
+        # Least squares point of the inlier lines
+        refined, _, _, _ = np.linalg.lstsq(lines[inliers, 0:2],
+                                           -lines[inliers, 2], rcond=None)
+        refined_inliers = \
+            np.abs(lines[:, 0:2] @ refined + lines[:, 2]) < tolerance
+        if np.count_nonzero(refined_inliers) >= scores[best]:
+            point, inliers = refined, refined_inliers
+        return (int(point[0]), int(point[1])), inliers
+
+    def execute(self, image_shape: tuple, lines: np.ndarray):
+        """
+        Estimates the vanishing points of a set of lines
+
+        :param image_shape: Image shape
+        :param lines: Lines coefficients, array of shape (N, 3)
+        :return: List of vanishing points and the lines that originate them,
+        sorted by number of lines
+        """
+        lines = np.asarray(lines, dtype=np.float64).reshape(-1, 3)
+        self.last_hypotheses = 0
+        norms = np.hypot(lines[:, 0], lines[:, 1])
+        remaining = np.flatnonzero(norms > 0)
+        normalized = lines[remaining] / norms[remaining, None]
+        tolerance = image_shape[0] * self.tolerance_ratio
+        rng = np.random.default_rng(self.seed)
+        lines_list = lines.tolist()
+        vp_lines = []
+        while len(vp_lines) < self.max_vanishing_points and \
+                remaining.shape[0] >= max(2, self.min_inliers):
+            fit = self._fit(normalized, tolerance, rng)
+            if fit is None:
+                break
+            vp, inliers = fit
+            lines_in = [tuple(lines_list[i]) for i in remaining[inliers]]
+            vp_lines.append((vp, lines_in))
+            remaining = remaining[~inliers]
+            normalized = normalized[~inliers]
+        return vp_lines
@@ -0,0 +1,60 @@
+"""
+@author: Sebastian Cepeda
+@email: sebastian.cepeda.fuentealba@gmail.com
+"""
+
+import cv2
+import numpy as np
+
+
+def roi_bounds(roi, image_shape):
+    """
+    Bounding rectangle of a region of interest, clipped to the image
+
+    :param roi: Rectangle (x, y, width, height) or polygon, array-like of
+    shape (K, 2) with K >= 3 points (x, y)
+    :param image_shape: Shape of the image
+    :return: Rectangle (x0, y0, x1, y1), and the polygon as an int32 array
+    (None for rectangles)
+    """
+    y_max, x_max = image_shape[0:2]
+    polygon = None
+    roi = np.asarray(roi)
+    if roi.ndim == 1:
+        if roi.shape[0] != 4:
+            raise ValueError(f"A rectangle ROI is (x, y, width, height): "
+                             f"{roi}")
+        x0, y0, width, height = roi.astype(np.int64).tolist()
+        x1, y1 = x0 + width, y0 + height
+    else:
+        if roi.ndim != 2 or roi.shape[1] != 2 or roi.shape[0] < 3:
+            raise ValueError(f"A polygon ROI has shape (K, 2), K >= 3: "
+                             f"{roi.shape}")
+        polygon = np.round(roi).astype(np.int32)
+        x0, y0, width, height = cv2.boundingRect(polygon)
+        x1, y1 = x0 + width, y0 + height
+    x0, x1 = max(0, x0), min(x_max, x1)
+    y0, y1 = max(0, y0), min(y_max, y1)
+    if x1 <= x0 or y1 <= y0:
+        raise ValueError(f"The ROI does not overlap the image: {roi}")
+    return (x0, y0, x1, y1), polygon
+
+
+def crop_roi(image, roi):
+    """
+    Crops an image to a region of interest
+
+    :param image: Image
+    :param roi: Rectangle (x, y, width, height) or polygon (K, 2)
+    :return: Cropped image (a view), offset (x0, y0) of the crop and, for
+    polygons, the uint8 mask of the polygon in the crop (None for
+    rectangles)
+    """
+    (x0, y0, x1, y1), polygon = roi_bounds(roi, image.shape)
+    crop = image[y0:y1, x0:x1]
+    mask = None
+    if polygon is not None:
+        mask = np.zeros(crop.shape[0:2], dtype=np.uint8)
+        cv2.fillPoly(mask, [polygon - np.array((x0, y0), dtype=np.int32)],
+                     255)
+    return crop, (x0, y0), mask
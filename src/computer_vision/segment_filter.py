@@ -3,39 +3,57 @@
 @email: sebastian.cepeda.fuentealba@gmail.com
 """
 
-from src.computer_vision.point import distance
+import numpy as np
 
 
 class SegmentFilter:
 
     def __init__(self,
-                 distance_threshold_ratio: float = 0.10):
+                 distance_threshold_ratio: float = 0.10,
+                 horizontal_angle_threshold: float = 0.0,
+                 vertical_angle_threshold: float = 0.0):
         """
         Constructor of SegmentFilter
 
-        :param distance_threshold_ratio:
+        :param distance_threshold_ratio: Minimum length of the segments,
+        with respect to the mean of the image height and width
+        :param horizontal_angle_threshold: Segments closer than this angle
+        (in degrees) to the horizontal are discarded (0 disables it)
+        :param vertical_angle_threshold: Segments closer than this angle
+        (in degrees) to the vertical are discarded (0 disables it)
         """
         self.distance_threshold_ratio = distance_threshold_ratio
+        self.horizontal_angle_threshold = horizontal_angle_threshold
+        self.vertical_angle_threshold = vertical_angle_threshold
 
     def execute(self,
-                detected_segments: list,
+                detected_segments,
                 image_shape: tuple,
                 ):
         """
-        Filters the detected segments by distance
+        Filters the detected segments by distance, and optionally by angle
 
-        :param detected_segments: Detected segments
+        :param detected_segments: Detected segments, array of shape
+        (K, 1, 4) as given by HoughLinesP
         :param image_shape: Image shape
-        :return: Filtered segments
+        :return: Filtered segments, array of shape (K', 1, 4)
         """
-        filtered_segments = []
+        segments = np.asarray(detected_segments)
+        if segments.size == 0:
+            return segments.reshape(0, 1, 4)
+        segments = segments.reshape(-1, 1, 4)
         mean_image_lenght = (image_shape[0] + image_shape[1]) / 2
         distance_threshold = self.distance_threshold_ratio * mean_image_lenght
-        for segment in detected_segments:
-            x1, y1, x2, y2 = segment[0]
-            p1 = x1, y1
-            p2 = x2, y2
-            segment_length = distance(p1, p2)
-            if segment_length > distance_threshold:
-                filtered_segments.append(segment)
-        return filtered_segments
+        coordinates = segments[:, 0, :].astype(np.float64)
+        dx = coordinates[:, 2] - coordinates[:, 0]
+        dy = coordinates[:, 3] - coordinates[:, 1]
+        keep = np.hypot(dx, dy) > distance_threshold
+        if self.horizontal_angle_threshold > 0 or \
+                self.vertical_angle_threshold > 0:
+            # Angle to the horizontal, in [0, 90] degrees
+            angles = np.degrees(np.arctan2(np.abs(dy), np.abs(dx)))
+            if self.horizontal_angle_threshold > 0:
+                keep &= angles >= self.horizontal_angle_threshold
+            if self.vertical_angle_threshold > 0:
+                keep &= angles <= 90 - self.vertical_angle_threshold
+        return segments[keep]
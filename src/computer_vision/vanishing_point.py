@@ -4,6 +4,8 @@
 """
 import numpy as np
 
+Z_TOLERANCE = 10.0 ** -10.0
+
 
 def vp_from_two_lines(l1, l2):
     """
@@ -15,31 +17,74 @@ def vp_from_two_lines(l1, l2):
     """
     vp = np.cross(l1, l2)
     x, y, z = vp
-    if not np.isclose(z, 0.0, rtol=10.0 ** -10.0, atol=10.0 ** -10.0):
+    if not np.isclose(z, 0.0, rtol=Z_TOLERANCE, atol=Z_TOLERANCE):
         x = int(x / z)
         y = int(y / z)
         vp = (x, y, 1.0)
     return vp
 
 
+def intersect_line_pairs(lines: np.ndarray,
+                         idx1: np.ndarray,
+                         idx2: np.ndarray):
+    """
+    Intersects the given pairs of lines in a single vectorized pass. Pairs of
+    parallel lines (z close to 0) are discarded.
+
+    :param lines: Lines coefficients, array of shape (N, 3)
+    :param idx1: Index of the first line of each pair
+    :param idx2: Index of the second line of each pair
+    :return: Intersection points as an (M, 2) int64 array, and the index
+    arrays of the pairs of lines that originate each point
+    """
+    points = np.cross(lines[idx1], lines[idx2])
+    z = points[:, 2]
+    valid = ~np.isclose(z, 0.0, rtol=Z_TOLERANCE, atol=Z_TOLERANCE)
+    points = points[valid]
+    # Truncation towards zero, the same as int(x / z)
+    vps = np.trunc(points[:, 0:2] / points[:, 2:3]).astype(np.int64)
+    return vps, idx1[valid], idx2[valid]
+
+
+def intersect_lines(lines):
+    """
+    Intersects every pair of lines (upper triangle of the pairs matrix, so
+    each pair is computed once and the self pairs are skipped)
+
+    :param lines: Lines coefficients, array-like of shape (N, 3)
+    :return: Intersection points as an (M, 2) int64 array, and the index
+    arrays of the pairs of lines that originate each point
+    """
+    lines = np.asarray(lines, dtype=np.float64).reshape(-1, 3)
+    idx1, idx2 = np.triu_indices(lines.shape[0], k=1)
+    return intersect_line_pairs(lines, idx1, idx2)
+
+
 def vps_from_lines(lines):
     """
-    Gets the vanishing points from a list of the detected lines
+    Gets the vanishing points from a list of the detected lines. The points
+    are listed in the same order as an exhaustive loop over every (l1, l2)
+    pair, so each intersection appears twice.
 
     :param lines: Detected lines
     :return: Detected vanishing points
     """
     vps = []
     vp_lines_map = {}
-    for l1 in lines:
-        for l2 in lines:
-            vp = vp_from_two_lines(l1, l2)
-            x, y, z = vp
-            if not np.isclose(z, 0.0, rtol=10.0 ** -10.0, atol=10.0 ** -10.0):
-                vp = (x, y)
-                vps.append(vp)
-                if vp not in vp_lines_map:
-                    vp_lines_map[vp] = set()
-                vp_lines_map[vp].add(l1)
-                vp_lines_map[vp].add(l2)
+    n_lines = len(lines)
+    if n_lines == 0:
+        return vps, vp_lines_map
+    points, idx1, idx2 = intersect_lines(lines)
+    pair_table = np.full((n_lines, n_lines), -1, dtype=np.int64)
+    pair_ids = np.arange(points.shape[0])
+    pair_table[idx1, idx2] = pair_ids
+    pair_table[idx2, idx1] = pair_ids
+    rows, cols = np.nonzero(pair_table >= 0)
+    order = pair_table[rows, cols]
+    vps = [tuple(vp) for vp in points[order].tolist()]
+    for vp, i, j in zip(vps, rows.tolist(), cols.tolist()):
+        if vp not in vp_lines_map:
+            vp_lines_map[vp] = set()
+        vp_lines_map[vp].add(lines[i])
+        vp_lines_map[vp].add(lines[j])
     return vps, vp_lines_map
@@ -28,6 +28,26 @@ def _get_vps_accumulator(dx, dy, vps):
     return accumulator_count, accumulator_points, max_accumulator
 
 
+def _get_vps_accumulator_array(dx, dy, vps):
+    cells = np.empty(vps.shape, dtype=np.int64)
+    cells[:, 0] = np.floor(vps[:, 0] / dx)
+    cells[:, 1] = np.floor(vps[:, 1] / dy)
+    # Cells can lie far outside of the image, so they are indexed by their
+    # unique values instead of by a dense grid
+    cells, first_index, points_cell = np.unique(cells, axis=0,
+                                                return_index=True,
+                                                return_inverse=True)
+    points_cell = points_cell.reshape(-1)
+    # Cells are relabeled in order of first appearance, as the dict
+    # accumulator does
+    order = np.argsort(first_index, kind='stable')
+    rank = np.empty_like(order)
+    rank[order] = np.arange(order.shape[0])
+    points_cell = rank[points_cell]
+    accumulator_count = np.bincount(points_cell, minlength=order.shape[0])
+    return accumulator_count, points_cell
+
+
 def _average_vps(vps):
     average_vps = []
     for points in vps:
@@ -62,6 +82,9 @@ class VanishingPointAccumulatorFilter:
         self.accumulator_size = accumulator_size
         self.count_threshold = count_threshold
         self.percentage_threshold = percentage_threshold
+        # Occupied cells and maximum count of the last execute_array
+        self.last_cells = 0
+        self.last_max_count = 0
 
     def _accumulator_filter(self, accumulator, count_threshold, max_acc,
                             percentage_threshold, points_map):
@@ -120,3 +143,69 @@ class VanishingPointAccumulatorFilter:
             if insert_point:
                 vp_lines2.append((vp_in, lines_in))
         return vp_lines2
+
+    def execute_array(self,
+                      image_shape: tuple,
+                      vps: np.ndarray,
+                      idx1: np.ndarray,
+                      idx2: np.ndarray,
+                      lines: np.ndarray):
+        """
+        Array version of execute. The candidate points are binned, counted,
+        thresholded and averaged in bulk, and the lines of each winning cell
+        are gathered from the line-pair index arrays.
+
+        :param image_shape: Image shape
+        :param vps: Detected vanishing points, array of shape (M, 2)
+        :param idx1: Index of the first line that originates each point
+        :param idx2: Index of the second line that originates each point
+        :param lines: Lines coefficients, array of shape (N, 3)
+        :return: List of vanishing points and the lines that originate them
+        """
+        self.last_cells = 0
+        self.last_max_count = 0
+        if vps.shape[0] == 0:
+            return []
+        dy = image_shape[0] / self.accumulator_size
+        dx = image_shape[1] / self.accumulator_size
+        accumulator, points_cell = _get_vps_accumulator_array(dx, dy, vps)
+        max_acc = accumulator.max()
+        self.last_cells = accumulator.shape[0]
+        self.last_max_count = int(max_acc)
+        valid_cells = (accumulator >= self.count_threshold) & \
+                      (accumulator / max_acc >= self.percentage_threshold)
+        cells_ids = np.full(accumulator.shape[0], -1, dtype=np.int64)
+        cells_ids[valid_cells] = np.arange(np.count_nonzero(valid_cells))
+        n_cells = np.count_nonzero(valid_cells)
+        points_id = cells_ids[points_cell]
+        valid_points = points_id >= 0
+        points_id = points_id[valid_points]
+        counts = accumulator[valid_cells]
+        x = np.bincount(points_id, weights=vps[valid_points, 0],
+                        minlength=n_cells) / counts
+        y = np.bincount(points_id, weights=vps[valid_points, 1],
+                        minlength=n_cells) / counts
+        average_vps = np.stack((x, y), axis=1).astype(np.int64).tolist()
+        # Union of the lines of each cell, as unique (cell, line) keys
+        n_lines = lines.shape[0]
+        keys = np.concatenate((points_id * n_lines + idx1[valid_points],
+                               points_id * n_lines + idx2[valid_points]))
+        keys = np.unique(keys)
+        keys_cell = keys // n_lines
+        keys_line = keys % n_lines
+        splits = np.searchsorted(keys_cell, np.arange(1, n_cells))
+        lines_list = lines.tolist()
+        # Filtering vps to close to each other
+        distance_threshold = (image_shape[0] / self.accumulator_size) * 2
+        vp_lines = []
+        for vp_in, lines_idx in zip(average_vps,
+                                    np.split(keys_line, splits)):
+            insert_point = True
+            for vp, _ in vp_lines:
+                if distance(vp_in, vp) < distance_threshold:
+                    insert_point = False
+                    break
+            if insert_point:
+                lines_in = [tuple(lines_list[i]) for i in lines_idx]
+                vp_lines.append((tuple(vp_in), lines_in))
+        return vp_lines
@@ -0,0 +1,210 @@
+"""
+@author: Sebastian Cepeda
+@email: sebastian.cepeda.fuentealba@gmail.com
+"""
+
+import multiprocessing
+import os
+import signal
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from src.processing.workers import init_worker_detector, worker_detector
+from src.utils.print_logger import PrintLogger as logger
+
+# States of the chunks of a batch, shared with the workers
+_CHUNK_PENDING = 0
+_CHUNK_RUNNING = 1
+_CHUNK_DONE = 2
+_CHUNK_INTERRUPTED = 3
+
+# Logger and chunk states of each worker process, set by _init_worker
+_worker_logger = logger
+_worker_chunk_states = None
+_worker_chunk = None
+
+
+def _init_worker(_logger, detector_params, chunk_states=None):
+    global _worker_logger, _worker_chunk_states
+    _worker_logger = _logger
+    init_worker_detector(detector_params, _logger)
+    _worker_chunk_states = chunk_states
+    if chunk_states is not None:
+        signal.signal(signal.SIGTERM, _on_terminate)
+
+
+def _on_terminate(signum, frame):
+    # The pool terminates the remaining workers when one of them dies: their
+    # running chunk was interrupted, it did not kill the worker
+    if _worker_chunk is not None:
+        _worker_chunk_states[_worker_chunk] = _CHUNK_INTERRUPTED
+    signal.signal(signum, signal.SIG_DFL)
+    os.kill(os.getpid(), signum)
+
+
+def _process_chunk(process_method, chunk_idx, chunk, in_path, out_path,
+                   process_params):
+    global _worker_chunk
+    if _worker_chunk_states is not None:
+        _worker_chunk = chunk_idx
+        _worker_chunk_states[chunk_idx] = _CHUNK_RUNNING
+    results = []
+    for file in chunk:
+        start = time.perf_counter()
+        error = None
+        outputs = None
+        try:
+            outputs = process_method(file, in_path, out_path, _worker_logger,
+                                     worker_detector(), **process_params)
+        except Exception as e:
+            error = f"{e} \n {traceback.format_exc()}"
+        results.append(BatchResult(file, error, time.perf_counter() - start,
+                                   outputs))
+    if _worker_chunk_states is not None:
+        _worker_chunk_states[chunk_idx] = _CHUNK_DONE
+        _worker_chunk = None
+    return results
+
+
+def _chunks(files, chunk_size):
+    for i in range(0, len(files), chunk_size):
+        yield files[i:i + chunk_size]
+
+
+class BatchResult:
+
+    def __init__(self, file, error, elapsed, outputs=None):
+        """
+        Result of processing one file of a batch
+
+        :param file: Processed file
+        :param error: Error message and traceback, None if it succeeded
+        :param elapsed: Processing time in seconds
+        :param outputs: Value returned by the process method (e.g. the
+        written output files)
+        """
+        self.file = file
+        self.error = error
+        self.elapsed = elapsed
+        self.outputs = outputs
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+class BatchReport:
+
+    def __init__(self, results, elapsed):
+        """
+        Report of a batch run
+
+        :param results: List of BatchResult, in order of completion
+        :param elapsed: Wall time of the batch in seconds
+        """
+        self.results = results
+        self.elapsed = elapsed
+
+    @property
+    def failed(self):
+        return [result for result in self.results if not result.ok]
+
+    @property
+    def throughput(self):
+        """
+        Processed files per second of wall time
+        """
+        if self.elapsed <= 0:
+            return 0.0
+        return len(self.results) / self.elapsed
+
+    def log(self, _logger=logger):
+        for result in self.failed:
+            _logger.info(f"Error processing {result.file}: {result.error}")
+        _logger.info(f"Processed {len(self.results)} files "
+                     f"({len(self.failed)} failed) in {self.elapsed:.2f} s: "
+                     f"{self.throughput:.2f} images/sec")
+
+
+def run_batch(files: list,
+              process_method,
+              in_path: str,
+              out_path: str,
+              _logger=logger,
+              workers: int = 4,
+              chunk_size: int = 8,
+              detector_params: dict = None,
+              process_params: dict = None):
+    """
+    Processes files in a pool of worker processes. Each worker keeps a long
+    lived VanishingPointsDetector, files are dispatched in chunks and results
+    are collected as they complete. An error in a file is captured in its
+    result instead of aborting the batch. If a worker dies (e.g. killed or
+    out of memory) the pool is replaced and the unfinished chunks are
+    submitted again, only the files of the chunk it was processing fail.
+
+    :param files: Files to process, as given by _list_files
+    :param process_method: Method called as
+    process_method(file, in_path, out_path, logger, vp_detector), it must be
+    picklable (a module level function). Its return value is kept as the
+    outputs of the result
+    :param in_path: Input path
+    :param out_path: Output path
+    :param _logger: Logger
+    :param workers: Number of worker processes
+    :param chunk_size: Number of files sent to a worker at a time
+    :param detector_params: Keyword arguments of the detector of each worker
+    :param process_params: Extra keyword arguments of process_method
+    :return: BatchReport
+    """
+    if detector_params is None:
+        detector_params = {}
+    if process_params is None:
+        process_params = {}
+    start = time.perf_counter()
+    results = []
+    pending = dict(enumerate(_chunks(files, chunk_size)))
+    chunk_states = multiprocessing.RawArray('b', len(pending))
+    while pending:
+        broken = None
+        finished = 0
+        with ProcessPoolExecutor(max_workers=workers,
+                                 initializer=_init_worker,
+                                 initargs=(_logger, detector_params,
+                                           chunk_states)) as executor:
+            futures = {}
+            for chunk_idx, chunk in pending.items():
+                future = executor.submit(_process_chunk, process_method,
+                                         chunk_idx, chunk, in_path, out_path,
+                                         process_params)
+                futures[future] = chunk_idx
+            for future in as_completed(futures):
+                chunk_idx = futures[future]
+                try:
+                    results.extend(future.result())
+                except BrokenProcessPool as e:
+                    broken = f"{e} \n {traceback.format_exc()}"
+                    continue
+                except Exception as e:
+                    error = f"{e} \n {traceback.format_exc()}"
+                    results.extend(BatchResult(file, error, 0.0)
+                                   for file in pending[chunk_idx])
+                del pending[chunk_idx]
+                finished += 1
+        if broken is None:
+            continue
+        # The pool is closed, the workers that were terminated with it have
+        # marked their chunks as interrupted
+        killed = [chunk_idx for chunk_idx in pending
+                  if chunk_states[chunk_idx] == _CHUNK_RUNNING]
+        if not killed and finished == 0:
+            # The pool cannot run anything (e.g. the initializer fails)
+            killed = list(pending)
+        for chunk_idx in killed:
+            results.extend(BatchResult(file, broken, 0.0)
+                           for file in pending.pop(chunk_idx))
+        for chunk_idx in pending:
+            chunk_states[chunk_idx] = _CHUNK_PENDING
+    return BatchReport(results, time.perf_counter() - start)
@@ -0,0 +1,404 @@
+"""
+@author: Sebastian Cepeda
+@email: sebastian.cepeda.fuentealba@gmail.com
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from urllib.parse import urlsplit, parse_qs
+
+import cv2
+import numpy as np
+
+from src.processing.workers import init_worker_detector, worker_detector
+from src.utils.print_logger import PrintLogger as logger
+
+_REASONS = {
+    200: 'OK',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    413: 'Payload Too Large',
+    500: 'Internal Server Error',
+    503: 'Service Unavailable',
+    504: 'Gateway Timeout',
+}
+
+def _warm_up():
+    return worker_detector() is not None
+
+
+def decode_frame(payload: bytes, shape: tuple = None):
+    """
+    Decodes the frame of a request
+
+    :param payload: Encoded image (any format of cv2.imdecode), or raw uint8
+    pixels if shape is given
+    :param shape: Shape of a raw frame, e.g. (height, width, 3)
+    :return: BGR frame
+    """
+    if shape is not None:
+        frame = np.frombuffer(payload, dtype=np.uint8)
+        if frame.size != int(np.prod(shape)):
+            raise ValueError(f"Raw frame of {frame.size} bytes does not "
+                             f"have shape {shape}")
+        frame = frame.reshape(shape)
+        if frame.ndim == 2:
+            frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+        return frame
+    frame = cv2.imdecode(np.frombuffer(payload, dtype=np.uint8),
+                         cv2.IMREAD_COLOR)
+    if frame is None:
+        raise ValueError("The payload is not a decodable image")
+    return frame
+
+
+def _detect_batch(requests):
+    # Runs in a worker process, decoding included, so that only the encoded
+    # payloads are sent to it
+    vp_detector = worker_detector()
+    responses = []
+    for payload, shape in requests:
+        start = time.perf_counter()
+        try:
+            frame = decode_frame(payload, shape)
+        except ValueError as e:
+            responses.append((400, {'error': str(e)}))
+            continue
+        try:
+            vp_lines = vp_detector.execute(frame)
+            responses.append((200, {
+                'vanishing_points': [
+                    {'x': int(vp[0]), 'y': int(vp[1]), 'n_lines': len(lines)}
+                    for vp, lines in vp_lines],
+                'confidence': float(vp_detector.last_confidence),
+                'detection_time': time.perf_counter() - start,
+            }))
+        except Exception as e:
+            # The traceback stays in the server log
+            logger.info(f"Error: {e} \n {traceback.format_exc()}")
+            responses.append((500, {'error': str(e)}))
+    return responses
+
+
+class _Request:
+
+    def __init__(self, payload, shape, deadline, future):
+        self.payload = payload
+        self.shape = shape
+        self.deadline = deadline
+        self.future = future
+
+
+class DetectionService:
+
+    def __init__(self,
+                 host: str = '127.0.0.1',
+                 port: int = 0,
+                 workers: int = 2,
+                 detector_params: dict = None,
+                 max_batch_size: int = 8,
+                 batch_wait: float = 0.005,
+                 max_queue: int = 64,
+                 latency_budget: float = 2.0,
+                 max_body_size: int = 64 * 1024 ** 2):
+        """
+        Local HTTP detection service. Detectors are kept warm in worker
+        processes, and concurrent requests are grouped in micro-batches:
+        a batch is sent to a free worker when it has max_batch_size
+        requests, or batch_wait seconds after its first request.
+
+        Endpoints:
+        - POST /detect: the body is an encoded image (jpg, png...) or, with
+          the query ?shape=height,width,3, the raw uint8 BGR pixels. Returns
+          {"vanishing_points": [{"x", "y", "n_lines"}], "confidence",
+          "detection_time"}
+        - GET /health: {"status", "queued", "workers", "restarts"}. A
+          worker pool broken by a dead worker process is replaced when a
+          batch finds it broken: the status is 'restarting' (503) until the
+          new workers are ready, and 'unhealthy' (503) if they could not be
+          started (retried by the next batch)
+
+        :param host: Host, local by default
+        :param port: Port, 0 picks a free one (see port after start)
+        :param workers: Number of worker processes
+        :param detector_params: Keyword arguments of the detectors
+        :param max_batch_size: Maximum number of requests of a batch
+        :param batch_wait: Maximum time a batch waits for more requests
+        :param max_queue: Maximum number of queued requests, more are
+        rejected with 503 (backpressure)
+        :param latency_budget: Maximum time in seconds from the arrival of a
+        request to its response, requests past it are answered with 504
+        :param max_body_size: Maximum size of a request body, in bytes
+        """
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.detector_params = detector_params or {}
+        self.max_batch_size = max_batch_size
+        self.batch_wait = batch_wait
+        self.max_queue = max_queue
+        self.latency_budget = latency_budget
+        self.max_body_size = max_body_size
+        self._queue = None
+        self._server = None
+        self._executor = None
+        self._batcher = None
+        self._free_workers = None
+        self._batches = set()
+        self._restarting = None
+        self._broken = False
+        self.restarts = 0
+
+    async def _start_workers(self):
+        loop = asyncio.get_running_loop()
+        # Workers forked from the server would inherit the sockets of the
+        # open connections (restarts), they are forked from a fork server
+        # started before any connection instead
+        context = None
+        if 'forkserver' in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context('forkserver')
+        executor = ProcessPoolExecutor(self.workers, mp_context=context,
+                                       initializer=init_worker_detector,
+                                       initargs=(self.detector_params,))
+        await asyncio.gather(*[loop.run_in_executor(executor, _warm_up)
+                               for _ in range(self.workers)])
+        return executor
+
+    async def _restart_workers(self, broken_executor):
+        # Called by every batch that found the pool broken, only the first
+        # one replaces it
+        if self._executor is broken_executor and self._restarting is None:
+            self._broken = True
+            broken_executor.shutdown(wait=True)
+            self._restarting = asyncio.ensure_future(self._start_workers())
+            try:
+                self._executor = await self._restarting
+                self._broken = False
+                self.restarts += 1
+            finally:
+                self._restarting = None
+        elif self._restarting is not None:
+            await asyncio.shield(self._restarting)
+
+    async def start(self):
+        """
+        Starts the worker processes (warm) and the server
+        """
+        self._executor = await self._start_workers()
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._free_workers = asyncio.Semaphore(self.workers)
+        self._batcher = asyncio.create_task(self._batch_loop())
+        self._server = await asyncio.start_server(self._handle, self.host,
+                                                  self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        """
+        Stops the server and the worker processes
+        """
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._batcher is not None:
+            self._batcher.cancel()
+            try:
+                await self._batcher
+            except asyncio.CancelledError:
+                pass
+        if self._batches:
+            await asyncio.gather(*self._batches, return_exceptions=True)
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+    async def serve_forever(self):
+        """
+        Starts the service and serves until cancelled
+        """
+        await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.close()
+
+    async def _next_batch(self):
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        batch_end = loop.time() + self.batch_wait
+        while len(batch) < self.max_batch_size:
+            timeout = batch_end - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(),
+                                                    timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._free_workers.acquire()
+            try:
+                batch = await self._next_batch()
+            except BaseException:
+                self._free_workers.release()
+                raise
+            # Requests past their budget are not sent to the workers
+            now = loop.time()
+            live = []
+            for request in batch:
+                if request.future.done():
+                    continue
+                if request.deadline <= now:
+                    request.future.set_result(
+                        (504, {'error': 'Latency budget exceeded'}))
+                else:
+                    live.append(request)
+            if not live:
+                self._free_workers.release()
+                continue
+            task = asyncio.create_task(self._run_batch(live))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _run_batch(self, batch):
+        loop = asyncio.get_running_loop()
+        executor = self._executor
+        try:
+            responses = await loop.run_in_executor(
+                executor, _detect_batch,
+                [(request.payload, request.shape) for request in batch])
+        except BrokenProcessPool as e:
+            responses = [(500, {'error': 'Worker process died'})] * len(batch)
+            logger.info(f"Error: {e}, restarting the worker processes")
+            try:
+                await self._restart_workers(executor)
+            except Exception as restart_error:
+                logger.info(f"Error restarting the worker processes: "
+                            f"{restart_error}")
+        except Exception as e:
+            responses = [(500, {'error': str(e)})] * len(batch)
+        finally:
+            self._free_workers.release()
+        for request, response in zip(batch, responses):
+            if not request.future.done():
+                request.future.set_result(response)
+
+    async def _detect(self, payload, shape):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        deadline = loop.time() + self.latency_budget
+        try:
+            self._queue.put_nowait(_Request(payload, shape, deadline, future))
+        except asyncio.QueueFull:
+            return 503, {'error': 'Too many queued requests'}
+        try:
+            return await asyncio.wait_for(asyncio.shield(future),
+                                          max(0.0, deadline - loop.time()))
+        except asyncio.TimeoutError:
+            # Answered now, its result is dropped when it arrives
+            future.cancel()
+            return 504, {'error': 'Latency budget exceeded'}
+
+    async def _route(self, method, target, body):
+        url = urlsplit(target)
+        if url.path == '/health':
+            if method != 'GET':
+                return 405, {'error': 'Use GET'}
+            status, code = 'ok', 200
+            if self._restarting is not None:
+                status, code = 'restarting', 503
+            elif self._broken:
+                status, code = 'unhealthy', 503
+            return code, {'status': status, 'queued': self._queue.qsize(),
+                          'workers': self.workers, 'restarts': self.restarts}
+        if url.path != '/detect':
+            return 404, {'error': f"Unknown path {url.path}"}
+        if method != 'POST':
+            return 405, {'error': 'Use POST'}
+        shape = None
+        query = parse_qs(url.query)
+        if 'shape' in query:
+            try:
+                shape = tuple(int(v) for v in query['shape'][0].split(','))
+            except ValueError:
+                return 400, {'error': 'shape is height,width[,channels]'}
+        if len(body) == 0:
+            return 400, {'error': 'Empty body'}
+        return await self._detect(body, shape)
+
+    async def _read_request(self, reader):
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        method, target, _ = request_line.decode('latin-1').split(' ', 2)
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get('content-length', 0))
+        return method, target, length
+
+    async def _handle(self, reader, writer):
+        try:
+            request = await self._read_request(reader)
+            if request is None:
+                return
+            method, target, length = request
+            if length > self.max_body_size:
+                status, response = 413, {'error': 'Body too large'}
+            else:
+                body = await reader.readexactly(length)
+                status, response = await self._route(method, target, body)
+        except (ValueError, asyncio.IncompleteReadError):
+            status, response = 400, {'error': 'Malformed request'}
+        try:
+            data = json.dumps(response).encode('utf-8')
+            writer.write(
+                f"HTTP/1.1 {status} {_REASONS[status]}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(data)}\r\n"
+                f"Connection: close\r\n\r\n".encode('latin-1') + data)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Local vanishing points detection service")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--max-batch-size', type=int, default=8)
+    parser.add_argument('--batch-wait', type=float, default=0.005)
+    parser.add_argument('--max-queue', type=int, default=64)
+    parser.add_argument('--latency-budget', type=float, default=2.0)
+    parser.add_argument('--detector-params', type=json.loads, default={},
+                        help="JSON keyword arguments of the detectors")
+    args = parser.parse_args()
+    service = DetectionService(args.host, args.port, args.workers,
+                               args.detector_params, args.max_batch_size,
+                               args.batch_wait, args.max_queue,
+                               args.latency_budget)
+    try:
+        asyncio.run(service.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,338 @@
+"""
+@author: Sebastian Cepeda
+@email: sebastian.cepeda.fuentealba@gmail.com
+"""
+
+import json
+import mmap
+import os
+import queue
+import re
+import threading
+
+import cv2
+import numpy as np
+
+from src.processing.video_pipeline import read_video_frames
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff')
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv')
+NPY_EXTENSIONS = ('.npy',)
+RAW_EXTENSIONS = ('.raw', '.bgr')
+
+
+def _extension(path):
+    return os.path.splitext(path)[1].lower()
+
+
+def _natural_key(name):
+    # frame_2.png before frame_10.png
+    return [int(part) if part.isdigit() else part
+            for part in re.split(r'(\d+)', name)]
+
+
+def source_type(path: str):
+    """
+    Type of the input of a path, by extension
+
+    :param path: File or folder
+    :return: 'image' for single images, 'video' for the sources of several
+    frames (videos, folders with images, .npy stacks and raw dumps), None
+    for other files and folders
+    """
+    if os.path.isdir(path):
+        if any(_extension(name) in IMAGE_EXTENSIONS
+               for name in os.listdir(path)):
+            return 'video'
+        return None
+    extension = _extension(path)
+    if extension in IMAGE_EXTENSIONS:
+        return 'image'
+    if extension in VIDEO_EXTENSIONS + NPY_EXTENSIONS + RAW_EXTENSIONS:
+        return 'video'
+    return None
+
+
+class FrameSource:
+    """
+    Ordered frames of an input. Iterating over a source yields its frames,
+    the frames of memory mapped sources are read-only views
+    """
+    frame_shape = None
+    fps = None
+
+    def __iter__(self):
+        raise NotImplementedError
+
+    def __len__(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class VideoFileSource(FrameSource):
+
+    def __init__(self, path: str):
+        """
+        Frames of a video file, decoded with cv2.VideoCapture
+
+        :param path: Video file
+        """
+        self.video = cv2.VideoCapture(path)
+        if not self.video.isOpened():
+            raise Exception(f"Error loading video {path}")
+        width = int(self.video.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(self.video.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.frame_shape = (height, width, 3)
+        self.fps = self.video.get(cv2.CAP_PROP_FPS) or None
+
+    def __iter__(self):
+        return read_video_frames(self.video)
+
+    def __len__(self):
+        return int(self.video.get(cv2.CAP_PROP_FRAME_COUNT))
+
+    def close(self):
+        self.video.release()
+
+
+class ImageSequenceSource(FrameSource):
+
+    def __init__(self, path: str, fps: float = None):
+        """
+        Frames of a folder of images, in natural order of their names
+        (frame_2 before frame_10)
+
+        :param path: Folder or single image file
+        :param fps: Optional frame rate
+        """
+        if os.path.isdir(path):
+            names = [name for name in os.listdir(path)
+                     if _extension(name) in IMAGE_EXTENSIONS]
+            self.files = [os.path.join(path, name)
+                          for name in sorted(names, key=_natural_key)]
+        else:
+            self.files = [path]
+        if len(self.files) == 0:
+            raise Exception(f"No images in {path}")
+        self.fps = fps
+        self._first = self._read(self.files[0])
+        self.frame_shape = self._first.shape
+
+    @staticmethod
+    def _read(file):
+        image = cv2.imread(file, cv2.IMREAD_COLOR)
+        if image is None:
+            raise Exception(f"Error loading image {file}")
+        return image
+
+    def __iter__(self):
+        # The first image is already decoded, to know the frame shape
+        first = self._first
+        self._first = None
+        for i, file in enumerate(self.files):
+            yield first if i == 0 and first is not None else self._read(file)
+
+    def __len__(self):
+        return len(self.files)
+
+
+class MemmapSource(FrameSource):
+
+    def __init__(self, frames: np.ndarray, fps: float = None,
+                 readahead: int = 4):
+        """
+        Frames of a memory mapped array of shape (N, height, width, 3): no
+        decoding, each frame is a zero-copy view
+
+        :param frames: Memory mapped array (np.memmap or np.load with
+        mmap_mode)
+        :param fps: Optional frame rate
+        :param readahead: Number of frames ahead whose pages are requested to
+        the operating system (madvise WILLNEED) while a frame is processed,
+        0 disables it
+        """
+        self.frames = frames
+        self.frame_shape = frames.shape[1:]
+        self.fps = fps
+        self.readahead = readahead
+        self._mmap = getattr(frames, '_mmap', None)
+        if self._mmap is None and isinstance(frames.base, mmap.mmap):
+            self._mmap = frames.base
+        self._frame_bytes = int(np.prod(self.frame_shape)) * \
+            frames.dtype.itemsize
+        self._offset = getattr(frames, 'offset', 0)
+
+    def _will_need(self, start, count):
+        if self._mmap is None or not hasattr(self._mmap, 'madvise') or \
+                count <= 0:
+            return
+        begin = self._offset + start * self._frame_bytes
+        end = begin + count * self._frame_bytes
+        # madvise needs page aligned offsets
+        begin -= begin % mmap.PAGESIZE
+        try:
+            self._mmap.madvise(mmap.MADV_WILLNEED, begin,
+                               min(end, len(self._mmap)) - begin)
+        except (OSError, ValueError, AttributeError):
+            self._mmap = None
+
+    def __iter__(self):
+        n_frames = len(self.frames)
+        for i in range(n_frames):
+            if self.readahead > 0 and i % self.readahead == 0:
+                self._will_need(i + 1, min(self.readahead,
+                                           n_frames - i - 1))
+            yield self.frames[i]
+
+    def __len__(self):
+        return len(self.frames)
+
+    def close(self):
+        self.frames = None
+        self._mmap = None
+
+
+class NpyStackSource(MemmapSource):
+
+    def __init__(self, path: str, fps: float = None, readahead: int = 4):
+        """
+        Frames of a .npy stack of shape (N, height, width, 3), memory mapped
+
+        :param path: .npy file
+        :param fps: Optional frame rate
+        :param readahead: Number of frames read ahead
+        """
+        frames = np.load(path, mmap_mode='r')
+        if frames.ndim != 4:
+            raise Exception(f"Expected a stack of frames (N, height, width, "
+                            f"channels) in {path}, got {frames.shape}")
+        super().__init__(frames, fps, readahead)
+
+
+class RawFramesSource(MemmapSource):
+
+    def __init__(self, path: str, frame_shape: tuple = None,
+                 dtype=np.uint8, fps: float = None, readahead: int = 4):
+        """
+        Frames of a raw dump of consecutive frames (e.g. BGR as captured),
+        memory mapped. The frame shape, type and frame rate are read from
+        the sidecar file {path}.json ({"frame_shape": [h, w, 3],
+        "dtype": "uint8", "fps": 30}) when not given.
+
+        :param path: Raw file
+        :param frame_shape: Shape of the frames
+        :param dtype: Type of the frames
+        :param fps: Optional frame rate
+        :param readahead: Number of frames read ahead
+        """
+        if frame_shape is None:
+            with open(f"{path}.json") as f:
+                metadata = json.load(f)
+            frame_shape = metadata['frame_shape']
+            dtype = metadata.get('dtype', dtype)
+            fps = metadata.get('fps', fps)
+        frame_shape = tuple(frame_shape)
+        dtype = np.dtype(dtype)
+        frame_bytes = int(np.prod(frame_shape)) * dtype.itemsize
+        n_frames = os.path.getsize(path) // frame_bytes
+        frames = np.memmap(path, dtype=dtype, mode='r',
+                           shape=(n_frames,) + frame_shape)
+        super().__init__(frames, fps, readahead)
+
+
+class PrefetchSource(FrameSource):
+
+    def __init__(self, source: FrameSource, prefetch: int = 4):
+        """
+        Reads the frames of a source in a background thread, up to prefetch
+        frames ahead of the consumer (decoding overlaps the processing)
+
+        :param source: Frame source
+        :param prefetch: Maximum number of frames read ahead
+        """
+        self.source = source
+        self.prefetch = prefetch
+        self.frame_shape = source.frame_shape
+        self.fps = source.fps
+
+    def _reader(self, frames_queue, stop):
+        try:
+            for frame in self.source:
+                while not stop.is_set():
+                    try:
+                        frames_queue.put(('frame', frame), timeout=0.1)
+                        break
+                    except queue.Full:
+                        pass
+                if stop.is_set():
+                    return
+            frames_queue.put(('end', None))
+        except Exception as e:
+            frames_queue.put(('error', e))
+
+    def __iter__(self):
+        frames_queue = queue.Queue(maxsize=self.prefetch)
+        stop = threading.Event()
+        thread = threading.Thread(target=self._reader,
+                                  args=(frames_queue, stop), daemon=True)
+        thread.start()
+        try:
+            while True:
+                kind, item = frames_queue.get()
+                if kind == 'end':
+                    break
+                if kind == 'error':
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            # Unblocks a reader waiting for space
+            while thread.is_alive():
+                try:
+                    frames_queue.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+
+    def __len__(self):
+        return len(self.source)
+
+    def close(self):
+        self.source.close()
+
+
+def open_frame_source(path: str, prefetch: int = 0, readahead: int = 4):
+    """
+    Opens the frame source of a path, by its type: folders are image
+    sequences, .npy files are memory mapped stacks, .raw and .bgr files are
+    memory mapped raw dumps (with a .json sidecar), the other video
+    extensions are decoded with cv2.VideoCapture and single images with
+    cv2.imread
+
+    :param path: File or folder
+    :param prefetch: Frames decoded ahead in a background thread, for the
+    sources that decode (0 disables it)
+    :param readahead: Frames read ahead by the memory mapped sources
+    :return: FrameSource
+    """
+    extension = _extension(path)
+    if os.path.isdir(path) or extension in IMAGE_EXTENSIONS:
+        source = ImageSequenceSource(path)
+    elif extension in NPY_EXTENSIONS:
+        return NpyStackSource(path, readahead=readahead)
+    elif extension in RAW_EXTENSIONS:
+        return RawFramesSource(path, readahead=readahead)
+    elif extension in VIDEO_EXTENSIONS:
+        source = VideoFileSource(path)
+    else:
+        raise Exception(f"Unknown type of input: {path}")
+    if prefetch > 0:
+        source = PrefetchSource(source, prefetch)
+    return source
@@ -0,0 +1,205 @@
+"""
+@author: Sebastian Cepeda
+@email: sebastian.cepeda.fuentealba@gmail.com
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import uuid
+
+# Part of every key. To be increased when the fixed settings of the pipeline
+# (Gabor, Canny, Hough, accumulator), its outputs or the layout of the
+# entries change, so that the entries of previous versions are not used
+CACHE_VERSION = 2
+
+# Detector parameters that are runtime objects, they do not change the
+# outputs and are left out of the keys
+RUNTIME_PARAMS = ('_logger', 'stats_callback', 'debug_sink')
+
+
+def _update_digest(digest, path, chunk_size):
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+
+
+def file_digest(path: str, chunk_size: int = 1 << 20):
+    """
+    Hash of the content of a file, or of the files of a folder (e.g. an image
+    sequence) with their relative names
+
+    :param path: File or folder
+    :param chunk_size: Size of the chunks read at a time
+    :return: Hexadecimal sha256 digest
+    """
+    digest = hashlib.sha256()
+    if not os.path.isdir(path):
+        _update_digest(digest, path, chunk_size)
+        return digest.hexdigest()
+    for folder, folders, files in os.walk(path):
+        folders.sort()
+        for name in sorted(files):
+            file_path = os.path.join(folder, name)
+            digest.update(os.path.relpath(file_path, path).encode('utf-8'))
+            _update_digest(digest, file_path, chunk_size)
+    return digest.hexdigest()
+
+
+def _not_serializable(value):
+    raise TypeError(f"Parameter of type {type(value).__name__} cannot be "
+                    f"part of a cache key: {value!r}")
+
+
+def params_digest(params: dict):
+    """
+    Hash of a set of parameters
+
+    :param params: Parameters, json serializable. Other values raise
+    TypeError, since their repr can change between runs (e.g. memory
+    addresses) and the key would never match again
+    :return: Hexadecimal sha256 digest
+    """
+    data = json.dumps(params, sort_keys=True, default=_not_serializable)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+def cached_params(detector_params: dict):
+    """
+    Detector parameters that are part of the cache keys
+
+    :param detector_params: Keyword arguments of the detectors
+    :return: Parameters without the runtime objects (RUNTIME_PARAMS)
+    """
+    return {name: value for name, value in detector_params.items()
+            if name not in RUNTIME_PARAMS}
+
+
+def _folder_size(folder):
+    return sum(os.path.getsize(os.path.join(folder, f))
+               for f in os.listdir(folder))
+
+
+class ResultCache:
+
+    def __init__(self,
+                 cache_path: str,
+                 max_bytes: int = 2 * 1024 ** 3):
+        """
+        Persistent cache of the outputs of processing a file, addressed by
+        the content of the input file and the parameters of the processing.
+        Each entry is a folder with the output files, named without the name
+        of the input file (inputs of the same content under other names share
+        the entry). The least recently used entries are evicted when the
+        cache exceeds max_bytes.
+
+        :param cache_path: Folder of the cache
+        :param max_bytes: Maximum size of the cache, in bytes
+        """
+        self.cache_path = cache_path
+        self.max_bytes = max_bytes
+        os.makedirs(cache_path, exist_ok=True)
+
+    def key(self, file_path: str, params: dict):
+        """
+        Key of the processing of a file
+
+        :param file_path: Input file
+        :param params: Parameters of the processing
+        :return: Key
+        """
+        params = {'version': CACHE_VERSION, 'params': params}
+        return hashlib.sha256(
+            (file_digest(file_path) + params_digest(params)).encode('utf-8')
+        ).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_path, key[0:2], key)
+
+    def restore(self, key: str, out_path: str, prefix: str = ''):
+        """
+        Copies the output files of a cached entry
+
+        :param key: Key
+        :param out_path: Output folder
+        :param prefix: Name of the current input file, the outputs are named
+        after it
+        :return: Whether the entry was found
+        """
+        entry_path = self._entry_path(key)
+        try:
+            names = os.listdir(entry_path)
+            for name in names:
+                shutil.copyfile(os.path.join(entry_path, name),
+                                os.path.join(out_path, f"{prefix}{name}"))
+            # Mark the entry as recently used
+            os.utime(entry_path)
+        except FileNotFoundError:
+            # Missing, or evicted while copying
+            return False
+        return True
+
+    def store(self, key: str, files: list, prefix: str = ''):
+        """
+        Stores the output files of a processing
+
+        :param key: Key
+        :param files: Output files
+        :param prefix: Name of the input file, removed from the names of the
+        output files that start with it
+        """
+        entry_path = self._entry_path(key)
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+        tmp_path = f"{entry_path}.{uuid.uuid4().hex}.tmp"
+        os.makedirs(tmp_path)
+        for file in files:
+            name = os.path.basename(file)
+            if prefix and name.startswith(prefix) and name != prefix:
+                name = name[len(prefix):]
+            shutil.copyfile(file, os.path.join(tmp_path, name))
+        try:
+            os.rename(tmp_path, entry_path)
+        except OSError:
+            # Stored concurrently by another run
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+    def entries(self):
+        """
+        Entries of the cache
+
+        :return: List of (key, size in bytes, last use time), the least
+        recently used first
+        """
+        entries = []
+        for prefix in os.listdir(self.cache_path):
+            prefix_path = os.path.join(self.cache_path, prefix)
+            if not os.path.isdir(prefix_path):
+                continue
+            for key in os.listdir(prefix_path):
+                if key.endswith('.tmp'):
+                    continue
+                entry_path = os.path.join(prefix_path, key)
+                entries.append((key, _folder_size(entry_path),
+                                os.path.getmtime(entry_path)))
+        entries.sort(key=lambda entry: entry[2])
+        return entries
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the cache fits in
+        max_bytes
+
+        :return: Number of removed entries
+        """
+        entries = self.entries()
+        size = sum(entry_size for _, entry_size, _ in entries)
+        removed = 0
+        for key, entry_size, _ in entries:
+            if size <= self.max_bytes:
+                break
+            shutil.rmtree(self._entry_path(key), ignore_errors=True)
+            size -= entry_size
+            removed += 1
+        return removed
+
@@ -0,0 +1,111 @@
+"""
+@author: Sebastian Cepeda
+@email: sebastian.cepeda.fuentealba@gmail.com
+"""
+
+import numpy as np
+
+RECORD_DTYPE = np.dtype([
+    ('frame_idx', np.int64),
+    ('vp_x', np.float64),
+    ('vp_y', np.float64),
+    ('vp_smoothed_x', np.float64),
+    ('vp_smoothed_y', np.float64),
+    ('n_lines', np.int32),
+    ('confidence', np.float32),
+    ('detected', np.bool_),
+])
+
+
+class FrameRecord:
+
+    def __init__(self, frame_idx, vp, vp_smoothed, n_lines, confidence,
+                 detected):
+        """
+        Vanishing point of one frame
+
+        :param frame_idx: Index of the frame
+        :param vp: Vanishing point (x, y) of the frame, None if unknown
+        :param vp_smoothed: Moving average of the vanishing point
+        :param n_lines: Number of lines supporting the vanishing point (0 for
+        frames without detection)
+        :param confidence: Confidence of the detection (nan for frames
+        without detection)
+        :param detected: False if the vanishing point was interpolated or
+        reused from other frames
+        """
+        self.frame_idx = frame_idx
+        self.vp = vp
+        self.vp_smoothed = vp_smoothed
+        self.n_lines = n_lines
+        self.confidence = confidence
+        self.detected = detected
+
+    def as_tuple(self):
+        """
+        Record as a tuple of RECORD_DTYPE
+        """
+        vp = (np.nan, np.nan) if self.vp is None else self.vp
+        vp_smoothed = (np.nan, np.nan) if self.vp_smoothed is None \
+            else self.vp_smoothed
+        return (self.frame_idx, vp[0], vp[1], vp_smoothed[0], vp_smoothed[1],
+                self.n_lines, self.confidence, self.detected)
+
+
+class ResultsWriter:
+
+    def __init__(self, path: str, chunk_size: int = 4096):
+        """
+        Writes frame records in bulk, as a NumPy structured array (.npy) or
+        as one array per column (.npz). Records are buffered in a
+        preallocated structured array that grows by chunks.
+
+        :param path: Output file, ending in .npy or .npz
+        :param chunk_size: Number of records allocated at a time
+        """
+        if not (path.endswith('.npy') or path.endswith('.npz')):
+            raise ValueError(f"Results file must be .npy or .npz: {path}")
+        self.path = path
+        self.chunk_size = chunk_size
+        self._records = np.empty(chunk_size, dtype=RECORD_DTYPE)
+        self._size = 0
+
+    def write(self, record: FrameRecord):
+        if self._size == self._records.shape[0]:
+            grown = np.empty(self._size + self.chunk_size, dtype=RECORD_DTYPE)
+            grown[0:self._size] = self._records
+            self._records = grown
+        self._records[self._size] = record.as_tuple()
+        self._size += 1
+
+    def close(self):
+        records = self._records[0:self._size]
+        if self.path.endswith('.npz'):
+            np.savez_compressed(self.path, **{name: records[name]
+                                              for name in RECORD_DTYPE.names})
+        else:
+            np.save(self.path, records)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+
+
+def load_results(path: str):
+    """
+    Loads the records written by ResultsWriter
+
+    :param path: .npy or .npz file
+    :return: Structured array of RECORD_DTYPE
+    """
+    if path.endswith('.npz'):
+        with np.load(path) as columns:
+            records = np.empty(columns['frame_idx'].shape[0],
+                               dtype=RECORD_DTYPE)
+            for name in RECORD_DTYPE.names:
+                records[name] = columns[name]
+        return records
+    return np.load(path)
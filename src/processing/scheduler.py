@@ -0,0 +1,106 @@
+"""
+@author: Sebastian Cepeda
+@email: sebastian.cepeda.fuentealba@gmail.com
+"""
+
+import cv2
+import numpy as np
+
+
+class KeyframeScheduler:
+
+    def __init__(self,
+                 interval: int = 1,
+                 change_threshold: float = None,
+                 thumbnail_size: tuple = (64, 36)):
+        """
+        Decides on which frames of a video the detection runs (keyframes).
+        The first frame is always a keyframe.
+
+        :param interval: Every interval-th frame is a keyframe. With
+        change_threshold it is the maximum distance between keyframes
+        :param change_threshold: Adaptive mode: a frame is also a keyframe
+        when the mean absolute difference of its downsampled gray image with
+        the one of the last keyframe, in gray levels, is above this threshold
+        :param thumbnail_size: Size (width, height) of the downsampled images
+        of the adaptive mode
+        """
+        self.interval = max(1, interval)
+        self.change_threshold = change_threshold
+        self.thumbnail_size = thumbnail_size
+        self.reset()
+
+    def reset(self):
+        """
+        Resets the scheduler, before a new video
+        """
+        self._last_keyframe_idx = None
+        self._last_thumbnail = None
+
+    def _thumbnail(self, frame):
+        thumbnail = cv2.resize(frame, self.thumbnail_size,
+                               interpolation=cv2.INTER_AREA)
+        if thumbnail.ndim == 3:
+            thumbnail = cv2.cvtColor(thumbnail, cv2.COLOR_BGR2GRAY)
+        return thumbnail
+
+    def is_keyframe(self, frame_idx: int, frame: np.ndarray):
+        """
+        Tells if the detection has to run on a frame. It must be called for
+        every frame, in order.
+
+        :param frame_idx: Index of the frame
+        :param frame: Frame
+        :return: True if the frame is a keyframe
+        """
+        keyframe = self._last_keyframe_idx is None or \
+            frame_idx - self._last_keyframe_idx >= self.interval
+        thumbnail = None
+        if self.change_threshold is not None:
+            thumbnail = self._thumbnail(frame)
+            if not keyframe:
+                change = cv2.absdiff(thumbnail, self._last_thumbnail).mean()
+                keyframe = change > self.change_threshold
+        if keyframe:
+            self._last_keyframe_idx = frame_idx
+            self._last_thumbnail = thumbnail
+        return keyframe
+
+
+def fill_vanishing_points(frames_vps, mode: str = 'interpolate'):
+    """
+    Fills the vanishing points of the frames without detection. With mode
+    'interpolate' they are linearly interpolated between the surrounding
+    keyframes, so the frames are held until the next keyframe; with 'reuse'
+    the vanishing point of the last keyframe is repeated without delay.
+    Frames after the last keyframe reuse its vanishing point.
+
+    :param frames_vps: Iterable of (frame index, frame, vanishing point or
+    None if the frame was not detected), in frame order
+    :param mode: 'interpolate' or 'reuse'
+    :return: Generator of (frame index, frame, vanishing point, is keyframe)
+    for every frame
+    """
+    if mode not in ('interpolate', 'reuse'):
+        raise ValueError(f"Unknown fill mode: {mode}")
+    pending = []
+    last_vp = None
+    for frame_idx, frame, vp in frames_vps:
+        if vp is None:
+            if mode == 'interpolate' and last_vp is not None:
+                pending.append((frame_idx, frame))
+            else:
+                yield frame_idx, frame, last_vp, False
+            continue
+        n_pending = len(pending)
+        for k, (pending_idx, pending_frame) in enumerate(pending, 1):
+            t = k / (n_pending + 1)
+            x = last_vp[0] + t * (vp[0] - last_vp[0])
+            y = last_vp[1] + t * (vp[1] - last_vp[1])
+            yield pending_idx, pending_frame, (int(round(x)),
+                                               int(round(y))), False
+        pending = []
+        last_vp = vp
+        yield frame_idx, frame, vp, True
+    for pending_idx, pending_frame in pending:
+        yield pending_idx, pending_frame, last_vp, False
@@ -0,0 +1,253 @@
+"""
+@author: Sebastian Cepeda
+@email: sebastian.cepeda.fuentealba@gmail.com
+"""
+
+import queue
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+
+import cv2
+import numpy as np
+
+from src.processing.workers import init_worker_detector, worker_detector
+
+
+def _attach_shared_memory(name):
+    try:
+        return SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13 attaching registers the block again, in the
+        # resource tracker shared with the creator (the creator unlinks it)
+        return SharedMemory(name=name)
+
+
+class SharedFrameRing:
+
+    def __init__(self,
+                 frame_shape: tuple,
+                 dtype=np.uint8,
+                 slots: int = 8,
+                 name: str = None):
+        """
+        Ring of frame slots in a multiprocessing.shared_memory block. The
+        producer writes each frame in a free slot and hands only the slot
+        index to the worker processes, which see the slot as a numpy view
+        (attach) without copying or pickling the frame. Slots are released
+        back to the ring when their result has been consumed.
+
+        :param frame_shape: Shape of the frames
+        :param dtype: Type of the frames
+        :param slots: Number of slots, the maximum number of frames in flight
+        :param name: Name of an existing block to attach to (workers), None
+        to create a new one (producer)
+        """
+        self.frame_shape = tuple(frame_shape)
+        self.dtype = np.dtype(dtype)
+        self.slots = slots
+        self._owner = name is None
+        frame_size = int(np.prod(self.frame_shape)) * self.dtype.itemsize
+        if self._owner:
+            self._shared_memory = SharedMemory(create=True,
+                                               size=frame_size * slots)
+        else:
+            self._shared_memory = _attach_shared_memory(name)
+        self.name = self._shared_memory.name
+        self._frames = np.ndarray((slots,) + self.frame_shape,
+                                  dtype=self.dtype,
+                                  buffer=self._shared_memory.buf)
+        self._free = queue.Queue()
+        if self._owner:
+            for slot in range(slots):
+                self._free.put(slot)
+
+    @classmethod
+    def attach(cls, name, frame_shape, dtype, slots):
+        """
+        Attaches to the ring created by another process
+
+        :param name: Name of the shared memory block (ring.name)
+        :param frame_shape: Shape of the frames
+        :param dtype: Type of the frames
+        :param slots: Number of slots
+        :return: SharedFrameRing
+        """
+        return cls(frame_shape, dtype, slots, name=name)
+
+    def acquire(self, timeout: float = None):
+        """
+        Takes a free slot, waiting for one to be released if there are none
+
+        :param timeout: Maximum waiting time in seconds, None waits forever
+        :return: Slot index
+        """
+        return self._free.get(timeout=timeout)
+
+    def release(self, slot: int):
+        """
+        Gives a slot back to the ring
+
+        :param slot: Slot index
+        """
+        self._free.put(slot)
+
+    @property
+    def free_slots(self):
+        return self._free.qsize()
+
+    def view(self, slot: int):
+        """
+        Frame of a slot, as a view of the shared memory (no copy)
+
+        :param slot: Slot index
+        :return: Frame
+        """
+        return self._frames[slot]
+
+    def write(self, slot: int, frame):
+        """
+        Writes a frame in a slot
+
+        :param slot: Slot index
+        :param frame: Frame, of the shape and type of the ring
+        :return: View of the slot
+        """
+        view = self._frames[slot]
+        np.copyto(view, frame)
+        return view
+
+    def close(self):
+        """
+        Releases the shared memory of this process. The block is destroyed
+        when its creator closes it, the views of the slots must not be used
+        afterwards
+        """
+        self._frames = None
+        self._shared_memory.close()
+        if self._owner:
+            self._shared_memory.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+# Ring of each worker process, set by _init_frame_worker
+_worker_ring = None
+
+
+def _init_frame_worker(ring_params, detector_params):
+    global _worker_ring
+    _worker_ring = SharedFrameRing.attach(*ring_params)
+    init_worker_detector(detector_params)
+
+
+def _detect_slot(slot, with_stats):
+    vp_detector = worker_detector()
+    result = vp_detector.execute(_worker_ring.view(slot))
+    if with_stats:
+        result = (result, vp_detector.last_stats)
+    return result
+
+
+class ProcessVideoPipeline:
+
+    def __init__(self,
+                 workers: int = 2,
+                 detector_params: dict = None,
+                 preprocess=None,
+                 slots: int = None,
+                 scheduler=None,
+                 with_stats: bool = False,
+                 dim: tuple = None):
+        """
+        Video pipeline with detection in worker processes, with the same
+        interface as VideoPipeline. The frames are transported through a
+        SharedFrameRing sized to the (preprocessed) frame shape: the workers
+        receive slot indexes and return only the detection results.
+
+        :param workers: Number of worker processes, each one with its own
+        long-lived detector
+        :param detector_params: Keyword arguments of the detectors
+        :param preprocess: Optional method applied to each frame before it
+        is copied in the ring. Not used if dim is given
+        :param slots: Number of frames in flight, by default 2 per worker
+        :param scheduler: Optional KeyframeScheduler. The frames that are not
+        keyframes are not sent to the workers and have a None result
+        :param with_stats: The result of each detected frame is the pair
+        (detection result, detector.last_stats)
+        :param dim: Size (width, height) the frames are resized to. They are
+        resized straight into their ring slot, without an intermediate frame
+        """
+        self.workers = workers
+        self.detector_params = detector_params or {}
+        self.preprocess = preprocess
+        self.dim = dim
+        self.slots = slots if slots is not None else 2 * workers
+        self.scheduler = scheduler
+        self.with_stats = with_stats
+
+    def run(self, frames):
+        """
+        Runs the detection over the frames
+
+        :param frames: Iterable of frames (e.g. read_video_frames(video))
+        :return: Generator of (frame index, preprocessed frame, detection
+        result), in frame order. The frame is a view of a ring slot, only
+        valid until the next item is requested (copy it to keep it)
+        """
+        ring = None
+        executor = None
+        in_flight = deque()
+        try:
+            for frame_idx, frame in enumerate(frames):
+                if self.dim is None and self.preprocess is not None:
+                    frame = self.preprocess(frame)
+                if ring is None:
+                    frame_shape = frame.shape
+                    if self.dim is not None:
+                        frame_shape = (self.dim[1], self.dim[0]) + \
+                            frame.shape[2:]
+                    ring = SharedFrameRing(frame_shape, frame.dtype,
+                                           self.slots)
+                    ring_params = (ring.name, ring.frame_shape, ring.dtype,
+                                   ring.slots)
+                    executor = ProcessPoolExecutor(
+                        self.workers, initializer=_init_frame_worker,
+                        initargs=(ring_params, self.detector_params))
+                if ring.free_slots == 0:
+                    yield self._next_result(ring, in_flight)
+                slot = ring.acquire()
+                if self.dim is not None:
+                    frame = cv2.resize(frame, self.dim, dst=ring.view(slot),
+                                       interpolation=cv2.INTER_AREA)
+                else:
+                    frame = ring.write(slot, frame)
+                future = None
+                if self.scheduler is None or \
+                        self.scheduler.is_keyframe(frame_idx, frame):
+                    future = executor.submit(_detect_slot, slot,
+                                             self.with_stats)
+                in_flight.append((frame_idx, slot, future))
+            while in_flight:
+                yield self._next_result(ring, in_flight)
+        finally:
+            for _, _, future in in_flight:
+                if future is not None:
+                    future.cancel()
+            if executor is not None:
+                executor.shutdown(wait=True)
+            if ring is not None:
+                ring.close()
+
+    @staticmethod
+    def _next_result(ring, in_flight):
+        # The slot is only written again after the consumer asks for the
+        # next item, when it is done with this frame
+        frame_idx, slot, future = in_flight.popleft()
+        result = None if future is None else future.result()
+        ring.release(slot)
+        return frame_idx, ring.view(slot), result
@@ -0,0 +1,153 @@
+"""
+@author: Sebastian Cepeda
+@email: sebastian.cepeda.fuentealba@gmail.com
+"""
+
+import cv2
+import numpy as np
+
+from src.algorithms.vanishing_point_detector import VanishingPointsDetector
+from src.processing.results import FrameRecord
+from src.processing.frame_sources import open_frame_source
+from src.processing.scheduler import fill_vanishing_points
+from src.processing.shared_frames import ProcessVideoPipeline
+from src.processing.video_pipeline import VideoPipeline, read_video_frames
+
+
+def stream_video_results(video,
+                         detectors: list,
+                         dim: tuple = None,
+                         scheduler=None,
+                         fill_mode: str = 'interpolate',
+                         ema_weight: float = 5.0 / 30,
+                         queue_size: int = 8,
+                         processes: int = 0,
+                         detector_params: dict = None):
+    """
+    Runs the detection pipeline over an opened video and yields the record of
+    every frame, in frame order, with the moving average of the vanishing
+    point applied in that order
+
+    :param video: Opened cv2.VideoCapture, or iterable of frames (e.g. a
+    FrameSource)
+    :param detectors: Detectors, one per pipeline worker thread (unused
+    with worker processes)
+    :param dim: Size (width, height) the frames are resized to, None to keep
+    them
+    :param scheduler: Optional KeyframeScheduler
+    :param fill_mode: Fill mode of the frames without detection
+    :param ema_weight: Weight of the new vanishing point in the moving
+    average
+    :param queue_size: Size of the pipeline queues
+    :param processes: Number of worker processes. If set, the detection runs
+    in a ProcessVideoPipeline (frames resized straight into shared memory)
+    instead of in threads
+    :param detector_params: Keyword arguments of the detectors of the worker
+    processes
+    :return: Generator of (FrameRecord, frame). The frame is only valid until
+    the next item is requested
+    """
+    preprocess = None
+    if dim is not None:
+        def preprocess(frame):
+            return cv2.resize(frame, dim, interpolation=cv2.INTER_AREA)
+    if processes > 0:
+        pipeline = ProcessVideoPipeline(processes, detector_params,
+                                        scheduler=scheduler, with_stats=True,
+                                        dim=dim)
+    else:
+        pipeline = VideoPipeline(detectors, preprocess=preprocess,
+                                 queue_size=queue_size, scheduler=scheduler,
+                                 with_stats=True)
+    frames = video
+    if isinstance(video, cv2.VideoCapture):
+        frames = read_video_frames(video)
+    results = pipeline.run(frames)
+    detections = {}
+
+    def frames_vps():
+        for frame_idx, frame, result in results:
+            vp = None
+            if result is not None:
+                vp_lines, stats = result
+                if len(vp_lines) > 0:
+                    vp, lines = vp_lines[0]
+                    detections[frame_idx] = (len(lines), stats.confidence)
+            if vp is None and processes > 0:
+                # Frames without vanishing point can be held by the fill
+                # until the next keyframe, after their ring slot is reused
+                # (or the ring is closed)
+                frame = frame.copy()
+            yield frame_idx, frame, vp
+
+    vp_ma = None
+    dv = ema_weight
+    try:
+        for frame_idx, frame, vp, detected in fill_vanishing_points(
+                frames_vps(), fill_mode):
+            n_lines, confidence = detections.pop(frame_idx, (0, np.nan))
+            # Moving average of vanishing point, in frame order
+            if vp is not None:
+                if vp_ma is None:
+                    vp_ma = vp
+                else:
+                    x, y = vp
+                    x_ma, y_ma = vp_ma
+                    x_ma, y_ma = (1-dv)*x_ma + dv*x, (1-dv)*y_ma + dv*y
+                    vp_ma = int(x_ma), int(y_ma)
+            record = FrameRecord(frame_idx, vp, vp_ma, n_lines, confidence,
+                                 detected)
+            yield record, frame
+    finally:
+        results.close()
+
+
+def iter_video_results(video_path: str,
+                       vp_detector=None,
+                       workers: int = 1,
+                       scale: float = 0.5,
+                       scheduler=None,
+                       fill_mode: str = 'interpolate',
+                       framerate: float = 30,
+                       detector_params: dict = None,
+                       processes: int = 0):
+    """
+    Streaming API: generator of the vanishing point records of a video,
+    without rendering anything
+
+    :param video_path: Video file, image sequence folder, .npy stack or raw
+    dump (see src.processing.frame_sources)
+    :param vp_detector: Optional long-lived detector, used by the first
+    worker
+    :param workers: Number of detection workers
+    :param scale: Scale of the frames given to the detectors
+    :param scheduler: Optional KeyframeScheduler
+    :param fill_mode: Fill mode of the frames without detection
+    :param framerate: Frame rate, the moving average weight is 5 / framerate
+    :param detector_params: Keyword arguments of the detectors created here
+    :param processes: Number of worker processes, used instead of the worker
+    threads if set
+    :return: Generator of FrameRecord
+    """
+    source = open_frame_source(video_path)
+    if detector_params is None:
+        detector_params = {}
+    if vp_detector is None:
+        vp_detector = VanishingPointsDetector('', **detector_params)
+    vp_detector.reset_tracking()
+    detectors = [vp_detector]
+    for _ in range(workers - 1):
+        detectors.append(VanishingPointsDetector('', **detector_params))
+    if scheduler is not None:
+        scheduler.reset()
+    h, w = source.frame_shape[0:2]
+    w, h = int(w * scale), int(h * scale)
+    try:
+        for record, _ in stream_video_results(source, detectors, (w, h),
+                                              scheduler, fill_mode,
+                                              5.0 / framerate,
+                                              processes=processes,
+                                              detector_params=detector_params):
+            yield record
+    finally:
+        source.close()
@@ -0,0 +1,166 @@
+"""
+@author: Sebastian Cepeda
+@email: sebastian.cepeda.fuentealba@gmail.com
+"""
+
+import queue
+import threading
+
+_END = object()
+_QUEUE_TIMEOUT = 0.1
+
+
+def _put(_queue, item, stop):
+    while not stop.is_set():
+        try:
+            _queue.put(item, timeout=_QUEUE_TIMEOUT)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _get(_queue, stop):
+    while not stop.is_set():
+        try:
+            return _queue.get(timeout=_QUEUE_TIMEOUT)
+        except queue.Empty:
+            pass
+    return _END
+
+
+def read_video_frames(video):
+    """
+    Generator of the frames of an opened cv2.VideoCapture
+
+    :param video: Opened video
+    :return: Frames
+    """
+    while video.isOpened():
+        ret, frame = video.read()
+        if not ret:
+            break
+        if frame is None:
+            raise Exception("Couldn't read frame of video")
+        yield frame
+
+
+class _PipelineError:
+
+    def __init__(self, error):
+        self.error = error
+
+
+class VideoPipeline:
+
+    def __init__(self,
+                 detectors: list,
+                 preprocess=None,
+                 queue_size: int = 8,
+                 scheduler=None,
+                 with_stats: bool = False):
+        """
+        Staged streaming pipeline: a reader thread decodes the frames, one
+        worker thread per detector runs the detection (OpenCV releases the
+        GIL) and the frames are handed back in order to the consumer of run,
+        which acts as the writer stage. The queues between the stages are
+        bounded, so decoding never runs far ahead of detection and writing.
+
+        :param detectors: Detectors, one per worker. Each one is used by a
+        single thread
+        :param preprocess: Optional method applied to each frame in the
+        workers before detection (e.g. resize)
+        :param queue_size: Size of the queues between stages
+        :param scheduler: Optional KeyframeScheduler, called by the reader in
+        frame order. The frames that are not keyframes are only preprocessed
+        and have a None result
+        :param with_stats: The result of each detected frame is the pair
+        (detection result, detector.last_stats)
+        """
+        self.detectors = detectors
+        self.preprocess = preprocess
+        self.queue_size = queue_size
+        self.scheduler = scheduler
+        self.with_stats = with_stats
+
+    def _reader(self, frames, frames_queue, results_queue, stop):
+        try:
+            for frame_idx, frame in enumerate(frames):
+                detect = self.scheduler is None or \
+                    self.scheduler.is_keyframe(frame_idx, frame)
+                if not _put(frames_queue, (frame_idx, frame, detect), stop):
+                    return
+        except Exception as e:
+            _put(results_queue, _PipelineError(e), stop)
+        for _ in self.detectors:
+            _put(frames_queue, _END, stop)
+
+    def _worker(self, detector, frames_queue, results_queue, stop):
+        while True:
+            item = _get(frames_queue, stop)
+            if item is _END:
+                break
+            frame_idx, frame, detect = item
+            try:
+                if self.preprocess is not None:
+                    frame = self.preprocess(frame)
+                result = None
+                if detect:
+                    result = detector.execute(frame)
+                    if self.with_stats:
+                        result = (result, detector.last_stats)
+            except Exception as e:
+                _put(results_queue, _PipelineError(e), stop)
+                return
+            if not _put(results_queue, (frame_idx, frame, result), stop):
+                return
+        _put(results_queue, _END, stop)
+
+    def run(self, frames):
+        """
+        Runs the detection over the frames
+
+        :param frames: Iterable of frames (e.g. read_video_frames(video))
+        :return: Generator of (frame index, preprocessed frame, detection
+        result), in frame order
+        """
+        frames_queue = queue.Queue(maxsize=self.queue_size)
+        results_queue = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        threads = [threading.Thread(target=self._reader,
+                                    args=(frames, frames_queue,
+                                          results_queue, stop),
+                                    daemon=True)]
+        for detector in self.detectors:
+            threads.append(threading.Thread(target=self._worker,
+                                            args=(detector, frames_queue,
+                                                  results_queue, stop),
+                                            daemon=True))
+        for thread in threads:
+            thread.start()
+        # Results arrive out of order, they are held until their turn
+        pending = {}
+        next_idx = 0
+        running_workers = len(self.detectors)
+        try:
+            while running_workers > 0 or pending:
+                if next_idx in pending:
+                    frame, result = pending.pop(next_idx)
+                    yield next_idx, frame, result
+                    next_idx += 1
+                    continue
+                if running_workers == 0:
+                    # Only reachable if a frame was lost
+                    break
+                item = results_queue.get()
+                if item is _END:
+                    running_workers -= 1
+                elif isinstance(item, _PipelineError):
+                    raise item.error
+                else:
+                    frame_idx, frame, result = item
+                    pending[frame_idx] = (frame, result)
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
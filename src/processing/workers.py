@@ -0,0 +1,33 @@
+"""
+@author: Sebastian Cepeda
+@email: sebastian.cepeda.fuentealba@gmail.com
+"""
+
+from src.algorithms.vanishing_point_detector import VanishingPointsDetector
+
+# Long-lived detector of the current worker process, created by
+# init_worker_detector
+_detector = None
+
+
+def init_worker_detector(detector_params: dict, _logger=None):
+    """
+    Creates the long-lived detector of a worker process. Initializer of the
+    process pools, directly or from their own initializer
+
+    :param detector_params: Keyword arguments of the detector
+    :param _logger: Optional logger of the detector
+    """
+    global _detector
+    if _logger is not None:
+        detector_params = dict(detector_params, _logger=_logger)
+    _detector = VanishingPointsDetector('', **detector_params)
+
+
+def worker_detector():
+    """
+    Detector of the current worker process
+
+    :return: VanishingPointsDetector, None outside of the worker processes
+    """
+    return _detector
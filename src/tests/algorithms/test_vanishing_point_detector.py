@@ -0,0 +1,158 @@
+"""
+@author: Sebastian Cepeda
+@email: sebastian.cepeda.fuentealba@gmail.com
+"""
+import cv2
+import numpy as np
+
+from src.algorithms.vanishing_point_detector import VanishingPointsDetector
+from src.benchmarks.synthetic_scene import render_scene
+from src.computer_vision.line_detectors import available_line_detectors
+
+
+def _road_image(vp, image_shape=(480, 640)):
+    image = np.full(image_shape + (3,), 90, dtype=np.uint8)
+    for x in range(-600, 1300, 60):
+        cv2.line(image, vp, (x, image_shape[0]), (255, 255, 255), 3)
+    return image
+
+
+def test_detector_finds_vanishing_point():
+    vp_detector = VanishingPointsDetector('', debug_level=0)
+    vp_lines = vp_detector.execute(_road_image((330, 200)))
+    vp, lines = vp_lines[0]
+    assert np.hypot(vp[0] - 330, vp[1] - 200) < 5
+    assert len(lines) > 2
+
+
+def test_detector_reuses_state_per_shape():
+    vp_detector = VanishingPointsDetector('', max_cached_shapes=1)
+    image = _road_image((330, 200))
+    first = vp_detector.execute(image)
+    state = vp_detector._get_state(image.shape)
+    assert vp_detector.execute(image) == first
+    assert vp_detector._get_state(image.shape) is state
+
+    vp_detector.execute(_road_image((200, 150), image_shape=(360, 480)))
+    assert list(vp_detector._states.keys()) == [(360, 480)]
+
+
+def test_tracking_mode_follows_and_falls_back():
+    vp_detector = VanishingPointsDetector('', tracking=True)
+    vp_lines = vp_detector.execute(_road_image((300, 200)))
+    assert not vp_detector.last_tracked
+
+    vp_lines = vp_detector.execute(_road_image((308, 202)))
+    vp, _ = vp_lines[0]
+    assert vp_detector.last_tracked
+    assert np.hypot(vp[0] - 308, vp[1] - 202) < 5
+
+    # A jump of the vanishing point leaves no lines near the tracked one
+    vp_lines = vp_detector.execute(_road_image((100, 100)))
+    vp, _ = vp_lines[0]
+    assert not vp_detector.last_tracked
+    assert np.hypot(vp[0] - 100, vp[1] - 100) < 5
+
+
+def test_working_scale_and_pyramid():
+    image = _road_image((660, 400), image_shape=(960, 1280))
+    for params in ({'working_scale': 0.5}, {'pyramid': True}):
+        vp_detector = VanishingPointsDetector('', **params)
+        vp, lines = vp_detector.execute(image)[0]
+        assert np.hypot(vp[0] - 660, vp[1] - 400) < 10
+        # Lines are given in the coordinates of the input image
+        a, b, c = lines[0]
+        assert abs(a * 660 + b * 400 + c) / np.hypot(a, b) < 10
+
+
+def test_detector_on_synthetic_scenes():
+    vp_detector = VanishingPointsDetector('')
+    for seed in range(3):
+        image, expected_vp = render_scene((360, 640), seed=seed)
+        vp, _ = vp_detector.execute(image)[0]
+        assert np.hypot(vp[0] - expected_vp[0], vp[1] - expected_vp[1]) < 10
+
+
+def test_region_of_interest():
+    image = _road_image((330, 200))
+    rectangle = (100, 120, 460, 360)
+    polygon = [(330, 150), (620, 480), (40, 480)]
+    for roi in (rectangle, polygon):
+        vp_detector = VanishingPointsDetector('')
+        vp, lines = vp_detector.execute(image, roi=roi)[0]
+        # Results are given in the coordinates of the input image
+        assert np.hypot(vp[0] - 330, vp[1] - 200) < 5
+        a, b, c = lines[0]
+        assert abs(a * 330 + b * 200 + c) / np.hypot(a, b) < 5
+    assert list(vp_detector._states.keys()) == [(330, 581)]
+
+
+def test_ransac_estimator():
+    vp_detector = VanishingPointsDetector('', estimator='ransac', seed=1)
+    image = _road_image((330, 200))
+    vp, lines = vp_detector.execute(image)[0]
+    assert np.hypot(vp[0] - 330, vp[1] - 200) < 5
+    assert len(lines) > 2
+    assert vp_detector.last_confidence > 0.5
+
+
+def test_sphere_estimator():
+    vp_detector = VanishingPointsDetector('', estimator='sphere')
+    vp, lines = vp_detector.execute(_road_image((330, 200)))[0]
+    assert np.hypot(vp[0] - 330, vp[1] - 200) < 5
+    assert len(lines) > 2
+
+
+def test_pruned_line_pairs():
+    vp_detector = VanishingPointsDetector('', min_pair_angle=2,
+                                          max_lines_per_bucket=8)
+    vp, _ = vp_detector.execute(_road_image((330, 200)))[0]
+    assert np.hypot(vp[0] - 330, vp[1] - 200) < 5
+
+
+def test_steerable_gabor_method():
+    vp_detector = VanishingPointsDetector('', gabor_method='steerable')
+    vp, _ = vp_detector.execute(_road_image((330, 200)))[0]
+    assert np.hypot(vp[0] - 330, vp[1] - 200) < 5
+
+
+def test_line_detectors():
+    image = _road_image((330, 200))
+    polygon = [(330, 150), (620, 480), (40, 480)]
+    for name in available_line_detectors():
+        vp_detector = VanishingPointsDetector('', line_detector=name)
+        vp, lines = vp_detector.execute(image)[0]
+        assert np.hypot(vp[0] - 330, vp[1] - 200) < 5, name
+        assert len(lines) > 2, name
+        vp, _ = vp_detector.execute(image, roi=polygon)[0]
+        assert np.hypot(vp[0] - 330, vp[1] - 200) < 5, name
+
+
+def test_tracking_with_moving_roi():
+    vp_detector = VanishingPointsDetector('', tracking=True)
+    vp_detector.execute(_road_image((330, 200)), roi=(100, 120, 460, 360))
+    # Same crop size, another offset: the tracked vanishing point is kept
+    # in the coordinates of the frames
+    vp, _ = vp_detector.execute(_road_image((334, 202)),
+                                roi=(20, 60, 460, 360))[0]
+    assert vp_detector.last_tracked
+    assert np.hypot(vp[0] - 334, vp[1] - 202) < 5
+
+
+def test_segment_angle_thresholds():
+    image = _road_image((330, 200))
+    for y in (60, 120, 300, 400):
+        cv2.line(image, (0, y), (639, y + 4), (255, 255, 255), 3)
+    for x in (40, 600):
+        cv2.line(image, (x, 0), (x + 3, 479), (255, 255, 255), 3)
+    vp_detector = VanishingPointsDetector('')
+    vp_detector.execute(image)
+    segments = vp_detector.last_stats.as_dict()['segments_filtered']
+    vp_detector = VanishingPointsDetector('', horizontal_angle_threshold=10,
+                                          vertical_angle_threshold=10)
+    vp, _ = vp_detector.execute(image)[0]
+    assert np.hypot(vp[0] - 330, vp[1] - 200) < 5
+    # The near horizontal and near vertical clutter is discarded
+    state = next(iter(vp_detector._states.values()))
+    assert state.segment_filter.horizontal_angle_threshold == 10
+    assert vp_detector.last_stats.as_dict()['segments_filtered'] < segments
@@ -0,0 +1,52 @@
+"""
+@author: Sebastian Cepeda
+@email: sebastian.cepeda.fuentealba@gmail.com
+"""
+import cv2
+import numpy as np
+
+from src.computer_vision.gabor_bank import GaborBank
+
+
+def _test_image():
+    rng = np.random.RandomState(0)
+    image = rng.randint(0, 256, size=(120, 160)).astype(np.uint8)
+    return cv2.GaussianBlur(image, (5, 5), 0)
+
+
+def test_kernels_are_cached():
+    gb_1 = GaborBank(ksize=11, angle_steps=18)
+    gb_2 = GaborBank(ksize=11, angle_steps=18)
+    assert gb_1.kernels is gb_2.kernels
+    assert len(gb_1.kernels) == 18
+    assert GaborBank(ksize=13).kernels is not gb_1.kernels
+
+
+def test_fft_matches_direct():
+    image = _test_image()
+    direct = GaborBank(ksize=21, method='direct').execute(image)
+    fft = GaborBank(ksize=21, method='fft').execute(image)
+    difference = np.abs(direct.astype(np.int16) - fft)
+    # Rounding of the float32 dft can flip the last bit
+    assert difference.max() <= 1
+
+
+def test_execute_into_preallocated_output():
+    image = _test_image()
+    out = np.full_like(image, 255)
+    result = GaborBank(ksize=5).execute(image, out=out)
+    assert result is out
+    assert np.array_equal(result, GaborBank(ksize=5).execute(image))
+
+
+def test_steerable_approximation():
+    image = _test_image()
+    bank = GaborBank(ksize=11, method='steerable', basis_size=6)
+    approximation = bank.execute(image)
+    assert approximation.dtype == np.uint8
+    report = bank.approximation_error(image)
+    assert 0 < report['energy'] < 1
+    assert report['mean_abs_error'] < 1
+    # The full basis reproduces the bank
+    full = GaborBank(ksize=11, method='steerable', basis_size=18)
+    assert full.approximation_error(image)['max_abs_error'] <= 1
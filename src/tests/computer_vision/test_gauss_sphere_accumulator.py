@@ -0,0 +1,40 @@
+"""
+@author: Sebastian Cepeda
+@email: sebastian.cepeda.fuentealba@gmail.com
+"""
+import numpy as np
+
+from src.computer_vision.gauss_sphere_accumulator import \
+    GaussSphereAccumulatorFilter, lines_directions, octahedral_cells
+from src.computer_vision.line import line_from_2_points
+
+
+def test_directions_of_parallel_lines_are_at_infinity():
+    lines = np.array([line_from_2_points(0, 10, 100, 10),
+                      line_from_2_points(0, 50, 100, 50),
+                      line_from_2_points(0, 0, 100, 100)], dtype=np.float64)
+    directions, idx1, idx2 = lines_directions((100, 100), 100.0, lines,
+                                              np.array([0, 0]),
+                                              np.array([1, 2]))
+    np.testing.assert_allclose(directions[0], (1, 0, 0), atol=1e-12)
+    assert directions[1, 2] > 0
+    cells = octahedral_cells(directions, 8)
+    assert np.all((cells >= 0) & (cells < 64))
+
+
+def test_sphere_accumulator_finite_and_infinite_vps():
+    rng = np.random.RandomState(0)
+    vp_filter = GaussSphereAccumulatorFilter()
+    lines = [line_from_2_points(*rng.randint(0, 600, size=2), 300, 200)
+             for _ in range(30)]
+    vp, lines_in = vp_filter.execute((480, 640), np.array(lines))[0]
+    assert np.hypot(vp[0] - 300, vp[1] - 200) < 3
+    assert len(lines_in) == 30
+
+    # Nearly horizontal lines, tilted both ways
+    lines = [line_from_2_points(0, y, 600, y + (-1) ** y)
+             for y in range(20, 460, 25)]
+    vp, lines_in = vp_filter.execute((480, 640), np.array(lines))[0]
+    assert abs(vp[0]) > 100 * 640
+    assert abs(vp[1] - 240) < 20
+    assert len(lines_in) == len(lines)
@@ -4,7 +4,7 @@
 """
 import numpy as np
 
-from src.computer_vision.line import line_from_2_points
+from src.computer_vision.line import line_from_2_points, lines_from_segments
 
 
 def test_line_from_2_points():
@@ -24,3 +24,13 @@ def test_line_from_2_points():
 
     det_line = line_from_2_points(x1, y1, x2, y2)
     assert all(np.isclose(line, det_line)) or all(np.isclose(-line, det_line))
+
+
+def test_lines_from_segments():
+    segments = np.array([[[0, 0, 10, 5]], [[3, 7, 3, 100]],
+                         [[1920, 1080, 5, 2]]], dtype=np.int32)
+    lines = lines_from_segments(segments)
+    assert lines.shape == (3, 3) and lines.dtype == np.float64
+    for segment, line in zip(segments, lines):
+        assert tuple(line) == line_from_2_points(*segment[0].tolist())
+    assert lines_from_segments(np.empty((0, 1, 4))).shape == (0, 3)
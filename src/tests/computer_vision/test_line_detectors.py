@@ -0,0 +1,52 @@
+"""
+@author: Sebastian Cepeda
+@email: sebastian.cepeda.fuentealba@gmail.com
+"""
+import cv2
+import numpy as np
+import pytest
+
+from src.computer_vision.line_detectors import available_line_detectors, \
+    create_line_detector
+
+
+def _segment_image(image_shape=(240, 320)):
+    image = np.full(image_shape, 60, dtype=np.uint8)
+    cv2.line(image, (40, 200), (280, 40), 220, 3)
+    return cv2.GaussianBlur(image, (3, 3), 0)
+
+
+def test_line_detectors():
+    image = _segment_image()
+    edges = cv2.Canny(image, 50, 200, apertureSize=3)
+    for name in available_line_detectors():
+        line_detector = create_line_detector(name, image.shape)
+        segments = line_detector.execute(image, edges)
+        assert segments.ndim == 3 and segments.shape[1:] == (1, 4), name
+        lengths = np.hypot(segments[:, 0, 2] - segments[:, 0, 0],
+                           segments[:, 0, 3] - segments[:, 0, 1])
+        x1, y1, x2, y2 = segments[np.argmax(lengths), 0]
+        assert lengths.max() > 200, name
+        # The longest segment lies on the drawn line
+        for x, y in ((x1, y1), (x2, y2)):
+            assert abs(2 * x + 3 * y - 680) / np.hypot(2, 3) < 4, name
+        empty = line_detector.execute(np.zeros_like(image),
+                                      np.zeros_like(edges))
+        assert empty.shape == (0, 1, 4)
+
+
+def test_unknown_line_detector():
+    assert 'hough' in available_line_detectors()
+    with pytest.raises(ValueError):
+        create_line_detector('unknown', (240, 320))
+
+
+def test_gradient_regions_are_connected():
+    line_detector = create_line_detector('gradient', (20, 20))
+    # Two pixels of bin 0 joined only through a pixel of bin 2
+    xs = np.array([0, 1, 2])
+    ys = np.array([0, 1, 2])
+    bins = np.array([0, 2, 0])
+    labels, n_labels = line_detector._regions(xs, ys, bins)
+    assert n_labels == 3
+    assert len(set(labels.tolist())) == 3
@@ -0,0 +1,40 @@
+"""
+@author: Sebastian Cepeda
+@email: sebastian.cepeda.fuentealba@gmail.com
+"""
+import numpy as np
+
+from src.computer_vision.orientation_index import OrientationIndex, \
+    lines_angles
+
+
+def _separations(lines, idx1, idx2):
+    angles = lines_angles(lines)
+    separation = np.abs(angles[idx1] - angles[idx2])
+    return np.minimum(separation, 180 - separation)
+
+
+def test_orientation_index_pairs():
+    lines = np.random.RandomState(0).randn(60, 3)
+    idx1, idx2 = OrientationIndex(min_angle=0).execute(lines)
+    expected1, expected2 = np.triu_indices(60, k=1)
+    np.testing.assert_array_equal(idx1, expected1)
+    np.testing.assert_array_equal(idx2, expected2)
+
+    idx1, idx2 = OrientationIndex(min_angle=10).execute(lines)
+    all_separations = _separations(lines, expected1, expected2)
+    assert idx1.shape[0] == np.count_nonzero(all_separations >= 10)
+    assert np.all(_separations(lines, idx1, idx2) >= 10)
+    assert np.all(idx1 < idx2)
+
+
+def test_orientation_index_bucket_caps():
+    # Ten lines of a facade orientation and two others
+    lines = np.array([(0, i + 1, -i) for i in range(10)] +
+                     [(1, 0, -5), (1, 1, -3)], dtype=np.float64)
+    index = OrientationIndex(min_angle=5, max_per_bucket=2)
+    idx1, idx2 = index.execute(lines)
+    used = set(idx1.tolist()) | set(idx2.tolist())
+    # The two longest of the facade bucket are kept
+    assert used == {8, 9, 10, 11}
+    assert index.last_pairs == 5
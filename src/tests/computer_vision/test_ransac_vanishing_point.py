@@ -0,0 +1,40 @@
+"""
+@author: Sebastian Cepeda
+@email: sebastian.cepeda.fuentealba@gmail.com
+"""
+import numpy as np
+
+from src.computer_vision.line import line_from_2_points
+from src.computer_vision.ransac_vanishing_point import \
+    RansacVanishingPointEstimator
+
+
+def _lines_through(vp, n_lines, n_noise, seed):
+    rng = np.random.RandomState(seed)
+    lines = []
+    for _ in range(n_lines):
+        x1, y1 = rng.randint(0, 600, size=2)
+        lines.append(line_from_2_points(x1, y1, *vp))
+    for _ in range(n_noise):
+        lines.append(line_from_2_points(*rng.randint(0, 600, size=4)))
+    return np.array(lines, dtype=np.float64)
+
+
+def test_ransac_finds_vanishing_points():
+    lines = np.concatenate((_lines_through((300, 200), 40, 0, seed=1),
+                            _lines_through((900, 250), 20, 0, seed=2),
+                            _lines_through((0, 0), 0, 30, seed=3)))
+    estimator = RansacVanishingPointEstimator(seed=5)
+    vp_lines = estimator.execute((480, 640), lines)
+    (vp1, lines1), (vp2, lines2) = vp_lines[0:2]
+    assert np.hypot(vp1[0] - 300, vp1[1] - 200) < 5
+    assert np.hypot(vp2[0] - 900, vp2[1] - 250) < 5
+    assert len(lines1) >= 40 and len(lines2) >= 20
+    assert estimator.last_hypotheses > 0
+    # Every call starts from the seed
+    assert estimator.execute((480, 640), lines) == vp_lines
+
+
+def test_ransac_without_lines():
+    estimator = RansacVanishingPointEstimator()
+    assert estimator.execute((480, 640), np.empty((0, 3))) == []
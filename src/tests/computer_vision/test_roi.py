@@ -0,0 +1,24 @@
+"""
+@author: Sebastian Cepeda
+@email: sebastian.cepeda.fuentealba@gmail.com
+"""
+import numpy as np
+import pytest
+
+from src.computer_vision.roi import crop_roi
+
+
+def test_crop_roi():
+    image = np.arange(100 * 200, dtype=np.int32).reshape(100, 200)
+    crop, offset, mask = crop_roi(image, (150, -10, 100, 40))
+    assert offset == (150, 0)
+    assert crop.shape == (30, 50)
+    assert mask is None
+
+    crop, offset, mask = crop_roi(image, [(10, 10), (60, 10), (10, 50)])
+    assert offset == (10, 10)
+    assert crop.shape == mask.shape == (41, 51)
+    assert mask[1, 1] == 255 and mask[-1, -1] == 0
+
+    with pytest.raises(ValueError):
+        crop_roi(image, (300, 0, 10, 10))
@@ -0,0 +1,23 @@
+"""
+@author: Sebastian Cepeda
+@email: sebastian.cepeda.fuentealba@gmail.com
+"""
+import numpy as np
+
+from src.computer_vision.segment_filter import SegmentFilter
+
+
+def test_segment_filter():
+    segments = np.array([[[0, 0, 5, 5]], [[0, 0, 100, 2]],
+                         [[0, 0, 3, 100]], [[0, 0, 80, 60]]], dtype=np.int32)
+    image_shape = (100, 100)
+    filtered = SegmentFilter(0.1).execute(segments, image_shape)
+    assert filtered.shape == (3, 1, 4)
+    np.testing.assert_array_equal(filtered, segments[1:])
+
+    segment_filter = SegmentFilter(0.1, horizontal_angle_threshold=5,
+                                   vertical_angle_threshold=5)
+    filtered = segment_filter.execute(segments, image_shape)
+    np.testing.assert_array_equal(filtered, segments[3:])
+    assert segment_filter.execute(np.array([]), image_shape).shape == \
+        (0, 1, 4)
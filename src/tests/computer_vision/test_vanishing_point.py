@@ -4,7 +4,9 @@
 """
 import numpy as np
 
-from src.computer_vision.vanishing_point import vp_from_two_lines
+from src.computer_vision.line import line_from_2_points
+from src.computer_vision.vanishing_point import vp_from_two_lines, \
+    intersect_lines, vps_from_lines, Z_TOLERANCE
 
 
 def test_vp_from_two_lines():
@@ -27,3 +29,35 @@ def test_vp_from_two_lines():
 
     vp = vp_from_two_lines(line_1, line_2)
     assert np.isclose(vp[2], 0)
+
+
+def test_intersect_lines():
+    line_1 = (-1, 0, 5)  # x=5
+    line_2 = (0, -1, 5)  # y=5
+    line_3 = (0, -1, 10)  # y=10
+
+    vps, idx1, idx2 = intersect_lines([line_1, line_2, line_3])
+    assert np.array_equal(vps, [[5, 5], [5, 10]])
+    assert np.array_equal(idx1, [0, 0])
+    assert np.array_equal(idx2, [1, 2])
+
+    vps, idx1, idx2 = intersect_lines([])
+    assert vps.shape == (0, 2)
+
+
+def test_vps_from_lines_matches_pairwise_loop():
+    rng = np.random.RandomState(1)
+    points = rng.randint(0, 500, size=(20, 4)).astype(np.int32)
+    lines = [line_from_2_points(*segment) for segment in points]
+    expected_vps = []
+    expected_map = {}
+    for l1 in lines:
+        for l2 in lines:
+            x, y, z = vp_from_two_lines(l1, l2)
+            if not np.isclose(z, 0.0, rtol=Z_TOLERANCE, atol=Z_TOLERANCE):
+                expected_vps.append((x, y))
+                expected_map.setdefault((x, y), set()).update((l1, l2))
+
+    vps, vp_lines_map = vps_from_lines(lines)
+    assert vps == expected_vps
+    assert vp_lines_map == expected_map
@@ -0,0 +1,56 @@
+"""
+@author: Sebastian Cepeda
+@email: sebastian.cepeda.fuentealba@gmail.com
+"""
+import numpy as np
+
+from src.computer_vision.line import line_from_2_points
+from src.computer_vision.vanishing_point import vps_from_lines, \
+    intersect_lines
+from src.computer_vision.vanishing_point_accumulator import \
+    VanishingPointAccumulatorFilter
+
+
+def _converging_lines(vp, n_lines, n_noise, seed):
+    rng = np.random.RandomState(seed)
+    segments = []
+    for _ in range(n_lines):
+        x1, y1 = rng.randint(0, 600, size=2)
+        x2, y2 = vp + rng.randint(-3, 4, size=2)
+        segments.append((x1, y1, x2, y2))
+    for _ in range(n_noise):
+        segments.append(tuple(rng.randint(0, 600, size=4)))
+    segments = np.array(segments, dtype=np.int32)
+    return [line_from_2_points(*segment) for segment in segments]
+
+
+def test_execute_array_matches_dict_accumulator():
+    image_shape = (480, 640)
+    lines = _converging_lines(np.array((300, 200)), 15, 10, seed=3)
+
+    vps, vp_lines_map = vps_from_lines(lines)
+    vp_filter = VanishingPointAccumulatorFilter(30, 3, 0.6)
+    expected = vp_filter.execute(image_shape, vps, vp_lines_map)
+
+    lines_array = np.asarray(lines, dtype=np.float64)
+    vps, idx1, idx2 = intersect_lines(lines_array)
+    vp_filter = VanishingPointAccumulatorFilter(30, 2, 0.6)
+    vp_lines = vp_filter.execute_array(image_shape, vps, idx1, idx2,
+                                       lines_array)
+
+    assert len(vp_lines) == len(expected)
+    for (vp, vp_lines_in), (expected_vp, expected_lines) in zip(vp_lines,
+                                                             expected):
+        # The dict accumulator averages with a running sum of fractions
+        assert np.allclose(vp, expected_vp, atol=1)
+        expected_lines = {tuple(float(c) for c in line)
+                          for line in expected_lines}
+        assert set(vp_lines_in) == expected_lines
+
+
+def test_execute_array_without_points():
+    vp_filter = VanishingPointAccumulatorFilter()
+    empty = np.empty((0,), dtype=np.int64)
+    vp_lines = vp_filter.execute_array((480, 640), np.empty((0, 2)), empty,
+                                       empty, np.empty((0, 3)))
+    assert vp_lines == []
@@ -0,0 +1,45 @@
+"""
+@author: Sebastian Cepeda
+@email: sebastian.cepeda.fuentealba@gmail.com
+"""
+import os
+import signal
+import time
+
+from src.processing.batch import run_batch
+
+
+def _process_file(file, in_path, out_path, logger, vp_detector):
+    assert vp_detector is not None
+    if file[0] == 'bad':
+        raise ValueError("Bad file")
+
+
+def test_run_batch_captures_errors_per_file():
+    files = [('a', 'image'), ('bad', 'image'), ('b', 'image'),
+             ('c', 'image')]
+    report = run_batch(files, _process_file, '', '', workers=2, chunk_size=1)
+    assert sorted(result.file for result in report.results) == sorted(files)
+    assert [result.file for result in report.failed] == [('bad', 'image')]
+    assert "Bad file" in report.failed[0].error
+    assert report.throughput > 0
+
+
+def _process_file_or_die(file, in_path, out_path, logger, vp_detector):
+    if file[0] == 'crash':
+        # The worker dies as if it were killed or out of memory
+        os.kill(os.getpid(), signal.SIGKILL)
+    time.sleep(0.05)
+    return [file[0]]
+
+
+def test_run_batch_replaces_dead_workers():
+    files = [(f"{i}", 'image') for i in range(12)]
+    files.insert(5, ('crash', 'image'))
+    report = run_batch(files, _process_file_or_die, '', '', workers=3,
+                       chunk_size=1)
+    assert sorted(result.file for result in report.results) == sorted(files)
+    assert [result.file for result in report.failed] == [('crash', 'image')]
+    for result in report.results:
+        if result.ok:
+            assert result.outputs == [result.file[0]]
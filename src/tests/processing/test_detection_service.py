@@ -0,0 +1,122 @@
+"""
+@author: Sebastian Cepeda
+@email: sebastian.cepeda.fuentealba@gmail.com
+"""
+import asyncio
+import json
+import os
+import signal
+
+import cv2
+import numpy as np
+
+from src.benchmarks.synthetic_scene import render_scene
+from src.processing import detection_service, workers
+from src.processing.detection_service import DetectionService
+
+
+async def _request(port, method, target, body=b''):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(f"{method} {target} HTTP/1.1\r\nHost: localhost\r\n"
+                 f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, data = response.partition(b'\r\n\r\n')
+    status = int(head.split(b' ')[1])
+    return status, json.loads(data)
+
+
+def test_detection_service():
+    image, expected_vp = render_scene((360, 640), seed=0)
+    encoded = cv2.imencode('.png', image)[1].tobytes()
+
+    async def scenario():
+        service = DetectionService(workers=1, max_batch_size=4,
+                                   batch_wait=0.01)
+        await service.start()
+        try:
+            status, health = await _request(service.port, 'GET', '/health')
+            assert status == 200 and health['status'] == 'ok'
+            # Concurrent requests share micro-batches
+            responses = await asyncio.gather(
+                _request(service.port, 'POST', '/detect', encoded),
+                _request(service.port, 'POST', '/detect', encoded),
+                _request(service.port, 'POST', '/detect?shape=360,640,3',
+                         image.tobytes()))
+            for status, response in responses:
+                assert status == 200
+                vp = response['vanishing_points'][0]
+                assert np.hypot(vp['x'] - expected_vp[0],
+                                vp['y'] - expected_vp[1]) < 10
+            status, _ = await _request(service.port, 'POST',
+                                       '/detect?shape=10,10,3', b'123')
+            assert status == 400
+            status, _ = await _request(service.port, 'GET', '/other')
+            assert status == 404
+            # Nothing can be answered within a budget of 0 seconds
+            service.latency_budget = 0.0
+            status, _ = await _request(service.port, 'POST', '/detect',
+                                       encoded)
+            assert status == 504
+        finally:
+            await service.close()
+
+    asyncio.run(scenario())
+
+
+def test_detection_service_backpressure():
+    async def scenario():
+        service = DetectionService(max_queue=1)
+        # Without started workers the queue is never drained
+        service._queue = asyncio.Queue(maxsize=service.max_queue)
+        service._queue.put_nowait(None)
+        return await service._detect(b'frame', None)
+
+    status, response = asyncio.run(scenario())
+    assert status == 503
+
+
+class _FailingDetector:
+
+    def execute(self, frame):
+        raise ValueError("Detector bug")
+
+
+def test_detection_errors(monkeypatch):
+    monkeypatch.setattr(workers, '_detector', _FailingDetector())
+    encoded = cv2.imencode('.png', np.zeros((8, 8, 3), np.uint8))[1]
+    (status, response), (bad_status, _) = detection_service._detect_batch(
+        [(encoded.tobytes(), None), (b'not an image', None)])
+    # Errors of the detector are errors of the server, without traceback
+    assert status == 500 and response == {'error': 'Detector bug'}
+    assert bad_status == 400
+
+
+def test_detection_service_replaces_dead_workers():
+    image, _ = render_scene((360, 640), seed=0)
+    encoded = cv2.imencode('.png', image)[1].tobytes()
+
+    async def scenario():
+        service = DetectionService(workers=1)
+        await service.start()
+        try:
+            for pid in list(service._executor._processes):
+                os.kill(pid, signal.SIGKILL)
+            status, _ = await _request(service.port, 'POST', '/detect',
+                                       encoded)
+            assert status == 500
+            for _ in range(100):
+                status, health = await _request(service.port, 'GET',
+                                                '/health')
+                if health['status'] == 'ok' and health['restarts'] == 1:
+                    break
+                await asyncio.sleep(0.1)
+            assert health['restarts'] == 1
+            status, _ = await _request(service.port, 'POST', '/detect',
+                                       encoded)
+            assert status == 200
+        finally:
+            await service.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,79 @@
+"""
+@author: Sebastian Cepeda
+@email: sebastian.cepeda.fuentealba@gmail.com
+"""
+import json
+
+import cv2
+import numpy as np
+
+from main import _list_files
+from src.benchmarks.synthetic_scene import render_scene
+from src.processing.frame_sources import open_frame_source, source_type, \
+    ImageSequenceSource, NpyStackSource, RawFramesSource, PrefetchSource
+from src.processing.streaming import iter_video_results
+
+
+def _frames(n_frames, shape=(24, 32, 3)):
+    return [np.full(shape, i, dtype=np.uint8) for i in range(n_frames)]
+
+
+def test_image_sequence_in_natural_order(tmp_path):
+    for i, frame in enumerate(_frames(12)):
+        cv2.imwrite(str(tmp_path / f"frame_{i}.png"), frame)
+    (tmp_path / 'notes.txt').write_text('not a frame')
+    source = open_frame_source(str(tmp_path), prefetch=2)
+    assert isinstance(source, PrefetchSource)
+    assert source.frame_shape == (24, 32, 3) and len(source) == 12
+    assert [int(frame[0, 0, 0]) for frame in source] == list(range(12))
+    assert source_type(str(tmp_path)) == 'video'
+    assert source_type(str(tmp_path / 'frame_0.png')) == 'image'
+    assert source_type(str(tmp_path / 'notes.txt')) is None
+
+
+def test_folders_without_images(tmp_path):
+    notes = tmp_path / 'notes'
+    notes.mkdir()
+    (notes / 'readme.txt').write_text('not a frame')
+    empty = tmp_path / 'empty'
+    empty.mkdir()
+    assert source_type(str(notes)) is None
+    assert source_type(str(empty)) is None
+    assert _list_files(f"{tmp_path}/") == []
+
+
+def test_memory_mapped_sources(tmp_path):
+    frames = np.stack(_frames(5))
+    np.save(str(tmp_path / 'stack.npy'), frames)
+    frames.tofile(str(tmp_path / 'dump.raw'))
+    with open(str(tmp_path / 'dump.raw.json'), 'w') as f:
+        json.dump({'frame_shape': [24, 32, 3], 'fps': 25}, f)
+
+    with open_frame_source(str(tmp_path / 'stack.npy')) as source:
+        assert isinstance(source, NpyStackSource)
+        read = list(source)
+        # Views of the mapped file, not copies
+        assert all(np.shares_memory(frame, source.frames) for frame in read)
+        np.testing.assert_array_equal(np.stack(read), frames)
+    with open_frame_source(str(tmp_path / 'dump.raw'),
+                           readahead=2) as source:
+        assert isinstance(source, RawFramesSource)
+        assert source.fps == 25 and len(source) == 5
+        np.testing.assert_array_equal(np.stack(list(source)), frames)
+
+
+def test_iter_video_results_over_npy_stack(tmp_path):
+    frames = np.stack([render_scene((360, 640), seed=seed)[0]
+                       for seed in range(3)])
+    np.save(str(tmp_path / 'stack.npy'), frames)
+    records = list(iter_video_results(str(tmp_path / 'stack.npy'),
+                                      scale=1.0))
+    assert [record.frame_idx for record in records] == [0, 1, 2]
+    assert all(record.detected for record in records)
+
+
+def test_single_image_source(tmp_path):
+    cv2.imwrite(str(tmp_path / 'a.jpg'), _frames(1)[0])
+    source = open_frame_source(str(tmp_path / 'a.jpg'))
+    assert isinstance(source, ImageSequenceSource)
+    assert len(list(source)) == 1
@@ -0,0 +1,98 @@
+"""
+@author: Sebastian Cepeda
+@email: sebastian.cepeda.fuentealba@gmail.com
+"""
+import os
+import time
+
+import cv2
+import pytest
+
+from main import main_method
+from src.benchmarks.synthetic_scene import render_scene
+from src.processing.result_cache import ResultCache, cached_params, \
+    file_digest, params_digest
+from src.utils.print_logger import PrintLogger as logger
+
+
+def _write(path, content):
+    with open(path, 'wb') as f:
+        f.write(content)
+
+
+def test_result_cache(tmp_path):
+    cache = ResultCache(str(tmp_path / 'cache'), max_bytes=150)
+    in_file = str(tmp_path / 'a.jpg')
+    _write(in_file, b'image a')
+    out_path = tmp_path / 'out'
+    out_path.mkdir()
+    key = cache.key(in_file, {'working_scale': 0.5})
+    assert key != cache.key(in_file, {'working_scale': 1.0})
+    assert not cache.restore(key, str(out_path), 'a.jpg')
+
+    output = str(out_path / 'a.jpgfiltered_vps.png')
+    _write(output, b'x' * 100)
+    cache.store(key, [output], 'a.jpg')
+    os.remove(output)
+    assert cache.restore(key, str(out_path), 'a.jpg')
+    with open(output, 'rb') as f:
+        assert f.read() == b'x' * 100
+
+    # Same content, same key, outputs named after the current input
+    _write(str(tmp_path / 'c.jpg'), b'image a')
+    assert cache.key(str(tmp_path / 'c.jpg'), {'working_scale': 0.5}) == key
+    assert cache.restore(key, str(out_path), 'c.jpg')
+    assert sorted(os.listdir(out_path)) == ['a.jpgfiltered_vps.png',
+                                            'c.jpgfiltered_vps.png']
+
+    # A second entry exceeds the size, the least recently used is evicted
+    other_output = str(out_path / 'b.jpgfiltered_vps.png')
+    _write(other_output, b'y' * 100)
+    other_key = cache.key(in_file, {'working_scale': 1.0})
+    cache.store(other_key, [other_output], 'b.jpg')
+    old_time = time.time() - 100
+    os.utime(cache._entry_path(key), (old_time, old_time))
+    assert cache.evict() == 1
+    assert [entry[0] for entry in cache.entries()] == [other_key]
+
+
+def test_main_method_cache_with_renamed_input(tmp_path):
+    in_path = tmp_path / 'in'
+    in_path.mkdir()
+    image, _ = render_scene((360, 640), seed=0)
+    cv2.imwrite(str(in_path / 'a.jpg'), image)
+    cache_path = str(tmp_path / 'cache')
+    first_out = tmp_path / 'first'
+    main_method(f"{in_path}/", f"{first_out}/", logger,
+                cache_path=cache_path)
+    assert os.listdir(first_out) == ['a.jpgfiltered_vps.png']
+
+    os.rename(in_path / 'a.jpg', in_path / 'renamed.jpg')
+    second_out = tmp_path / 'second'
+    main_method(f"{in_path}/", f"{second_out}/", logger,
+                cache_path=cache_path)
+    assert os.listdir(second_out) == ['renamed.jpgfiltered_vps.png']
+    assert len(ResultCache(cache_path).entries()) == 1
+
+
+def test_folder_digest(tmp_path):
+    folder = tmp_path / 'sequence'
+    folder.mkdir()
+    _write(str(folder / '0.png'), b'frame 0')
+    _write(str(folder / '1.png'), b'frame 1')
+    digest = file_digest(str(folder))
+    assert file_digest(str(folder)) == digest
+    _write(str(folder / '1.png'), b'frame 2')
+    assert file_digest(str(folder)) != digest
+
+
+def test_runtime_params_are_not_hashed(tmp_path):
+    cache = ResultCache(str(tmp_path / 'cache'))
+    in_file = str(tmp_path / 'a.jpg')
+    _write(in_file, b'image a')
+    keys = {cache.key(in_file, cached_params({'working_scale': 0.5,
+                                              'stats_callback': callback}))
+            for callback in (print, lambda stats: None)}
+    assert len(keys) == 1
+    with pytest.raises(TypeError):
+        params_digest({'stats_callback': lambda stats: None})
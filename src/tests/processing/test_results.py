@@ -0,0 +1,79 @@
+"""
+@author: Sebastian Cepeda
+@email: sebastian.cepeda.fuentealba@gmail.com
+"""
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+import main
+from main import main_method
+from src.benchmarks.synthetic_scene import render_scene
+from src.processing.results import FrameRecord, ResultsWriter, load_results
+from src.utils.print_logger import PrintLogger as logger
+
+
+@pytest.mark.parametrize('extension', ['npy', 'npz'])
+def test_results_round_trip(tmp_path, extension):
+    path = str(tmp_path / f"results.{extension}")
+    with ResultsWriter(path, chunk_size=2) as writer:
+        for frame_idx in range(5):
+            writer.write(FrameRecord(frame_idx, (frame_idx, 2 * frame_idx),
+                                     (0, 0), 10, 0.5, frame_idx % 2 == 0))
+        writer.write(FrameRecord(5, None, None, 0, np.nan, False))
+
+    records = load_results(path)
+    assert records['frame_idx'].tolist() == list(range(6))
+    assert records['vp_y'][0:5].tolist() == [0, 2, 4, 6, 8]
+    assert np.isnan(records['vp_x'][5])
+    assert records['detected'].tolist() == [True, False, True, False, True,
+                                            False]
+
+
+def test_main_method_headless_results(tmp_path):
+    in_path = tmp_path / 'in'
+    in_path.mkdir()
+    scenes = [render_scene((360, 640), seed=seed) for seed in range(4)]
+    cv2.imwrite(str(in_path / 'image.png'), scenes[0][0])
+    video = cv2.VideoWriter(str(in_path / 'video.avi'),
+                            cv2.VideoWriter_fourcc(*'MJPG'), 30, (640, 360))
+    for image, _ in scenes:
+        video.write(image)
+    video.release()
+    out_path = tmp_path / 'out'
+    main_method(f"{in_path}/", f"{out_path}/", logger, headless=True,
+                results_format='npz')
+    # Only the records are written, nothing is rendered
+    assert sorted(os.listdir(out_path)) == ['image.png.npz',
+                                            'video.avi.npz']
+    image_records = load_results(str(out_path / 'image.png.npz'))
+    assert image_records['frame_idx'].tolist() == [0]
+    x, y = image_records['vp_x'][0], image_records['vp_y'][0]
+    expected_vp = scenes[0][1]
+    assert np.hypot(x - expected_vp[0], y - expected_vp[1]) < 10
+    video_records = load_results(str(out_path / 'video.avi.npz'))
+    assert video_records['frame_idx'].tolist() == list(range(4))
+    assert video_records['detected'].all()
+
+
+def test_process_video_keeps_results_on_error(tmp_path, monkeypatch):
+    in_path = tmp_path / 'in'
+    in_path.mkdir()
+    frames = np.stack([render_scene((360, 640), seed=seed)[0]
+                       for seed in range(3)])
+    np.save(str(in_path / 'video.npy'), frames)
+
+    def failing_stream(*args, **kwargs):
+        for frame_idx in range(2):
+            yield FrameRecord(frame_idx, (1, 2), (1, 2), 10, 0.5,
+                              True), frames[frame_idx]
+        raise RuntimeError("Decoding error")
+
+    monkeypatch.setattr(main, 'stream_video_results', failing_stream)
+    with pytest.raises(RuntimeError):
+        main.process_video('video.npy', f"{in_path}/", f"{tmp_path}/",
+                           logger, render=False, results_format='npz')
+    records = load_results(str(tmp_path / 'video.npy.npz'))
+    assert records['frame_idx'].tolist() == [0, 1]
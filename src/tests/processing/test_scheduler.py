@@ -0,0 +1,41 @@
+"""
+@author: Sebastian Cepeda
+@email: sebastian.cepeda.fuentealba@gmail.com
+"""
+import numpy as np
+
+from src.processing.scheduler import KeyframeScheduler, fill_vanishing_points
+
+
+def test_fixed_interval_keyframes():
+    scheduler = KeyframeScheduler(interval=3)
+    frame = np.zeros((36, 64), dtype=np.uint8)
+    keyframes = [scheduler.is_keyframe(i, frame) for i in range(7)]
+    assert keyframes == [True, False, False, True, False, False, True]
+
+
+def test_adaptive_keyframes():
+    scheduler = KeyframeScheduler(interval=100, change_threshold=10.0)
+    dark = np.zeros((72, 128, 3), dtype=np.uint8)
+    bright = np.full((72, 128, 3), 200, dtype=np.uint8)
+    frames = [dark, dark, bright, bright, dark]
+    keyframes = [scheduler.is_keyframe(i, frame)
+                 for i, frame in enumerate(frames)]
+    assert keyframes == [True, False, True, False, True]
+
+
+def test_fill_vanishing_points():
+    frames_vps = [(0, 'f0', (0, 0)), (1, 'f1', None), (2, 'f2', None),
+                  (3, 'f3', (30, 60)), (4, 'f4', None)]
+
+    filled = list(fill_vanishing_points(frames_vps, 'interpolate'))
+    assert [frame for _, frame, _, _ in filled] == \
+        ['f0', 'f1', 'f2', 'f3', 'f4']
+    assert [vp for _, _, vp, _ in filled] == \
+        [(0, 0), (10, 20), (20, 40), (30, 60), (30, 60)]
+    assert [keyframe for _, _, _, keyframe in filled] == \
+        [True, False, False, True, False]
+
+    filled = list(fill_vanishing_points(frames_vps, 'reuse'))
+    assert [vp for _, _, vp, _ in filled] == \
+        [(0, 0), (0, 0), (0, 0), (30, 60), (30, 60)]
@@ -0,0 +1,80 @@
+"""
+@author: Sebastian Cepeda
+@email: sebastian.cepeda.fuentealba@gmail.com
+"""
+import cv2
+import numpy as np
+
+from src.algorithms.vanishing_point_detector import VanishingPointsDetector
+from src.benchmarks.synthetic_scene import render_scene
+from src.processing.scheduler import KeyframeScheduler
+from src.processing.shared_frames import SharedFrameRing, \
+    ProcessVideoPipeline
+from src.processing.streaming import stream_video_results
+
+
+def test_shared_frame_ring():
+    with SharedFrameRing((4, 5, 3), slots=2) as ring:
+        slot = ring.acquire()
+        ring.write(slot, np.full((4, 5, 3), 7, dtype=np.uint8))
+        assert ring.free_slots == 1
+        worker_ring = SharedFrameRing.attach(ring.name, ring.frame_shape,
+                                             ring.dtype, ring.slots)
+        view = worker_ring.view(slot)
+        assert np.all(view == 7)
+        # Views share the memory of the ring
+        view[0, 0, 0] = 9
+        assert ring.view(slot)[0, 0, 0] == 9
+        worker_ring.close()
+        ring.release(slot)
+        assert ring.free_slots == 2
+
+
+def test_process_video_pipeline():
+    scenes = [render_scene((360, 640), seed=seed) for seed in range(5)]
+    frames = [image for image, _ in scenes]
+    pipeline = ProcessVideoPipeline(workers=2, slots=3,
+                                    scheduler=KeyframeScheduler(interval=2),
+                                    with_stats=True)
+    results = []
+    for frame_idx, frame, result in pipeline.run(frames):
+        assert np.array_equal(frame, frames[frame_idx])
+        results.append((frame_idx, result))
+    assert [frame_idx for frame_idx, _ in results] == list(range(5))
+    for frame_idx, result in results:
+        if frame_idx % 2 == 1:
+            assert result is None
+            continue
+        vp_lines, stats = result
+        vp, _ = vp_lines[0]
+        expected_vp = scenes[frame_idx][1]
+        assert np.hypot(vp[0] - expected_vp[0], vp[1] - expected_vp[1]) < 10
+        assert stats.stage_times['total'] > 0
+
+
+def test_stream_with_processes_and_interpolation():
+    scenes = [render_scene((360, 640), seed=seed) for seed in range(12)]
+    frames = [image for image, _ in scenes]
+    stream = stream_video_results(frames, [], None,
+                                  KeyframeScheduler(interval=4),
+                                  'interpolate', processes=1)
+    frame_indexes = []
+    for record, frame in stream:
+        # Frames held until the next keyframe are not overwritten by the
+        # later frames written in their ring slot
+        assert np.array_equal(frame, frames[record.frame_idx])
+        frame_indexes.append(record.frame_idx)
+    assert frame_indexes == list(range(12))
+
+
+def test_process_video_pipeline_resizes_into_slots():
+    frames = [render_scene((360, 640), seed=seed)[0] for seed in range(3)]
+    pipeline = ProcessVideoPipeline(workers=1, slots=2, dim=(320, 180))
+    vp_detector = VanishingPointsDetector('')
+    for frame_idx, frame, result in pipeline.run(frames):
+        expected = cv2.resize(frames[frame_idx], (320, 180),
+                              interpolation=cv2.INTER_AREA)
+        assert np.array_equal(frame, expected)
+        # The workers detect on the resized frame of the slot
+        expected_vp, _ = vp_detector.execute(expected)[0]
+        assert result[0][0] == expected_vp
@@ -0,0 +1,39 @@
+"""
+@author: Sebastian Cepeda
+@email: sebastian.cepeda.fuentealba@gmail.com
+"""
+import time
+
+import numpy as np
+import pytest
+
+from src.processing.video_pipeline import VideoPipeline
+
+
+class _SlowDetector:
+
+    def execute(self, frame):
+        # Later frames finish first, so results arrive out of order
+        time.sleep(0.01 * (3 - frame[0] % 4))
+        if frame[0] < 0:
+            raise ValueError("Bad frame")
+        return int(frame[0]) * 10
+
+
+def test_pipeline_yields_frames_in_order():
+    frames = [np.array([i]) for i in range(12)]
+    pipeline = VideoPipeline([_SlowDetector() for _ in range(3)],
+                             preprocess=lambda frame: frame + 1,
+                             queue_size=2)
+    results = list(pipeline.run(frames))
+    assert [frame_idx for frame_idx, _, _ in results] == list(range(12))
+    assert [int(frame[0]) for _, frame, _ in results] == list(range(1, 13))
+    assert [result for _, _, result in results] == \
+        [i * 10 for i in range(1, 13)]
+
+
+def test_pipeline_propagates_errors():
+    frames = [np.array([i]) for i in (0, 1, -5, 3)]
+    pipeline = VideoPipeline([_SlowDetector(), _SlowDetector()])
+    with pytest.raises(ValueError):
+        list(pipeline.run(frames))
@@ -0,0 +1,26 @@
+"""
+@author: Sebastian Cepeda
+@email: sebastian.cepeda.fuentealba@gmail.com
+"""
+import cv2
+import numpy as np
+
+from src.utils.debug_sink import DebugImageWriter
+
+
+def test_debug_writer_samples_and_writes_in_background(tmp_path):
+    sink = DebugImageWriter(image_format='jpg', scale=0.5, every_n=2,
+                            number_frames=True, block=True)
+    image = np.zeros((40, 60), dtype=np.uint8)
+    for _ in range(4):
+        if sink.start_frame():
+            sink.write(str(tmp_path / 'edges'), image)
+            # The buffer can be reused right after write
+            image.fill(255)
+    sink.close()
+    assert sorted(p.name for p in tmp_path.iterdir()) == \
+        ['edges_000000.jpg', 'edges_000002.jpg']
+    written = cv2.imread(str(tmp_path / 'edges_000000.jpg'),
+                         cv2.IMREAD_GRAYSCALE)
+    assert written.shape == (20, 30)
+    assert written.max() < 10
@@ -0,0 +1,32 @@
+"""
+@author: Sebastian Cepeda
+@email: sebastian.cepeda.fuentealba@gmail.com
+"""
+import csv
+import json
+
+from src.utils.instrumentation import DetectionStats, StatsAggregator
+
+
+def test_stats_aggregator_exports(tmp_path):
+    aggregator = StatsAggregator(bins=2)
+    for segments in (10, 20, 30):
+        stats = DetectionStats()
+        with stats.timer('gabor'):
+            pass
+        stats.count('segments_detected', segments)
+        stats.count('segments_detected', 1)
+        aggregator.add(stats)
+
+    summary = aggregator.summary()
+    assert summary['segments_detected']['count'] == 3
+    assert summary['segments_detected']['mean'] == 21
+    assert sum(summary['gabor_time']['histogram']['counts']) == 3
+
+    aggregator.to_json(str(tmp_path / 'stats.json'))
+    with open(tmp_path / 'stats.json') as f:
+        assert json.load(f)['segments_detected']['max'] == 31
+    aggregator.to_csv(str(tmp_path / 'stats.csv'))
+    with open(tmp_path / 'stats.csv') as f:
+        rows = list(csv.DictReader(f))
+    assert [row['segments_detected'] for row in rows] == ['11', '21', '31']
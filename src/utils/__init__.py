@@ -3,8 +3,11 @@
 @email: sebastian.cepeda.fuentealba@gmail.com
 """
 
+from .instrumentation import DetectionStats, StatsAggregator
 from .print_logger import PrintLogger
 
 __all__ = [
-    'PrintLogger'
+    'DetectionStats',
+    'PrintLogger',
+    'StatsAggregator',
 ]
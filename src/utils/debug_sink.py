@@ -0,0 +1,110 @@
+"""
+@author: Sebastian Cepeda
+@email: sebastian.cepeda.fuentealba@gmail.com
+"""
+
+import queue
+import threading
+
+import cv2
+
+_STOP = object()
+
+
+class DebugImageWriter:
+
+    def __init__(self,
+                 image_format: str = 'png',
+                 scale: float = 1.0,
+                 every_n: int = 1,
+                 jpeg_quality: int = 90,
+                 background: bool = True,
+                 queue_size: int = 32,
+                 block: bool = False,
+                 number_frames: bool = False):
+        """
+        Sink of the debug images of VanishingPointsDetector. In background
+        mode the images are encoded and written by a writer thread, fed
+        through a bounded queue, so the detection does not wait for the disk.
+
+        :param image_format: 'png' or 'jpg'
+        :param scale: Scale of the written images (e.g. 0.5 to downsample)
+        :param every_n: Only every n-th frame is sampled
+        :param jpeg_quality: Quality of the jpg images
+        :param background: Writes in a background thread, otherwise writes
+        synchronously
+        :param queue_size: Size of the queue of the writer thread
+        :param block: When the queue is full, waits for the writer instead of
+        dropping the image
+        :param number_frames: Appends the frame number to the file names, so
+        the images of consecutive frames are kept
+        """
+        if image_format not in ('png', 'jpg'):
+            raise ValueError(f"Unknown debug image format: {image_format}")
+        self.image_format = image_format
+        self.scale = scale
+        self.every_n = max(1, every_n)
+        self.background = background
+        self.block = block
+        self.number_frames = number_frames
+        self.params = []
+        if image_format == 'jpg':
+            self.params = [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality]
+        self.frame_idx = -1
+        self.dropped = 0
+        self._queue = None
+        self._thread = None
+        if background:
+            self._queue = queue.Queue(maxsize=queue_size)
+            self._thread = threading.Thread(target=self._writer, daemon=True)
+            self._thread.start()
+
+    def _writer(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            path, image = item
+            cv2.imwrite(path, image, self.params)
+
+    def start_frame(self):
+        """
+        Starts a new frame
+
+        :return: True if the images of this frame have to be written
+        """
+        self.frame_idx += 1
+        return self.frame_idx % self.every_n == 0
+
+    def write(self, path_prefix: str, image):
+        """
+        Writes (or queues) a debug image. The image is copied, so its buffer
+        can be reused right away.
+
+        :param path_prefix: Path without extension
+        :param image: Image
+        """
+        if self.number_frames:
+            path_prefix = f"{path_prefix}_{self.frame_idx:06d}"
+        path = f"{path_prefix}.{self.image_format}"
+        if self.scale != 1.0:
+            image = cv2.resize(image, None, fx=self.scale, fy=self.scale,
+                               interpolation=cv2.INTER_AREA)
+        elif self.background:
+            image = image.copy()
+        if not self.background:
+            cv2.imwrite(path, image, self.params)
+            return
+        try:
+            self._queue.put((path, image), block=self.block)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        """
+        Writes the queued images and stops the writer thread
+        """
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
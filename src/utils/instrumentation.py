@@ -0,0 +1,133 @@
+"""
+@author: Sebastian Cepeda
+@email: sebastian.cepeda.fuentealba@gmail.com
+"""
+
+import csv
+import json
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+
+COUNTERS = [
+    'segments_detected',
+    'segments_filtered',
+    'intersections',
+    'accumulator_cells',
+    'accumulator_max',
+    'vanishing_points',
+]
+
+
+class DetectionStats:
+
+    def __init__(self):
+        """
+        Instrumentation of one call of VanishingPointsDetector.execute: wall
+        time per stage (seconds) and counters of the intermediate results.
+        Stages and counters of repeated passes (e.g. pyramid levels) are
+        added up.
+        """
+        self.stage_times = OrderedDict()
+        self.counters = OrderedDict((name, 0) for name in COUNTERS)
+        self.confidence = 0.0
+        self.tracked = False
+
+    @contextmanager
+    def timer(self, stage: str):
+        """
+        Context manager that adds its wall time to a stage
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.stage_times[stage] = self.stage_times.get(stage, 0.0) + \
+                elapsed
+
+    def count(self, name: str, value):
+        self.counters[name] = self.counters.get(name, 0) + int(value)
+
+    def as_dict(self):
+        """
+        Flat record: one '<stage>_time' key per stage, the counters,
+        confidence and tracked
+        """
+        record = OrderedDict()
+        for stage, elapsed in self.stage_times.items():
+            record[f"{stage}_time"] = elapsed
+        record.update(self.counters)
+        record['confidence'] = float(self.confidence)
+        record['tracked'] = int(self.tracked)
+        return record
+
+
+class StatsAggregator:
+
+    def __init__(self, bins: int = 20):
+        """
+        Collects the DetectionStats of a batch or a video. add can be used as
+        the stats_callback of several detectors (it is thread safe).
+
+        :param bins: Number of bins of the exported histograms
+        """
+        self.bins = bins
+        self.records = []
+        self._lock = threading.Lock()
+
+    def add(self, stats: DetectionStats):
+        record = stats.as_dict()
+        with self._lock:
+            self.records.append(record)
+
+    def _columns(self):
+        columns = OrderedDict()
+        for record in self.records:
+            for key in record.keys():
+                columns[key] = None
+        return list(columns.keys())
+
+    def summary(self):
+        """
+        Summary of every metric: count, mean, percentiles, max and histogram
+
+        :return: Dict of metric name to its summary
+        """
+        summary = OrderedDict()
+        for column in self._columns():
+            values = np.array([record[column] for record in self.records
+                               if column in record], dtype=np.float64)
+            counts, edges = np.histogram(values, bins=self.bins)
+            summary[column] = {
+                'count': int(values.shape[0]),
+                'mean': float(values.mean()),
+                'p50': float(np.percentile(values, 50)),
+                'p95': float(np.percentile(values, 95)),
+                'max': float(values.max()),
+                'histogram': {
+                    'counts': counts.tolist(),
+                    'edges': edges.tolist(),
+                },
+            }
+        return summary
+
+    def to_json(self, path: str):
+        """
+        Writes the summary, with the histograms, as JSON
+        """
+        with open(path, 'w') as f:
+            json.dump(self.summary(), f, indent=2)
+
+    def to_csv(self, path: str):
+        """
+        Writes one row per call, with every metric as a column
+        """
+        columns = self._columns()
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=columns, restval='')
+            writer.writeheader()
+            writer.writerows(self.records)